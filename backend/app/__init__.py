@@ -4,6 +4,11 @@ from flask_jwt_extended import JWTManager
 from app.database import db
 from app.config import Config
 
+# Shared by the CORS config and the preflight handler below, which answers OPTIONS itself
+CORS_METHODS = ["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"]
+CORS_ALLOW_HEADERS = ["Content-Type", "Authorization", "X-Requested-With", "If-None-Match"]
+CORS_EXPOSE_HEADERS = ["Content-Type", "ETag", "Content-Disposition", "Retry-After"]
+
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
@@ -17,9 +22,9 @@ def create_app():
     CORS(app, 
          resources={r"/api/*": {
              "origins": "*",  # Allow all origins
-             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
-             "allow_headers": ["Content-Type", "Authorization", "X-Requested-With"],
-             "expose_headers": ["Content-Type"],
+             "methods": CORS_METHODS,
+             "allow_headers": CORS_ALLOW_HEADERS,
+             "expose_headers": CORS_EXPOSE_HEADERS,
              "supports_credentials": False,  # Set to False when using wildcard origin
              "max_age": 3600
          }},
@@ -35,11 +40,19 @@ def create_app():
             # This bypasses JWT validation for preflight requests
             response = jsonify({})
             response.headers.add("Access-Control-Allow-Origin", "*")
-            response.headers.add("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS, PATCH")
-            response.headers.add("Access-Control-Allow-Headers", "Content-Type, Authorization, X-Requested-With")
+            response.headers.add("Access-Control-Allow-Methods", ", ".join(CORS_METHODS))
+            response.headers.add("Access-Control-Allow-Headers", ", ".join(CORS_ALLOW_HEADERS))
             response.headers.add("Access-Control-Max-Age", "3600")
             return response, 200
     
+    # Routes set Access-Control-Allow-Origin themselves, which makes Flask-CORS skip the
+    # response, so expose the headers the frontend reads (ETag, Content-Disposition) here
+    @app.after_request
+    def expose_cors_headers(response):
+        if request.path.startswith('/api/') and 'Access-Control-Expose-Headers' not in response.headers:
+            response.headers['Access-Control-Expose-Headers'] = ", ".join(CORS_EXPOSE_HEADERS)
+        return response
+    
     # JWT error handlers - Flask-CORS will add headers automatically
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
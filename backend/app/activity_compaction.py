@@ -0,0 +1,121 @@
+"""Compaction and archival of club activities.
+
+Bulk onboarding writes one "<name> joined the club" row per member. Compaction rolls
+each settled burst of such rows in a club into a single aggregate row ("25 members
+joined the club"), keeping the newest row of the burst. Archival moves activities
+older than RETENTION into ActivityArchive so the activity table and its indexes
+stay small. Both work in bounded batches with a commit after each, and are meant to
+run periodically (see compact_activities.py).
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, literal, select, update
+
+from app import activity_feed
+from app.database import db
+from app.models import Activity, ActivityArchive
+
+# activity_type -> (ending of a single member's description, aggregate description)
+COMPACTABLE_TYPES = {
+    'join_club': (' joined the club', '{count} members joined the club'),
+    'leave_club': (' left the club', '{count} members left the club'),
+}
+
+# Activities less than BURST_GAP apart belong to the same burst
+BURST_GAP = timedelta(minutes=10)
+# Members a burst needs before it is rolled up
+MIN_BURST_SIZE = 5
+# Bursts that may still be growing are left alone
+SETTLE_TIME = timedelta(minutes=30)
+
+RETENTION = timedelta(days=365)
+BATCH_SIZE = 1000
+
+def _bursts(rows, member_suffix):
+    burst = []
+    for row in rows:
+        # Aggregates from earlier passes merge with new members of the same burst
+        if row.aggregate_count is None and not row.description.endswith(member_suffix):
+            continue
+        if burst and row.created_at - burst[-1].created_at > BURST_GAP:
+            yield burst
+            burst = []
+        burst.append(row)
+    if burst:
+        yield burst
+
+def _compact(club_id, activity_type, settled_before):
+    member_suffix, aggregate_description = COMPACTABLE_TYPES[activity_type]
+    rows = db.session.execute(
+        select(Activity.id, Activity.description, Activity.created_at, Activity.aggregate_count).where(
+            Activity.club_id == club_id,
+            Activity.activity_type == activity_type,
+            Activity.created_at < settled_before
+        ).order_by(Activity.created_at, Activity.id)
+    ).all()
+
+    removed = 0
+    for burst in _bursts(rows, member_suffix):
+        members = sum(row.aggregate_count or 1 for row in burst)
+        if len(burst) < 2 or members < MIN_BURST_SIZE:
+            continue
+        keep, merged = burst[-1], [row.id for row in burst[:-1]]
+        db.session.execute(
+            update(Activity.__table__).where(Activity.__table__.c.id == keep.id).values(
+                description=aggregate_description.format(count=members),
+                aggregate_count=members
+            )
+        )
+        for start in range(0, len(merged), BATCH_SIZE):
+            removed += db.session.execute(
+                Activity.__table__.delete().where(Activity.__table__.c.id.in_(merged[start:start + BATCH_SIZE]))
+            ).rowcount
+    return removed
+
+def compact_activities():
+    """Roll up settled membership bursts in every club. Returns the number of rows removed."""
+    settled_before = datetime.utcnow() - SETTLE_TIME
+    candidates = db.session.execute(
+        select(Activity.club_id, Activity.activity_type).where(
+            Activity.activity_type.in_(list(COMPACTABLE_TYPES)),
+            Activity.created_at < settled_before
+        ).group_by(Activity.club_id, Activity.activity_type).having(func.count() >= 2)
+    ).all()
+
+    removed = 0
+    for club_id, activity_type in candidates:
+        removed += _compact(club_id, activity_type, settled_before)
+        db.session.commit()
+    return removed
+
+def archive_old_activities():
+    """Move activities older than RETENTION to ActivityArchive. Returns the number moved."""
+    cutoff = datetime.utcnow() - RETENTION
+    activity = Activity.__table__
+    columns = ['id', 'club_id', 'user_id', 'activity_type', 'description', 'created_at',
+               'run_id', 'scheduled_run_id', 'aggregate_count']
+
+    moved = 0
+    while True:
+        # Ids grow with created_at, so the oldest rows come first along the primary key
+        ids = db.session.execute(
+            select(activity.c.id).where(activity.c.created_at < cutoff).order_by(activity.c.id).limit(BATCH_SIZE)
+        ).scalars().all()
+        if not ids:
+            break
+
+        feed_club_ids = db.session.execute(
+            select(activity.c.club_id).where(
+                activity.c.id.in_(ids), activity.c.activity_type == activity_feed.FEED_ACTIVITY_TYPE
+            ).distinct()
+        ).scalars().all()
+
+        db.session.execute(insert(ActivityArchive.__table__).from_select(
+            columns + ['archived_at'],
+            select(*[activity.c[column] for column in columns], literal(datetime.utcnow())).where(activity.c.id.in_(ids))
+        ))
+        moved += db.session.execute(activity.delete().where(activity.c.id.in_(ids))).rowcount
+        if feed_club_ids:
+            activity_feed.clubs_changed(feed_club_ids)
+        db.session.commit()
+    return moved
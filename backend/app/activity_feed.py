@@ -0,0 +1,347 @@
+"""Club activity feeds and the merged timeline across a user's clubs.
+
+Feeds show run activities newest first, paged by a (created_at, id) cursor that walks
+ix_activity_club_type_created. The timeline reads the first page's sort keys from
+each club along that index and k-way merges them, then loads the winning rows in a
+single joined query.
+
+Club.activity_version is bumped in the same transaction as any write that changes what
+a club's feed shows (its activities, their runs, or a runner's name), so a feed's ETag
+can be checked with one primary-key read. Long-polls wait on an in-process condition
+that commits in this worker signal, and re-read the version every RECHECK_SECONDS to
+notice writes made by other workers.
+
+Each worker also keeps the newest FEED_CACHE_SIZE serialized entries of recently read
+clubs (LRU across clubs), tagged with the activity_version they reflect. The worker
+that adds activities appends them after commit; any other change, or a version moved
+on by another worker, reloads the club's entries on its next read.
+"""
+import heapq
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import event, select, tuple_, union, update
+from sqlalchemy.orm import Session
+
+from app.database import db
+from app.models import Activity, Club, Run, User, club_members
+from app.pagination import decode_cursor, encode_cursor
+
+# Only runs (tracked manually or via GPS) are shown in feeds
+FEED_ACTIVITY_TYPE = 'run'
+
+MAX_WAIT_SECONDS = 25
+RECHECK_SECONDS = 2
+
+_PENDING_KEY = 'activity_feed_pending'
+# Run columns a feed entry shows
+_RUN_FIELDS = ('distance_km', 'duration_minutes', 'speed_kmh', 'notes', 'date')
+
+# Newest serialized feed entries kept per club, and how many clubs are cached
+FEED_CACHE_SIZE = 50
+MAX_CACHED_CLUBS = 512
+
+class _CachedFeed:
+    def __init__(self, version, entries, has_older):
+        self.version = version
+        self.entries = deque(entries, maxlen=FEED_CACHE_SIZE)  # newest first
+        self.has_older = has_older  # the club has feed activities older than these
+
+_lock = threading.Lock()
+_changed = threading.Condition(_lock)
+_waiters = {}  # club_id -> [waiting requests, commits seen], only while someone waits
+_cache = OrderedDict()  # club_id -> _CachedFeed, least recently used first
+
+def decode_before(cursor):
+    """(created_at, id) from a next_before cursor; raises ValueError if it is invalid"""
+    try:
+        created_at, activity_id = decode_cursor(cursor)
+        return datetime.fromisoformat(created_at), int(activity_id)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+def serialize(activity, user_name, run, club_name=None):
+    run_data = None
+    if run:
+        run_data = {
+            'distance_km': run.distance_km,
+            'duration_minutes': run.duration_minutes,
+            'speed_kmh': run.speed_kmh,
+            'notes': run.notes,
+            'date': run.date.isoformat()
+        }
+
+    data = {
+        'id': activity.id,
+        'type': activity.activity_type,
+        'description': activity.description,
+        'user_name': user_name,
+        'user_id': activity.user_id,
+        'created_at': activity.created_at.isoformat(),
+        'run_id': activity.run_id if run else None,
+        'run_data': run_data
+    }
+    if club_name is not None:
+        data['club_id'] = activity.club_id
+        data['club_name'] = club_name
+    return data
+
+def _rows_query(*extra_columns):
+    # Names and runs come from the same query as the activities
+    return db.session.query(Activity, User.name, Run, *extra_columns).join(
+        User, User.id == Activity.user_id
+    ).outerjoin(
+        Run, Run.id == Activity.run_id
+    )
+
+def _newest_first(query, before):
+    if before:
+        query = query.where(tuple_(Activity.created_at, Activity.id) < tuple_(*before))
+    return query.order_by(Activity.created_at.desc(), Activity.id.desc())
+
+def _page_from_db(club_id, limit, before):
+    query = _rows_query().filter(
+        Activity.club_id == club_id,
+        Activity.activity_type == FEED_ACTIVITY_TYPE
+    )
+    # Fetch one extra row to know whether another page exists
+    rows = _newest_first(query, before).limit(limit + 1).all()
+    return [serialize(*row) for row in rows[:limit]], len(rows) > limit
+
+def _entry_cursor(entry):
+    return encode_cursor(entry['created_at'], entry['id'])
+
+def _cached_page(club_id, limit, version):
+    with _lock:
+        feed = _cache.get(club_id)
+        if feed is not None and feed.version == version:
+            _cache.move_to_end(club_id)
+            entries, has_older = list(feed.entries), feed.has_older
+        else:
+            feed = None
+
+    if feed is None:
+        entries, has_older = _page_from_db(club_id, FEED_CACHE_SIZE, None)
+        with _lock:
+            _cache[club_id] = _CachedFeed(version, entries, has_older)
+            _cache.move_to_end(club_id)
+            while len(_cache) > MAX_CACHED_CLUBS:
+                _cache.popitem(last=False)
+
+    if limit < len(entries):
+        return entries[:limit], _entry_cursor(entries[limit - 1])
+    if limit == len(entries) or not has_older:
+        return entries, _entry_cursor(entries[-1]) if has_older else None
+    return None
+
+def club_page(club_id, limit, before=None, version=None):
+    """One page of a club's feed: (serialized activities, next_before cursor or None).
+
+    The first page is served from the club's cached feed when version (the club's
+    current activity_version) is given and the page fits in it.
+    """
+    if before is None and version is not None:
+        page = _cached_page(club_id, limit, version)
+        if page is not None:
+            return page
+    activities_data, has_more = _page_from_db(club_id, limit, before)
+    return activities_data, _entry_cursor(activities_data[-1]) if has_more else None
+
+def _club_keys(club_id, limit, before):
+    """Sort keys of a club's next limit activities, newest first"""
+    query = select(Activity.created_at, Activity.id).where(
+        Activity.club_id == club_id,
+        Activity.activity_type == FEED_ACTIVITY_TYPE
+    )
+    return db.session.execute(_newest_first(query, before).limit(limit)).all()
+
+def timeline_page(user_id, limit, before=None):
+    """One page of activity across every club the user belongs to.
+
+    Returns (serialized activities with club_id / club_name, next_before cursor or None).
+    """
+    club_ids = db.session.execute(
+        select(club_members.c.club_id).join(
+            Club, Club.id == club_members.c.club_id
+        ).where(
+            club_members.c.user_id == user_id,
+            Club.status != 'deleting'
+        )
+    ).scalars().all()
+
+    # Each club contributes at most limit + 1 keys, which is all one page can take from it
+    streams = [_club_keys(club_id, limit + 1, before) for club_id in club_ids]
+    merged = list(islice(heapq.merge(*streams, reverse=True), limit + 1))
+    if not merged:
+        return [], None
+
+    page_ids = [activity_id for _, activity_id in merged[:limit]]
+    rows = _rows_query(Club.name).join(
+        Club, Club.id == Activity.club_id
+    ).filter(Activity.id.in_(page_ids)).order_by(
+        Activity.created_at.desc(), Activity.id.desc()
+    ).all()
+
+    next_before = None
+    if len(merged) > limit:
+        created_at, activity_id = merged[limit - 1]
+        next_before = encode_cursor(created_at.isoformat(), activity_id)
+    return [serialize(*row) for row in rows], next_before
+
+def get_version(club_id):
+    """The club's activity version, or None if the club doesn't exist"""
+    return db.session.execute(
+        select(Club.activity_version).where(Club.id == club_id, Club.status != 'deleting')
+    ).scalar()
+
+def feed_etag(club_id, version, limit, before_cursor=None):
+    return f'{club_id}.{version}.{limit}.{before_cursor or ""}'
+
+def wait_for_change(club_id, version, timeout):
+    """Block until the club's activity version differs from version or timeout seconds pass.
+
+    Returns the latest version. The session is closed while waiting so no pooled
+    connection is held.
+    """
+    deadline = time.monotonic() + timeout
+    db.session.close()
+    with _lock:
+        waiter = _waiters.setdefault(club_id, [0, 0])
+        waiter[0] += 1
+        seen = waiter[1]
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return version
+            with _changed:
+                _changed.wait_for(lambda: waiter[1] != seen, timeout=min(remaining, RECHECK_SECONDS))
+                seen = waiter[1]
+            latest = get_version(club_id)
+            db.session.close()
+            if latest != version:
+                return latest
+    finally:
+        with _lock:
+            waiter[0] -= 1
+            if waiter[0] == 0 and _waiters.get(club_id) is waiter:
+                del _waiters[club_id]
+
+def _bump(session, stale_club_ids=(), run_ids=(), user_ids=(), new_activities=()):
+    """Bump the activity version of every affected club and queue the cache changes.
+
+    Clubs that only gained activities get them appended to their cached feed on commit;
+    any other change (edits, deletes, runs, names) drops the club's cached feed.
+    """
+    connection = session.connection()
+    stale = set(stale_club_ids)
+    queries = []
+    if run_ids:
+        queries.append(select(Activity.club_id).where(Activity.run_id.in_(run_ids)))
+    if user_ids:
+        queries.append(select(club_members.c.club_id).where(club_members.c.user_id.in_(user_ids)))
+    if queries:
+        stale.update(club_id for club_id in connection.execute(
+            queries[0] if len(queries) == 1 else union(*queries)
+        ).scalars() if club_id is not None)
+
+    appended = {}
+    for activity in new_activities:
+        appended.setdefault(activity.club_id, [])
+        if activity.club_id not in stale and activity.activity_type == FEED_ACTIVITY_TYPE:
+            appended[activity.club_id].append(activity)
+    affected = stale | set(appended)
+    if not affected:
+        return
+
+    connection.execute(
+        update(Club.__table__).where(Club.id.in_(affected))
+        .values(activity_version=Club.activity_version + 1)
+    )
+    versions = dict(connection.execute(
+        select(Club.id, Club.activity_version).where(Club.id.in_(affected))
+    ).all())
+
+    pending = session.info.setdefault(_PENDING_KEY, [])
+    with session.no_autoflush:
+        for club_id, version in versions.items():
+            if club_id in stale:
+                pending.append((club_id, version, None))
+                continue
+            activities = sorted(appended[club_id], key=lambda activity: (activity.created_at, activity.id))
+            pending.append((club_id, version, [
+                serialize(
+                    activity,
+                    session.get(User, activity.user_id).name,
+                    session.get(Run, activity.run_id) if activity.run_id else None
+                ) for activity in activities
+            ]))
+
+def runs_changed(run_ids):
+    """Bump the feeds showing these runs; for bulk writes the flush hook can't see"""
+    _bump(db.session, run_ids=list(run_ids))
+
+def clubs_changed(club_ids):
+    """Bump these clubs' feeds; for bulk writes the flush hook can't see"""
+    _bump(db.session, stale_club_ids=club_ids)
+
+@event.listens_for(Session, 'after_flush')
+def _track_feed_changes(session, flush_context):
+    stale_club_ids, run_ids, user_ids, new_activities = set(), set(), set(), []
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, Activity):
+            if obj.club_id is None:
+                continue
+            if obj in session.new:
+                new_activities.append(obj)
+            else:
+                stale_club_ids.add(obj.club_id)
+        elif isinstance(obj, Run) and obj not in session.new:
+            if obj in session.deleted or any(
+                db.inspect(obj).attrs[field].history.has_changes() for field in _RUN_FIELDS
+            ):
+                run_ids.add(obj.id)
+        elif isinstance(obj, User) and obj in session.dirty:
+            if db.inspect(obj).attrs.name.history.has_changes():
+                user_ids.add(obj.id)
+    _bump(session, stale_club_ids, run_ids, user_ids, new_activities)
+
+def _apply(club_id, version, entries):
+    feed = _cache.get(club_id)
+    if feed is None:
+        return
+    if entries is None or feed.version != version - 1:
+        # Changed in place, or missed an intermediate change - reload on next read
+        del _cache[club_id]
+        return
+    known = {entry['id'] for entry in feed.entries}
+    for entry in entries:
+        if entry['id'] in known:
+            continue
+        if len(feed.entries) == feed.entries.maxlen:
+            feed.has_older = True
+        feed.entries.appendleft(entry)
+    feed.version = version
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if not changes:
+        return
+    with _changed:
+        woken = False
+        for club_id, version, entries in changes:
+            _apply(club_id, version, entries)
+            waiter = _waiters.get(club_id)
+            if waiter is not None:
+                waiter[1] += 1
+                woken = True
+        if woken:
+            _changed.notify_all()
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,162 @@
+"""Content-addressed storage for uploaded images.
+
+Blobs live on the local filesystem under BLOB_STORAGE_DIR, named by the SHA-256 of
+their bytes (ab/cd/abcd...), so the same image uploaded twice is stored once and a
+blob never changes after it is written. Uploads are hashed while they stream to a
+temp file and then renamed into place. Thumbnails are generated off the request
+path in a small worker pool.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from PIL import Image
+
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_SIZE = (320, 320)
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Leading bytes of the image formats browsers upload
+_SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+_thumbnail_pool = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix='thumbnail')
+
+class BlobTooLarge(ValueError):
+    pass
+
+class InvalidImage(ValueError):
+    pass
+
+def _root():
+    return current_app.config['BLOB_STORAGE_DIR']
+
+def is_digest(value):
+    return bool(value) and bool(_DIGEST_RE.match(value))
+
+def blob_path(digest, root=None):
+    return os.path.join(root or _root(), digest[:2], digest[2:4], digest)
+
+def thumbnail_path(digest, root=None):
+    return blob_path(digest, root) + '.thumb.jpg'
+
+def exists(digest):
+    return is_digest(digest) and os.path.exists(blob_path(digest))
+
+def sniff_mimetype(head):
+    for signature, mimetype in _SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+def mimetype_of(digest):
+    with open(blob_path(digest), 'rb') as f:
+        return sniff_mimetype(f.read(12)) or 'application/octet-stream'
+
+def save_stream(stream, max_bytes=MAX_IMAGE_BYTES):
+    """Copy an image from a file-like object into the store in CHUNK_SIZE pieces.
+
+    Returns the blob's hex digest. Raises BlobTooLarge past max_bytes and InvalidImage
+    if the content is not a supported image format.
+    """
+    root = _root()
+    tmp_dir = os.path.join(root, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    head = b''
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise BlobTooLarge(f'Image too large. Maximum size is {max_bytes // (1024 * 1024)}MB')
+                if len(head) < 12:
+                    head += chunk[:12 - len(head)]
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        if not sniff_mimetype(head):
+            raise InvalidImage('Unsupported image format. Use JPEG, PNG, GIF or WebP')
+
+        hex_digest = digest.hexdigest()
+        path = blob_path(hex_digest, root)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    schedule_thumbnail(hex_digest)
+    return hex_digest
+
+def save_base64(data, max_bytes=MAX_IMAGE_BYTES):
+    """Store a base64 image (optionally a data: URL), as sent by older clients"""
+    if ',' in data:
+        data = data.split(',', 1)[1]
+    # Reject oversized payloads before decoding them (approx 4 base64 chars per 3 bytes)
+    if len(data) * 3 / 4 > max_bytes:
+        raise BlobTooLarge(f'Image too large. Maximum size is {max_bytes // (1024 * 1024)}MB')
+    try:
+        raw = base64.b64decode(data, validate=False)
+    except (binascii.Error, ValueError):
+        raise InvalidImage('Image is not valid base64')
+    return save_stream(_BytesReader(raw), max_bytes)
+
+class _BytesReader:
+    """Minimal read()-only view over bytes without copying them into a BytesIO"""
+    def __init__(self, data):
+        self._view = memoryview(data)
+        self._offset = 0
+
+    def read(self, size):
+        chunk = self._view[self._offset:self._offset + size]
+        self._offset += len(chunk)
+        return bytes(chunk)
+
+def _make_thumbnail(root, digest):
+    target = thumbnail_path(digest, root)
+    if os.path.exists(target):
+        return
+    try:
+        with Image.open(blob_path(digest, root)) as image:
+            image.thumbnail(THUMBNAIL_SIZE)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            tmp_path = f'{target}.{os.getpid()}.tmp'
+            image.save(tmp_path, 'JPEG', quality=80)
+            os.replace(tmp_path, target)
+    except Exception as e:
+        print(f"Thumbnail generation failed for {digest}: {e}")
+
+def schedule_thumbnail(digest):
+    _thumbnail_pool.submit(_make_thumbnail, _root(), digest)
+
+def image_url(digest, thumbnail=False):
+    """Public URL of a stored image (None when there is no image)"""
+    if not digest:
+        return None
+    url = f'/api/challenges/images/{digest}'
+    return url + '?size=thumb' if thumbnail else url
@@ -0,0 +1,68 @@
+"""Challenge leaderboards ranked in SQL with window functions."""
+from sqlalchemy import case, func, select
+
+from app.challenge_types import get_challenge_type
+from app.database import db
+from app.models import ChallengeParticipant, User
+
+DEFAULT_TOP = 25
+DEFAULT_AROUND = 5
+MAX_TOP = 200
+MAX_AROUND = 50
+
+def _progress():
+    return func.coalesce(ChallengeParticipant.progress_value, 0.0)
+
+def ranking_order(challenge):
+    """ORDER BY clauses that rank participants best-first for the challenge type"""
+    if get_challenge_type(challenge.challenge_type).lower_is_better:
+        # Lowest value wins; 0 means no qualifying run yet and ranks after every real value
+        return [case((_progress() > 0, 0), else_=1), _progress().asc()]
+    return [_progress().desc()]
+
+def ranked_participants_select(challenge):
+    """SELECT of every participant with rank (ties share a rank), position (unique) and total count"""
+    order = ranking_order(challenge)
+    return select(
+        ChallengeParticipant.user_id,
+        User.name.label('user_name'),
+        _progress().label('progress_value'),
+        func.rank().over(order_by=order).label('rank'),
+        func.row_number().over(order_by=order + [ChallengeParticipant.user_id]).label('position'),
+        func.count().over().label('total')
+    ).join(
+        User, User.id == ChallengeParticipant.user_id
+    ).where(
+        ChallengeParticipant.challenge_id == challenge.id
+    )
+
+def ranked_participants(challenge):
+    return ranked_participants_select(challenge).cte('ranked')
+
+def get_leaderboard_window(challenge, user_id, top=DEFAULT_TOP, around=DEFAULT_AROUND):
+    """Top `top` participants plus `around` positions either side of user_id, in one query.
+
+    Returns (rows, participant_count) where rows are ordered by position.
+    """
+    ranked = ranked_participants(challenge)
+    condition = ranked.c.position <= top
+    if around > 0:
+        my_position = select(ranked.c.position).where(ranked.c.user_id == user_id).scalar_subquery()
+        condition = condition | ranked.c.position.between(my_position - around, my_position + around)
+
+    rows = db.session.execute(
+        select(ranked).where(condition).order_by(ranked.c.position)
+    ).all()
+    participant_count = rows[0].total if rows else 0
+    return rows, participant_count
+
+def serialize_entry(row, challenge, user_id):
+    progress_percentage = (row.progress_value / challenge.goal_value * 100) if challenge.goal_value > 0 else 0
+    return {
+        'rank': row.rank,
+        'user_id': row.user_id,
+        'user_name': row.user_name,
+        'progress_value': row.progress_value,
+        'progress_percentage': round(progress_percentage, 1),
+        'is_current_user': row.user_id == user_id
+    }
@@ -0,0 +1,49 @@
+"""Set-based recomputation of challenge progress from runs."""
+from sqlalchemy import select, update
+
+from app import leaderboard_cache
+from app.challenge_types import get_challenge_type
+from app.database import db
+from app.models import Challenge, ChallengeParticipant
+
+def recompute_challenge(challenge_id, user_ids=None):
+    """Recompute participants' progress from their runs and tracked entries in one UPDATE ... FROM.
+
+    Covers every participant, or only user_ids. Participants with neither a qualifying
+    run nor a tracked entry get 0. A full recompute clears progress_stale_since unless the
+    dates changed again meanwhile. Commits, and returns the number of participants updated.
+    """
+    challenge = db.session.get(Challenge, challenge_id)
+    if not challenge:
+        return 0
+
+    totals = get_challenge_type(challenge.challenge_type).total_select(challenge, user_ids).subquery('totals')
+    updated = db.session.execute(
+        update(ChallengeParticipant).where(
+            ChallengeParticipant.challenge_id == challenge_id,
+            ChallengeParticipant.user_id == totals.c.user_id
+        ).values(progress_value=totals.c.progress).execution_options(synchronize_session=False)
+    ).rowcount
+
+    if user_ids is None:
+        db.session.execute(
+            update(Challenge).where(
+                Challenge.id == challenge_id,
+                Challenge.start_date == challenge.start_date,
+                Challenge.end_date == challenge.end_date
+            ).values(progress_stale_since=None).execution_options(synchronize_session=False)
+        )
+        leaderboard_cache.challenge_changed(challenge_id)
+    else:
+        # A few participants changed: patch their leaderboard entries rather than reloading it
+        rows = db.session.execute(
+            select(ChallengeParticipant.user_id, ChallengeParticipant.progress_value).where(
+                ChallengeParticipant.challenge_id == challenge_id,
+                ChallengeParticipant.user_id.in_(user_ids)
+            )
+        ).all()
+        for user_id, progress_value in rows:
+            leaderboard_cache.progress_changed(challenge_id, user_id, progress_value)
+
+    db.session.commit()
+    return updated
@@ -0,0 +1,124 @@
+"""Frozen challenge results and per-user badge counters.
+
+When a challenge ends (or is completed early) its final ranks are written to
+ChallengeResult once, and the first three finishers increment UserBadges. Reading a
+user's badges is then a single-row lookup instead of re-ranking every challenge they
+entered. A challenge whose dates changed is not finalized until its progress has been
+recomputed for the new dates (progress_stale_since is cleared).
+"""
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import literal, select, update
+
+from app import challenge_progress
+from app.challenge_leaderboard import ranked_participants_select
+from app.database import db, insert_ignore
+from app.models import Challenge, ChallengeResult, Club, UserBadges
+
+MEDALS = {1: 'gold', 2: 'silver', 3: 'bronze'}
+
+# How often a worker may kick off the sweep for ended-but-unfinalized challenges
+SWEEP_INTERVAL_SECONDS = 60
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+def _change_badges(medal_winners, delta):
+    """medal_winners: [(user_id, place)] with place in 1..3"""
+    if not medal_winners:
+        return
+    badges = UserBadges.__table__
+    db.session.execute(insert_ignore(badges), [{'user_id': user_id} for user_id in {uid for uid, _ in medal_winners}])
+    for user_id, place in medal_winners:
+        column = badges.c[MEDALS[place]]
+        db.session.execute(
+            badges.update().where(badges.c.user_id == user_id)
+            .values({column: column + delta, badges.c.updated_at: datetime.utcnow()})
+        )
+
+def _medal_winners(challenge_id):
+    """One gold, silver and bronze at most, for the first three finishers with any progress.
+
+    Ties are broken by user id, the order the leaderboard lists tied participants in.
+    """
+    rows = db.session.query(ChallengeResult.user_id).filter(
+        ChallengeResult.challenge_id == challenge_id,
+        ChallengeResult.progress_value > 0
+    ).order_by(ChallengeResult.rank, ChallengeResult.user_id).limit(len(MEDALS)).all()
+    return [(row.user_id, place) for place, row in enumerate(rows, 1)]
+
+def finalize_challenge(challenge_id):
+    """Freeze final ranks and award badges.
+
+    Returns False if the challenge was already finalized, or its progress is stale.
+    """
+    now = datetime.utcnow()
+    # Claim the challenge first so concurrent sweeps can't finalize it twice
+    claimed = db.session.execute(
+        update(Challenge).where(
+            Challenge.id == challenge_id,
+            Challenge.finalized_at.is_(None),
+            Challenge.progress_stale_since.is_(None),
+            Challenge.end_date <= now
+        ).values(finalized_at=now).execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return False
+
+    challenge = db.session.get(Challenge, challenge_id)
+    ranked = ranked_participants_select(challenge).subquery()
+    db.session.execute(
+        ChallengeResult.__table__.insert().from_select(
+            ['challenge_id', 'user_id', 'rank', 'progress_value', 'finalized_at'],
+            select(literal(challenge.id), ranked.c.user_id, ranked.c.rank, ranked.c.progress_value, literal(now))
+        )
+    )
+    _change_badges(_medal_winners(challenge_id), 1)
+    db.session.commit()
+    return True
+
+def unfinalize_challenge(challenge):
+    """Undo finalization before a challenge is reopened or deleted (caller commits)"""
+    if challenge.finalized_at is None:
+        return
+    _change_badges(_medal_winners(challenge.id), -1)
+    ChallengeResult.query.filter_by(challenge_id=challenge.id).delete(synchronize_session=False)
+    challenge.finalized_at = None
+
+def finalize_ended_challenges():
+    """Finalize every challenge whose end date has passed. Returns the number finalized."""
+    rows = db.session.query(Challenge.id, Challenge.progress_stale_since).join(
+        Club, Club.id == Challenge.club_id
+    ).filter(
+        Club.status != 'deleting',
+        Challenge.finalized_at.is_(None),
+        Challenge.end_date <= datetime.utcnow()
+    ).all()
+    finalized = 0
+    for challenge_id, stale_since in rows:
+        # Normally the date edit's own recompute job clears this; redo it in case that job was lost
+        if stale_since is not None:
+            challenge_progress.recompute_challenge(challenge_id)
+        if finalize_challenge(challenge_id):
+            finalized += 1
+    return finalized
+
+def sweep_due():
+    """True at most once per SWEEP_INTERVAL_SECONDS per worker"""
+    global _last_sweep
+    with _sweep_lock:
+        if time.monotonic() - _last_sweep < SWEEP_INTERVAL_SECONDS:
+            return False
+        _last_sweep = time.monotonic()
+        return True
+
+def get_badges(user_id):
+    row = db.session.get(UserBadges, user_id)
+    return {
+        'gold': row.gold if row else 0,
+        'silver': row.silver if row else 0,
+        'bronze': row.bronze if row else 0
+    }
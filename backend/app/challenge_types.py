@@ -0,0 +1,238 @@
+"""Registry of challenge types.
+
+Each type computes participants' progress from their runs as one grouped SQL query
+(progress_select), says how a manually tracked value updates the stored progress
+(accumulate, applied incrementally by apply_entry) and whether lower values rank
+higher. total_select folds the participants' tracked entries into their run progress
+the same way, so recomputing one participant or a whole challenge keeps them.
+
+Average pace and the consecutive-day streak have no incremental update: the stored
+progress is a single number, and neither an average (which needs the distance and
+time totals) nor a streak (which needs the run days) can be updated from it. They
+can't be tracked manually, and any change to a participant's runs is handled by
+recomputing that participant with their grouped query.
+"""
+from abc import ABC, abstractmethod
+
+from sqlalchemy import Integer, and_, case, cast, func, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql.expression import FunctionElement
+
+from app.models import ChallengeParticipant, ChallengeProgressEntry, Run
+
+# A run counts as a 5K when its distance is within 500m of 5km
+FIVE_K_MIN_KM = 4.5
+FIVE_K_MAX_KM = 5.5
+
+class day_number(FunctionElement):
+    """Whole days since an epoch for a timestamp, so consecutive days differ by exactly 1"""
+    type = Integer()
+    inherit_cache = True
+
+@compiles(day_number)
+def _day_number_default(element, compiler, **kw):
+    return "(CAST(%s AS DATE) - DATE '1970-01-01')" % compiler.process(element.clauses, **kw)
+
+@compiles(day_number, 'sqlite')
+def _day_number_sqlite(element, compiler, **kw):
+    return "CAST(julianday(date(%s)) AS INTEGER)" % compiler.process(element.clauses, **kw)
+
+class ChallengeType(ABC):
+    name = None
+    label = None
+    unit = None
+    # Lowest value wins; 0 means no qualifying run yet and ranks after everyone else
+    lower_is_better = False
+    # How a manually tracked value combines with the current progress: 'sum', 'min' (lowest
+    # nonzero value wins) or 'max'; None if progress can only be computed from runs
+    accumulate = 'sum'
+
+    @abstractmethod
+    def progress_select(self, challenge, user_ids=None):
+        """SELECT user_id, progress for the challenge's participants (optionally only user_ids).
+
+        Participants without a qualifying run come out as 0.
+        """
+
+    def run_filter(self):
+        """Extra condition a run must meet to count, or None"""
+        return None
+
+    def apply_entry(self, current, value):
+        """New progress after a manually tracked value, or None if this type can't be tracked manually"""
+        if self.accumulate == 'sum':
+            return current + value
+        if self.accumulate == 'min':
+            return value if value > 0 and (current == 0 or value < current) else current
+        if self.accumulate == 'max':
+            return max(current, value)
+        return None
+
+    def total_select(self, challenge, user_ids=None):
+        """progress_select with each participant's manually tracked entries combined in"""
+        runs = self.progress_select(challenge, user_ids).subquery('run_totals')
+        if self.accumulate is None:
+            return select(runs.c.user_id, runs.c.progress)
+
+        entry_value = ChallengeProgressEntry.progress_value
+        aggregate = {'sum': func.sum, 'min': func.min, 'max': func.max}[self.accumulate]
+        entries = select(
+            ChallengeProgressEntry.user_id, aggregate(entry_value).label('value')
+        ).where(ChallengeProgressEntry.challenge_id == challenge.id)
+        if user_ids is not None:
+            entries = entries.where(ChallengeProgressEntry.user_id.in_(user_ids))
+        if self.accumulate == 'min':
+            entries = entries.where(entry_value > 0)
+        entries = entries.group_by(ChallengeProgressEntry.user_id).subquery('entry_totals')
+
+        progress, value = runs.c.progress, entries.c.value
+        if self.accumulate == 'sum':
+            total = progress + func.coalesce(value, 0.0)
+        elif self.accumulate == 'min':
+            total = case((value.is_(None), progress), ((progress == 0) | (value < progress), value), else_=progress)
+        else:
+            total = case((value > progress, value), else_=progress)
+        return select(runs.c.user_id, total.label('progress')).select_from(runs).outerjoin(
+            entries, entries.c.user_id == runs.c.user_id
+        )
+
+    def _run_condition(self, challenge, participant):
+        condition = and_(
+            Run.user_id == participant.user_id,
+            Run.date >= challenge.start_date,
+            Run.date <= challenge.end_date
+        )
+        run_filter = self.run_filter()
+        return condition if run_filter is None else and_(condition, run_filter)
+
+class RunAggregateType(ChallengeType):
+    """A type whose progress is one aggregate over the participant's qualifying runs"""
+
+    @abstractmethod
+    def aggregate(self):
+        """Aggregate over Run giving one participant's progress"""
+
+    def progress_select(self, challenge, user_ids=None):
+        participant = aliased(ChallengeParticipant)
+        query = select(
+            participant.user_id,
+            func.coalesce(self.aggregate(), 0.0).label('progress')
+        ).select_from(participant).outerjoin(
+            Run, self._run_condition(challenge, participant)
+        ).where(participant.challenge_id == challenge.id)
+        if user_ids is not None:
+            query = query.where(participant.user_id.in_(user_ids))
+        return query.group_by(participant.user_id)
+
+class TotalDistance(RunAggregateType):
+    name = 'total_distance'
+    label = 'Total Distance'
+    unit = 'km'
+
+    def aggregate(self):
+        return func.sum(Run.distance_km)
+
+class WeeklyMileage(TotalDistance):
+    # Total distance over the challenge period
+    name = 'weekly_mileage'
+    label = 'Weekly Mileage'
+
+class TotalTime(RunAggregateType):
+    name = 'total_time'
+    label = 'Total Time'
+    unit = 'minutes'
+
+    def aggregate(self):
+        return func.sum(Run.duration_minutes)
+
+class Fastest5K(RunAggregateType):
+    name = 'fastest_5k'
+    label = 'Fastest 5K'
+    unit = 'minutes'
+    lower_is_better = True
+    accumulate = 'min'
+
+    def aggregate(self):
+        return func.min(Run.duration_minutes)
+
+    def run_filter(self):
+        return Run.distance_km.between(FIVE_K_MIN_KM, FIVE_K_MAX_KM)
+
+class LongestRun(RunAggregateType):
+    name = 'longest_run'
+    label = 'Longest Run'
+    unit = 'km'
+    accumulate = 'max'
+
+    def aggregate(self):
+        return func.max(Run.distance_km)
+
+class RunCount(RunAggregateType):
+    name = 'run_count'
+    label = 'Run Count'
+    unit = 'runs'
+
+    def aggregate(self):
+        return func.count(Run.id)
+
+class AveragePace(RunAggregateType):
+    name = 'average_pace'
+    label = 'Average Pace'
+    unit = 'min/km'
+    lower_is_better = True
+    accumulate = None
+
+    def aggregate(self):
+        return func.sum(Run.duration_minutes) / func.nullif(func.sum(Run.distance_km), 0)
+
+class ConsecutiveDayStreak(ChallengeType):
+    name = 'streak'
+    label = 'Consecutive-Day Streak'
+    unit = 'days'
+    accumulate = None
+
+    def progress_select(self, challenge, user_ids=None):
+        # Longest run of consecutive days (gaps and islands): day - row_number() is constant
+        # within a streak, so each streak is one group
+        participant = aliased(ChallengeParticipant)
+        days = select(
+            participant.user_id, day_number(Run.date).label('day')
+        ).select_from(participant).join(
+            Run, self._run_condition(challenge, participant)
+        ).where(participant.challenge_id == challenge.id)
+        if user_ids is not None:
+            days = days.where(participant.user_id.in_(user_ids))
+        days = days.distinct().subquery('days')
+
+        islands = select(
+            days.c.user_id,
+            (days.c.day - func.row_number().over(partition_by=days.c.user_id, order_by=days.c.day)).label('island')
+        ).subquery('islands')
+        streaks = select(
+            islands.c.user_id, func.count().label('length')
+        ).group_by(islands.c.user_id, islands.c.island).subquery('streaks')
+        longest = select(
+            streaks.c.user_id, func.max(streaks.c.length).label('length')
+        ).group_by(streaks.c.user_id).subquery('longest')
+
+        query = select(
+            participant.user_id,
+            cast(func.coalesce(longest.c.length, 0), ChallengeParticipant.progress_value.type).label('progress')
+        ).select_from(participant).outerjoin(
+            longest, longest.c.user_id == participant.user_id
+        ).where(participant.challenge_id == challenge.id)
+        if user_ids is not None:
+            query = query.where(participant.user_id.in_(user_ids))
+        return query
+
+CHALLENGE_TYPES = {
+    challenge_type.name: challenge_type
+    for challenge_type in (
+        WeeklyMileage(), Fastest5K(), TotalDistance(), TotalTime(),
+        LongestRun(), RunCount(), ConsecutiveDayStreak(), AveragePace()
+    )
+}
+
+def get_challenge_type(name):
+    return CHALLENGE_TYPES[name]
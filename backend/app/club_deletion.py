@@ -0,0 +1,146 @@
+"""Background deletion of a club and everything that belongs to it.
+
+The club is marked 'deleting' in the request (which hides it everywhere) and the
+dependents are then removed here in bounded, set-based DELETE batches, committing
+after each batch so no single statement or transaction grows with the club size.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, tuple_
+
+from app.challenge_results import unfinalize_challenge
+from app.database import db
+from app.models import (
+    Club, ClubDeletionJob, ClubStanding, ClubStats, ClubDailyStats, Activity, ActivityArchive, ScheduledRun, Challenge,
+    ChallengeParticipant, ChallengeProgressEntry, ChallengeResult, LiveRunSession,
+    club_members, club_admins, run_clubs, run_challenges, run_scheduled_runs,
+    scheduled_run_participants
+)
+
+BATCH_SIZE = 1000
+
+# A running job that has not reported progress for this long is assumed to have died with its worker
+STALE_JOB_AFTER = timedelta(minutes=10)
+
+def is_job_active(job):
+    """True if the job is pending/running and still reporting progress"""
+    if job.status not in ('pending', 'running'):
+        return False
+    return job.updated_at is None or datetime.utcnow() - job.updated_at < STALE_JOB_AFTER
+
+def _delete_batches(job, step, table, key_columns, condition):
+    """Delete rows of `table` matching `condition`, at most BATCH_SIZE rows per statement"""
+    job.current_step = step
+    db.session.commit()
+
+    while True:
+        batch = select(*key_columns).where(condition).limit(BATCH_SIZE)
+        if len(key_columns) == 1:
+            stmt = table.delete().where(key_columns[0].in_(batch))
+        else:
+            stmt = table.delete().where(tuple_(*key_columns).in_(batch))
+        deleted = db.session.execute(stmt).rowcount
+
+        job.deleted_rows += deleted
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+
+        if deleted < BATCH_SIZE:
+            break
+
+def _deletion_steps(club_id):
+    """(step name, table, key columns, condition) in dependency order"""
+    challenge_ids = select(Challenge.id).where(Challenge.club_id == club_id)
+    scheduled_run_ids = select(ScheduledRun.id).where(ScheduledRun.club_id == club_id)
+
+    entry = ChallengeProgressEntry.__table__
+    participant = ChallengeParticipant.__table__
+    result = ChallengeResult.__table__
+    return [
+        ('run_challenges', run_challenges,
+         [run_challenges.c.run_id, run_challenges.c.challenge_id],
+         run_challenges.c.challenge_id.in_(challenge_ids)),
+        ('challenge_progress_entries', entry, [entry.c.id], entry.c.challenge_id.in_(challenge_ids)),
+        ('challenge_results', result, [result.c.id], result.c.challenge_id.in_(challenge_ids)),
+        ('challenge_participants', participant, [participant.c.id], participant.c.challenge_id.in_(challenge_ids)),
+        ('challenges', Challenge.__table__, [Challenge.__table__.c.id], Challenge.__table__.c.club_id == club_id),
+        ('activities', Activity.__table__, [Activity.__table__.c.id], Activity.__table__.c.club_id == club_id),
+        ('activity_archive', ActivityArchive.__table__, [ActivityArchive.__table__.c.id],
+         ActivityArchive.__table__.c.club_id == club_id),
+        ('run_scheduled_runs', run_scheduled_runs,
+         [run_scheduled_runs.c.run_id, run_scheduled_runs.c.scheduled_run_id],
+         run_scheduled_runs.c.scheduled_run_id.in_(scheduled_run_ids)),
+        ('scheduled_run_participants', scheduled_run_participants,
+         [scheduled_run_participants.c.user_id, scheduled_run_participants.c.scheduled_run_id],
+         scheduled_run_participants.c.scheduled_run_id.in_(scheduled_run_ids)),
+        ('scheduled_runs', ScheduledRun.__table__, [ScheduledRun.__table__.c.id], ScheduledRun.__table__.c.club_id == club_id),
+        ('club_standings', ClubStanding.__table__, [ClubStanding.__table__.c.id], ClubStanding.__table__.c.club_id == club_id),
+        ('club_stats', ClubStats.__table__, [ClubStats.__table__.c.club_id], ClubStats.__table__.c.club_id == club_id),
+        ('club_daily_stats', ClubDailyStats.__table__,
+         [ClubDailyStats.__table__.c.club_id, ClubDailyStats.__table__.c.day],
+         ClubDailyStats.__table__.c.club_id == club_id),
+        ('run_clubs', run_clubs, [run_clubs.c.run_id, run_clubs.c.club_id], run_clubs.c.club_id == club_id),
+        ('club_admins', club_admins, [club_admins.c.user_id, club_admins.c.club_id], club_admins.c.club_id == club_id),
+        ('club_members', club_members, [club_members.c.user_id, club_members.c.club_id], club_members.c.club_id == club_id),
+    ]
+
+def delete_club_data(job_id):
+    """Run a ClubDeletionJob to completion. Safe to re-run: every step is idempotent."""
+    job = ClubDeletionJob.query.get(job_id)
+    if not job:
+        return
+
+    job.status = 'running'
+    job.updated_at = datetime.utcnow()
+    db.session.commit()
+
+    try:
+        # Badges awarded for the club's challenges go away with them
+        job.current_step = 'badges'
+        finalized = Challenge.query.filter(
+            Challenge.club_id == job.club_id, Challenge.finalized_at.isnot(None)
+        ).all()
+        for challenge in finalized:
+            unfinalize_challenge(challenge)
+            db.session.commit()
+
+        for step, table, key_columns, condition in _deletion_steps(job.club_id):
+            _delete_batches(job, step, table, key_columns, condition)
+
+        # Live sessions keep their GPS track; they just stop being shared with the club
+        job.current_step = 'live_run_sessions'
+        db.session.execute(
+            LiveRunSession.__table__.update()
+            .where(LiveRunSession.__table__.c.club_id == job.club_id)
+            .values(club_id=None)
+        )
+
+        job.current_step = 'club'
+        db.session.execute(Club.__table__.delete().where(Club.__table__.c.id == job.club_id))
+
+        job.status = 'completed'
+        job.current_step = None
+        job.finished_at = job.updated_at = datetime.utcnow()
+        db.session.commit()
+        print(f"Club {job.club_id} deleted ({job.deleted_rows} dependent rows)")
+    except Exception as e:
+        db.session.rollback()
+        job = ClubDeletionJob.query.get(job_id)
+        job.status = 'failed'
+        job.error = str(e)
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+        raise
+
+def serialize_job(job):
+    return {
+        'job_id': job.id,
+        'club_id': job.club_id,
+        'status': job.status,
+        'current_step': job.current_step,
+        'deleted_rows': job.deleted_rows,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'updated_at': job.updated_at.isoformat() if job.updated_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
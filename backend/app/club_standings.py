@@ -0,0 +1,206 @@
+"""Club leaderboard standings for weekly and monthly periods.
+
+Standings are computed with a single grouped aggregate over Run joined to club_members.
+The current period is cached in-process and patched as members log runs; closed periods
+are written to the ClubStanding table once and served from there afterwards.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app.database import db
+from app.models import Run, User, ClubStanding, club_members
+
+PERIODS = ('week', 'month')
+
+# Each gunicorn worker holds its own cache; the TTL bounds how stale a worker
+# that did not see a run being logged can get
+CURRENT_PERIOD_TTL_SECONDS = 60
+
+# computed_at is taken before the totals are queried (for the TTL) and completed_at after;
+# totals completed before a run started committing can't include it
+_current_cache = {}  # (club_id, period) -> {'start', 'end', 'computed_at', 'completed_at', 'totals'}
+_cache_lock = threading.Lock()
+
+def period_bounds(period, offset=0, now=None):
+    """Return (start, end) of a week (Monday-based) or month, `offset` periods before the current one"""
+    now = now or datetime.utcnow()
+    if period == 'week':
+        start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        start -= timedelta(weeks=offset)
+        return start, start + timedelta(weeks=1)
+
+    month_index = now.year * 12 + (now.month - 1) - offset
+    start = datetime(month_index // 12, month_index % 12 + 1, 1)
+    next_index = month_index + 1
+    return start, datetime(next_index // 12, next_index % 12 + 1, 1)
+
+def compute_totals(club_id, start, end):
+    """Aggregate distance, duration and run count per club member for runs in [start, end)"""
+    rows = db.session.query(
+        Run.user_id,
+        User.name,
+        func.sum(Run.distance_km),
+        func.sum(Run.duration_minutes),
+        func.count(Run.id)
+    ).join(
+        club_members,
+        (club_members.c.user_id == Run.user_id) & (club_members.c.club_id == club_id)
+    ).join(
+        User, User.id == Run.user_id
+    ).filter(
+        Run.date >= start,
+        Run.date < end
+    ).group_by(Run.user_id, User.name).all()
+
+    return {
+        user_id: {
+            'user_name': name,
+            'total_distance_km': distance or 0.0,
+            'total_duration_minutes': duration or 0.0,
+            'run_count': count
+        }
+        for user_id, name, distance, duration, count in rows
+    }
+
+def rank_totals(totals):
+    """Order totals by distance (then run count) and assign competition ranks (1, 2, 2, 4)"""
+    ordered = sorted(
+        totals.items(),
+        key=lambda item: (-item[1]['total_distance_km'], -item[1]['run_count'], item[0])
+    )
+    standings = []
+    previous_key = None
+    rank = 0
+    for position, (user_id, entry) in enumerate(ordered, 1):
+        key = (entry['total_distance_km'], entry['run_count'])
+        if key != previous_key:
+            rank = position
+            previous_key = key
+        standings.append({
+            'rank': rank,
+            'user_id': user_id,
+            'user_name': entry['user_name'],
+            'total_distance_km': round(entry['total_distance_km'], 2),
+            'total_duration_minutes': round(entry['total_duration_minutes'], 2),
+            'run_count': entry['run_count']
+        })
+    return standings
+
+def _current_standings(club_id, period):
+    start, end = period_bounds(period)
+    key = (club_id, period)
+    with _cache_lock:
+        cached = _current_cache.get(key)
+        if cached and cached['start'] == start and time.monotonic() - cached['computed_at'] < CURRENT_PERIOD_TTL_SECONDS:
+            return start, end, rank_totals(cached['totals'])
+
+    computed_at = time.monotonic()
+    totals = compute_totals(club_id, start, end)
+    completed_at = time.monotonic()
+    with _cache_lock:
+        _current_cache[key] = {
+            'start': start,
+            'end': end,
+            'computed_at': computed_at,
+            'completed_at': completed_at,
+            'totals': totals
+        }
+    return start, end, rank_totals(totals)
+
+def _closed_standings(club_id, period, offset):
+    start, end = period_bounds(period, offset)
+    rows = ClubStanding.query.filter_by(
+        club_id=club_id, period_type=period, period_start=start
+    ).order_by(ClubStanding.rank, ClubStanding.user_id).all()
+    if rows:
+        return start, end, [{
+            'rank': row.rank,
+            'user_id': row.user_id,
+            'user_name': row.user.name if row.user else 'Unknown',
+            'total_distance_km': round(row.total_distance_km, 2),
+            'total_duration_minutes': round(row.total_duration_minutes, 2),
+            'run_count': row.run_count
+        } for row in rows]
+
+    standings = rank_totals(compute_totals(club_id, start, end))
+    if standings:
+        db.session.bulk_insert_mappings(ClubStanding, [{
+            'club_id': club_id,
+            'period_type': period,
+            'period_start': start,
+            'user_id': entry['user_id'],
+            'rank': entry['rank'],
+            'total_distance_km': entry['total_distance_km'],
+            'total_duration_minutes': entry['total_duration_minutes'],
+            'run_count': entry['run_count']
+        } for entry in standings])
+        try:
+            db.session.commit()
+        except Exception:
+            # Another request stored the same period first
+            db.session.rollback()
+    return start, end, standings
+
+def get_standings(club_id, period, offset=0):
+    """Return (period_start, period_end, standings) for the given period of a club"""
+    if offset == 0:
+        return _current_standings(club_id, period)
+    return _closed_standings(club_id, period, offset)
+
+def commit_mark():
+    """Take just before committing a new run, and pass to record_run after the commit"""
+    return time.monotonic()
+
+def record_run(run, committed_after):
+    """Patch cached current-period standings of every club the runner belongs to.
+
+    Standings whose query completed after committed_after may have read the committed run
+    already; those are dropped and recomputed on the next request instead of counting it twice.
+    """
+    with _cache_lock:
+        if not _current_cache:
+            return
+
+    club_ids = [row.club_id for row in db.session.query(club_members.c.club_id).filter(
+        club_members.c.user_id == run.user_id
+    ).all()]
+
+    with _cache_lock:
+        for club_id in club_ids:
+            for period in PERIODS:
+                cached = _current_cache.get((club_id, period))
+                if not cached or not (cached['start'] <= run.date < cached['end']):
+                    continue
+                if cached['completed_at'] >= committed_after:
+                    del _current_cache[(club_id, period)]
+                    continue
+                entry = cached['totals'].get(run.user_id)
+                if entry is None:
+                    entry = cached['totals'][run.user_id] = {
+                        'user_name': run.user.name if run.user else 'Unknown',
+                        'total_distance_km': 0.0,
+                        'total_duration_minutes': 0.0,
+                        'run_count': 0
+                    }
+                entry['total_distance_km'] += run.distance_km
+                entry['total_duration_minutes'] += run.duration_minutes
+                entry['run_count'] += 1
+
+def invalidate_user(user_id):
+    """Drop cached current-period standings of the user's clubs (after a run is edited or deleted)"""
+    club_ids = {row.club_id for row in db.session.query(club_members.c.club_id).filter(
+        club_members.c.user_id == user_id
+    ).all()}
+    with _cache_lock:
+        for key in list(_current_cache):
+            if key[0] in club_ids:
+                del _current_cache[key]
+
+def invalidate_club(club_id):
+    """Drop cached current-period standings of a club (after membership changes)"""
+    with _cache_lock:
+        for period in PERIODS:
+            _current_cache.pop((club_id, period), None)
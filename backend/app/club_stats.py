@@ -0,0 +1,273 @@
+"""Incrementally maintained club statistics.
+
+A run counts towards a club once it is attributed to it through run_clubs: at creation
+for every club the runner belongs to, and when it is tagged to a club's scheduled run.
+Each attribution bumps the ClubStats totals and the ClubDailyStats bucket for the run's
+day. Daily buckets keep the set of members who ran, so "active members this week" is the
+size of the union of seven sets instead of a scan over Run. User ids are global, so a
+bitset over them is only compact when a day's ids are close together; each set is stored
+as either a bitset or a delta-encoded id list, whichever is smaller.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.database import db, insert_ignore
+from app.models import Run, ClubStats, ClubDailyStats, club_members, run_clubs
+
+ACTIVE_WINDOW_DAYS = 7
+
+def _varint_deltas(user_ids):
+    """Sorted user ids as LEB128 varints of the gap from the previous id"""
+    data = bytearray()
+    previous = 0
+    for user_id in user_ids:
+        gap = user_id - previous
+        previous = user_id
+        while gap >= 0x80:
+            data.append(gap & 0x7F | 0x80)
+            gap >>= 7
+        data.append(gap)
+    return bytes(data)
+
+def _decode_members(encoding, base, data):
+    """Set of user ids stored in a daily bucket"""
+    if encoding == 'ids':
+        members = set()
+        user_id = gap = shift = 0
+        for byte in data or b'':
+            gap |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                user_id += gap
+                members.add(user_id)
+                gap = shift = 0
+        return members
+    return {
+        base + index * 8 + bit
+        for index, byte in enumerate(data or b'') if byte
+        for bit in range(8) if byte >> bit & 1
+    }
+
+def _encode_members(members):
+    """(member_encoding, bitset_base, member_bitset) for a set of user ids, whichever encoding is smaller"""
+    if not members:
+        return 'bitset', 0, b''
+    user_ids = sorted(members)
+    id_list = _varint_deltas(user_ids)
+    # The bitset spans whole bytes from the lowest id to the highest
+    base = user_ids[0] // 8 * 8
+    if len(id_list) < (user_ids[-1] - base) // 8 + 1:
+        return 'ids', 0, id_list
+    value = 0
+    for user_id in user_ids:
+        value |= 1 << (user_id - base)
+    return 'bitset', base, value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+def _bucket_members(bucket):
+    return _decode_members(bucket.member_encoding, bucket.bitset_base, bucket.member_bitset)
+
+def _ensure_rows(club_ids, day=None):
+    db.session.execute(insert_ignore(ClubStats.__table__), [{'club_id': club_id} for club_id in club_ids])
+    if day is None:
+        return
+    db.session.execute(insert_ignore(ClubDailyStats.__table__), [
+        {'club_id': club_id, 'day': day} for club_id in club_ids
+    ])
+
+def record_run(run, club_ids):
+    """Add a run to the totals and daily buckets of the given clubs (caller commits)"""
+    if not club_ids:
+        return
+    day = run.date.date()
+    _ensure_rows(club_ids, day)
+
+    stats = ClubStats.__table__
+    db.session.execute(
+        stats.update().where(stats.c.club_id.in_(club_ids)).values(
+            total_distance_km=stats.c.total_distance_km + run.distance_km,
+            total_duration_minutes=stats.c.total_duration_minutes + run.duration_minutes,
+            run_count=stats.c.run_count + 1,
+            updated_at=datetime.utcnow()
+        )
+    )
+
+    buckets = ClubDailyStats.query.filter(
+        ClubDailyStats.club_id.in_(club_ids), ClubDailyStats.day == day
+    ).with_for_update().all()
+    for bucket in buckets:
+        members = _bucket_members(bucket) | {run.user_id}
+        bucket.member_encoding, bucket.bitset_base, bucket.member_bitset = _encode_members(members)
+        bucket.active_members = len(members)
+        bucket.distance_km += run.distance_km
+        bucket.duration_minutes += run.duration_minutes
+        bucket.run_count += 1
+
+def attribute_run(run, club_ids):
+    """Attribute a run to clubs it is not yet attributed to and count it in their stats (caller commits)"""
+    existing = {row.club_id for row in db.session.query(run_clubs.c.club_id).filter(
+        run_clubs.c.run_id == run.id
+    ).all()}
+    new_club_ids = sorted(set(club_ids) - existing)
+    if not new_club_ids:
+        return []
+    db.session.execute(insert_ignore(run_clubs), [
+        {'run_id': run.id, 'club_id': club_id} for club_id in new_club_ids
+    ])
+    record_run(run, new_club_ids)
+    return new_club_ids
+
+def attribute_new_run(run):
+    """Attribute a freshly created run to every club the runner is a member of"""
+    club_ids = [row.club_id for row in db.session.query(club_members.c.club_id).filter(
+        club_members.c.user_id == run.user_id
+    ).all()]
+    return attribute_run(run, club_ids)
+
+def run_club_ids(run_id):
+    return [row.club_id for row in db.session.query(run_clubs.c.club_id).filter(
+        run_clubs.c.run_id == run_id
+    ).all()]
+
+def snapshot(run):
+    """Capture the fields that feed club stats, before a run is edited or deleted"""
+    return {'distance_km': run.distance_km, 'duration_minutes': run.duration_minutes, 'date': run.date}
+
+def rebuild_day(club_id, day):
+    """Recompute one daily bucket from run_clubs (used when a counted run is edited or deleted)"""
+    start = datetime.combine(day, datetime.min.time())
+    rows = db.session.query(Run.user_id, Run.distance_km, Run.duration_minutes).join(
+        run_clubs, run_clubs.c.run_id == Run.id
+    ).filter(
+        run_clubs.c.club_id == club_id,
+        Run.date >= start,
+        Run.date < start + timedelta(days=1)
+    ).all()
+
+    members = {row.user_id for row in rows}
+    encoding, base, data = _encode_members(members)
+
+    _ensure_rows([club_id], day)
+    ClubDailyStats.query.filter_by(club_id=club_id, day=day).update({
+        'distance_km': sum(row.distance_km for row in rows),
+        'duration_minutes': sum(row.duration_minutes for row in rows),
+        'run_count': len(rows),
+        'active_members': len(members),
+        'member_encoding': encoding,
+        'bitset_base': base,
+        'member_bitset': data
+    }, synchronize_session=False)
+
+def adjust_run(club_ids, before, after):
+    """Apply an edit (before/after snapshots) or deletion (after=None) of a counted run (caller flushes first, then commits)"""
+    if not club_ids:
+        return
+    stats = ClubStats.__table__
+    distance_delta = (after['distance_km'] if after else 0) - before['distance_km']
+    duration_delta = (after['duration_minutes'] if after else 0) - before['duration_minutes']
+    db.session.execute(
+        stats.update().where(stats.c.club_id.in_(club_ids)).values(
+            total_distance_km=stats.c.total_distance_km + distance_delta,
+            total_duration_minutes=stats.c.total_duration_minutes + duration_delta,
+            run_count=stats.c.run_count - (0 if after else 1),
+            updated_at=datetime.utcnow()
+        )
+    )
+    days = {before['date'].date()}
+    if after:
+        days.add(after['date'].date())
+    for club_id in club_ids:
+        for day in days:
+            rebuild_day(club_id, day)
+
+def get_stats(club_id, today=None):
+    """Read a club's totals and the last ACTIVE_WINDOW_DAYS daily buckets (a bounded number of rows)"""
+    today = today or datetime.utcnow().date()
+    window_start = today - timedelta(days=ACTIVE_WINDOW_DAYS - 1)
+
+    totals = ClubStats.query.get(club_id)
+    buckets = ClubDailyStats.query.filter(
+        ClubDailyStats.club_id == club_id,
+        ClubDailyStats.day >= window_start,
+        ClubDailyStats.day <= today
+    ).order_by(ClubDailyStats.day).all()
+
+    week_members = set()
+    for bucket in buckets:
+        week_members |= _bucket_members(bucket)
+
+    today_bucket = next((bucket for bucket in buckets if bucket.day == today), None)
+    return {
+        'club_id': club_id,
+        'total_distance_km': round(totals.total_distance_km, 2) if totals else 0,
+        'total_duration_minutes': round(totals.total_duration_minutes, 2) if totals else 0,
+        'run_count': totals.run_count if totals else 0,
+        'active_members_today': today_bucket.active_members if today_bucket else 0,
+        'active_members_this_week': len(week_members),
+        'week_distance_km': round(sum(bucket.distance_km for bucket in buckets), 2),
+        'week_run_count': sum(bucket.run_count for bucket in buckets),
+        'daily': [{
+            'date': bucket.day.isoformat(),
+            'distance_km': round(bucket.distance_km, 2),
+            'run_count': bucket.run_count,
+            'active_members': bucket.active_members
+        } for bucket in buckets],
+        'updated_at': totals.updated_at.isoformat() if totals and totals.updated_at else None
+    }
+
+def backfill_run_clubs(club_id=None):
+    """Attribute historical runs to the clubs their runner belonged to when the run was logged"""
+    query = select(Run.id, club_members.c.club_id).join(
+        club_members, club_members.c.user_id == Run.user_id
+    ).where(
+        (club_members.c.joined_at.is_(None)) | (club_members.c.joined_at <= Run.date)
+    )
+    if club_id is not None:
+        query = query.where(club_members.c.club_id == club_id)
+    db.session.execute(insert_ignore(run_clubs).from_select(['run_id', 'club_id'], query))
+    db.session.commit()
+
+def rebuild_club_stats(club_id):
+    """Recompute a club's totals and all of its daily buckets from run_clubs"""
+    rows = db.session.query(Run.date, Run.user_id, Run.distance_km, Run.duration_minutes).join(
+        run_clubs, run_clubs.c.run_id == Run.id
+    ).filter(run_clubs.c.club_id == club_id).yield_per(1000)
+
+    days = {}
+    total_distance = total_duration = run_count = 0
+    for row in rows:
+        bucket = days.setdefault(row.date.date(), {'distance_km': 0.0, 'duration_minutes': 0.0, 'run_count': 0, 'members': set()})
+        bucket['distance_km'] += row.distance_km
+        bucket['duration_minutes'] += row.duration_minutes
+        bucket['run_count'] += 1
+        bucket['members'].add(row.user_id)
+        total_distance += row.distance_km
+        total_duration += row.duration_minutes
+        run_count += 1
+
+    ClubDailyStats.query.filter_by(club_id=club_id).delete(synchronize_session=False)
+    daily_rows = []
+    for day, bucket in days.items():
+        encoding, base, data = _encode_members(bucket['members'])
+        daily_rows.append({
+            'club_id': club_id,
+            'day': day,
+            'distance_km': bucket['distance_km'],
+            'duration_minutes': bucket['duration_minutes'],
+            'run_count': bucket['run_count'],
+            'active_members': len(bucket['members']),
+            'member_encoding': encoding,
+            'bitset_base': base,
+            'member_bitset': data
+        })
+    if daily_rows:
+        db.session.execute(ClubDailyStats.__table__.insert(), daily_rows)
+
+    _ensure_rows([club_id])
+    ClubStats.query.filter_by(club_id=club_id).update({
+        'total_distance_km': total_distance,
+        'total_duration_minutes': total_duration,
+        'run_count': run_count,
+        'updated_at': datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
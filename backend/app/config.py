@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -20,3 +21,14 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or os.environ.get('SECRET_KEY') or 'jwt-secret-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_ALGORITHM = 'HS256'
+    
+    # Uploaded progress images (content-addressed, see app/blob_store.py)
+    BLOB_STORAGE_DIR = os.environ.get('BLOB_STORAGE_DIR') or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'blobs')
+    # Let a fronting nginx/Apache send blob files itself (X-Sendfile) instead of the worker
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+    # Uploaded bulk-import files, kept until their import job finishes (not served). They
+    # hold plaintext passwords, so they live outside the source tree
+    IMPORT_STORAGE_DIR = os.environ.get('IMPORT_STORAGE_DIR') or os.path.join(tempfile.gettempdir(), 'runsquad-imports')
+    # Leaderboard streams and feed long-polls each hold a worker thread; keep this well
+    # below gunicorn's --threads so other requests are always served (see app/held_requests.py)
+    MAX_HELD_REQUESTS = int(os.environ.get('MAX_HELD_REQUESTS') or 6)
@@ -0,0 +1,36 @@
+"""A cap on requests that hold a worker thread open.
+
+Gunicorn's gthread workers have a fixed number of threads (--threads in render.yaml),
+and every open leaderboard stream or activity-feed long-poll occupies one for as long
+as it lasts. Those requests take a slot first; once MAX_HELD_REQUESTS are open, new ones
+get 503 with Retry-After, so ordinary API requests always have threads left.
+"""
+import threading
+
+from flask import current_app, jsonify
+
+RETRY_AFTER_SECONDS = 15
+
+_held = 0
+_lock = threading.Lock()
+
+def acquire():
+    """Take a slot; False if all MAX_HELD_REQUESTS slots are in use"""
+    global _held
+    with _lock:
+        if _held >= current_app.config['MAX_HELD_REQUESTS']:
+            return False
+        _held += 1
+        return True
+
+def release():
+    global _held
+    with _lock:
+        _held -= 1
+
+def busy_response():
+    """503 telling the client to retry after RETRY_AFTER_SECONDS"""
+    response = jsonify({'error': 'Server busy, retry later', 'retry_after': RETRY_AFTER_SECONDS})
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response, 503
@@ -0,0 +1,26 @@
+"""Minimal in-process background job runner.
+
+Jobs run on daemon threads inside their own application context (and therefore their
+own database session). Anything a job needs to survive a worker restart must be
+persisted by the job itself.
+"""
+import threading
+import traceback
+
+from flask import current_app
+
+def run_in_background(func, *args, **kwargs):
+    """Run func(*args, **kwargs) on a background thread with an application context"""
+    app = current_app._get_current_object()
+
+    def runner():
+        with app.app_context():
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                print(f"Background job {func.__name__} failed: {e}")
+                traceback.print_exc()
+
+    thread = threading.Thread(target=runner, name=f'job-{func.__name__}', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,184 @@
+"""Per-challenge in-memory leaderboards.
+
+Each cached challenge keeps participants in a SortedList ordered best-first plus a
+user -> (progress, name) map, so a progress change is an O(log n) remove/insert and rank
+lookups and top-K reads never touch the participant table.
+
+Consistency across gunicorn workers uses Challenge.leaderboard_version: every write that
+changes standings bumps it in the same transaction. A worker serves from memory only while
+its cached version equals the version on the Challenge row it just loaded; the worker that
+made the change patches its copy after commit, every other worker reloads lazily.
+
+Boards are patched in place under _lock, so they are only read through window() and
+rows(), which hold the lock while reading.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+from itertools import islice
+
+from sortedcontainers import SortedList
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+
+from app.challenge_types import get_challenge_type
+from app.database import db
+from app.models import Challenge, ChallengeParticipant, User
+
+MAX_CACHED_CHALLENGES = 256
+
+_PENDING_KEY = 'leaderboard_cache_pending'
+
+LeaderboardRow = namedtuple('LeaderboardRow', 'rank position user_id user_name progress_value')
+
+class ChallengeLeaderboard:
+    def __init__(self, challenge_type, version):
+        self.lower_is_better = get_challenge_type(challenge_type).lower_is_better
+        self.version = version
+        self.entries = SortedList()  # (sort key..., user_id)
+        self.scores = {}  # user_id -> (progress_value, user_name)
+
+    def sort_key(self, progress_value):
+        progress_value = progress_value or 0.0
+        if self.lower_is_better:
+            # Lowest value wins; 0 means no qualifying run yet and ranks last
+            return (0, progress_value) if progress_value > 0 else (1, 0.0)
+        return (0, -progress_value)
+
+    def set(self, user_id, progress_value, user_name):
+        self.remove(user_id)
+        self.scores[user_id] = (progress_value or 0.0, user_name)
+        self.entries.add(self.sort_key(progress_value) + (user_id,))
+
+    def remove(self, user_id):
+        previous = self.scores.pop(user_id, None)
+        if previous is not None:
+            self.entries.remove(self.sort_key(previous[0]) + (user_id,))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _row(self, position, entry):
+        user_id = entry[-1]
+        progress_value, user_name = self.scores[user_id]
+        # Competition rank: 1 + number of participants with a strictly better key
+        rank = self.entries.bisect_left(entry[:-1]) + 1
+        return LeaderboardRow(rank, position + 1, user_id, user_name, progress_value)
+
+    def rank_of(self, user_id):
+        if user_id not in self.scores:
+            return None
+        return self.entries.bisect_left(self.sort_key(self.scores[user_id][0])) + 1
+
+    def top(self, k):
+        return [self._row(position, entry) for position, entry in enumerate(islice(self.entries, k))]
+
+    def window(self, top, user_id, around):
+        """Top `top` rows plus `around` positions either side of user_id, ordered by position"""
+        positions = set(range(min(top, len(self.entries))))
+        if around > 0 and user_id in self.scores:
+            index = self.entries.index(self.sort_key(self.scores[user_id][0]) + (user_id,))
+            positions.update(range(max(index - around, 0), min(index + around + 1, len(self.entries))))
+        return [self._row(position, self.entries[position]) for position in sorted(positions)]
+
+_cache = OrderedDict()  # challenge_id -> ChallengeLeaderboard, least recently used first
+_lock = threading.Lock()
+
+def _load(challenge):
+    rows = db.session.query(
+        ChallengeParticipant.user_id, User.name, ChallengeParticipant.progress_value
+    ).join(User, User.id == ChallengeParticipant.user_id).filter(
+        ChallengeParticipant.challenge_id == challenge.id
+    ).all()
+    board = ChallengeLeaderboard(challenge.challenge_type, challenge.leaderboard_version or 0)
+    for user_id, user_name, progress_value in rows:
+        board.set(user_id, progress_value, user_name)
+    return board
+
+def _get_board(challenge):
+    """Cached leaderboard for a loaded Challenge, rebuilt if its version moved on.
+
+    Only read the board while holding _lock; _apply patches it in place.
+    """
+    version = challenge.leaderboard_version or 0
+    with _lock:
+        board = _cache.get(challenge.id)
+        if board is not None and board.version == version:
+            _cache.move_to_end(challenge.id)
+            return board
+
+    board = _load(challenge)
+    with _lock:
+        _cache[challenge.id] = board
+        _cache.move_to_end(challenge.id)
+        while len(_cache) > MAX_CACHED_CHALLENGES:
+            _cache.popitem(last=False)
+    return board
+
+def window(challenge, top, user_id, around):
+    """(participant count, rows) for the top `top` plus `around` positions either side of user_id"""
+    board = _get_board(challenge)
+    with _lock:
+        return len(board), board.window(top, user_id, around)
+
+def rows(challenge):
+    """Every participant's row, best first"""
+    board = _get_board(challenge)
+    with _lock:
+        return board.top(len(board))
+
+def _bump_version(challenge_id):
+    db.session.execute(
+        update(Challenge).where(Challenge.id == challenge_id)
+        .values(leaderboard_version=func.coalesce(Challenge.leaderboard_version, 0) + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return db.session.execute(
+        select(Challenge.leaderboard_version).where(Challenge.id == challenge_id)
+    ).scalar()
+
+def _queue(change):
+    db.session.info.setdefault(_PENDING_KEY, []).append(change)
+
+def progress_changed(challenge_id, user_id, progress_value, user_name=None):
+    """Record a participant's new progress in the current transaction (cache is patched on commit)"""
+    version = _bump_version(challenge_id)
+    _queue(('set', challenge_id, version, user_id, progress_value, user_name))
+
+def participant_removed(challenge_id, user_id):
+    version = _bump_version(challenge_id)
+    _queue(('remove', challenge_id, version, user_id, None, None))
+
+def challenge_changed(challenge_id):
+    """Invalidate a challenge's leaderboard everywhere (edits, completion, bulk recompute)"""
+    version = _bump_version(challenge_id)
+    _queue(('invalidate', challenge_id, version, None, None, None))
+
+def _apply(change):
+    action, challenge_id, version, user_id, progress_value, user_name = change
+    with _lock:
+        board = _cache.get(challenge_id)
+        if board is None:
+            return
+        if action == 'invalidate' or board.version != version - 1:
+            # Missed an intermediate change (or a full invalidation) - reload on next read
+            del _cache[challenge_id]
+            return
+        if action == 'remove':
+            board.remove(user_id)
+        else:
+            if user_name is None:
+                user_name = board.scores.get(user_id, (None, None))[1]
+            if user_name is None:
+                del _cache[challenge_id]
+                return
+            board.set(user_id, progress_value, user_name)
+        board.version = version
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session):
+    for change in session.info.pop(_PENDING_KEY, []):
+        _apply(change)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
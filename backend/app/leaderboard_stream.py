@@ -0,0 +1,162 @@
+"""Server-sent leaderboard updates.
+
+One publisher thread per worker checks every challenge that has subscribers once per
+PUBLISH_INTERVAL_SECONDS. If its Challenge.leaderboard_version moved on (every standings
+change bumps it, whichever worker made it) the rank diff is computed once,
+serialized once, and handed to every subscriber of that challenge. Bursts of updates
+inside one interval therefore reach clients as a single event.
+
+EventSource can't send an Authorization header, so clients connect with a stream token
+from create_token() in the query string: it is signed, only valid for one challenge's
+stream and expires after STREAM_TOKEN_MAX_AGE, so one leaked through a URL or log is
+worth little.
+"""
+import json
+import threading
+import time
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from app import leaderboard_cache
+from app.database import db
+from app.models import Challenge
+
+PUBLISH_INTERVAL_SECONDS = 1.0
+# Comment line sent when nothing changed, so proxies don't close idle streams
+KEEPALIVE_SECONDS = 15
+# Stream tokens only need to live until the EventSource connects
+STREAM_TOKEN_MAX_AGE = 60
+
+class _Channel:
+    def __init__(self, version, snapshot):
+        self.subscribers = 0
+        self.version = version
+        self.snapshot = snapshot  # user_id -> (rank, user_name, progress_value)
+        self.seq = 0
+        self.message = None  # latest serialized event, shared by all subscribers
+
+_channels = {}  # challenge_id -> _Channel
+_lock = threading.Lock()
+_changed = threading.Condition(_lock)
+_publisher = None
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='leaderboard-stream')
+
+def create_token(user_id, challenge_id):
+    """Short-lived token that only opens challenge_id's leaderboard stream"""
+    return _serializer().dumps({'user_id': user_id, 'challenge_id': challenge_id})
+
+def verify_token(token, challenge_id):
+    """User id from a stream token for challenge_id, or None if it is invalid or expired"""
+    try:
+        data = _serializer().loads(token, max_age=STREAM_TOKEN_MAX_AGE)
+    except BadSignature:
+        return None
+    if data.get('challenge_id') != challenge_id:
+        return None
+    return data.get('user_id')
+
+def _snapshot(challenge):
+    return {row.user_id: (row.rank, row.user_name, row.progress_value) for row in leaderboard_cache.rows(challenge)}
+
+def _diff(challenge, before, after):
+    changed = [{
+        'rank': rank,
+        'user_id': user_id,
+        'user_name': user_name,
+        'progress_value': progress_value,
+        'progress_percentage': round(progress_value / challenge.goal_value * 100, 1) if challenge.goal_value > 0 else 0
+    } for user_id, (rank, user_name, progress_value) in after.items() if before.get(user_id) != (rank, user_name, progress_value)]
+    changed.sort(key=lambda entry: (entry['rank'], entry['user_id']))
+    removed = [user_id for user_id in before if user_id not in after]
+    return changed, removed
+
+def _format_event(seq, event, payload):
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+def _publish_once():
+    with _lock:
+        watched = {challenge_id: channel.version for challenge_id, channel in _channels.items()}
+    if not watched:
+        return
+
+    challenges = Challenge.query.filter(Challenge.id.in_(list(watched))).all()
+    for challenge in challenges:
+        if (challenge.leaderboard_version or 0) == watched[challenge.id]:
+            continue
+
+        after = _snapshot(challenge)
+        with _lock:
+            channel = _channels.get(challenge.id)
+            if channel is None:
+                continue
+            changed, removed = _diff(challenge, channel.snapshot, after)
+            channel.snapshot = after
+            channel.version = challenge.leaderboard_version or 0
+            if not changed and not removed:
+                continue
+            channel.seq += 1
+            channel.message = _format_event(channel.seq, 'leaderboard', {
+                'challenge_id': challenge.id,
+                'participant_count': len(after),
+                'changed': changed,
+                'removed': removed
+            })
+        with _changed:
+            _changed.notify_all()
+
+def _run_publisher(app):
+    while True:
+        time.sleep(PUBLISH_INTERVAL_SECONDS)
+        with app.app_context():
+            try:
+                _publish_once()
+            except Exception as e:
+                print(f"Error publishing leaderboard updates: {e}")
+            finally:
+                db.session.remove()
+
+def _ensure_publisher(app):
+    global _publisher
+    with _lock:
+        if _publisher is None or not _publisher.is_alive():
+            _publisher = threading.Thread(target=_run_publisher, args=(app,), daemon=True)
+            _publisher.start()
+
+def subscribe(app, challenge):
+    """Event stream generator for a loaded challenge's leaderboard"""
+    _ensure_publisher(app)
+    return _stream(challenge.id, challenge.leaderboard_version or 0, _snapshot(challenge))
+
+def _stream(challenge_id, version, snapshot):
+    # Registered once the server starts sending, so a client that is gone before then
+    # never leaves a subscriber behind
+    with _lock:
+        channel = _channels.get(challenge_id)
+        if channel is None:
+            channel = _channels[challenge_id] = _Channel(version, snapshot)
+        channel.subscribers += 1
+        seq = channel.seq
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            with _changed:
+                _changed.wait_for(lambda: channel.seq != seq, timeout=KEEPALIVE_SECONDS)
+                message, latest = channel.message, channel.seq
+            if latest == seq:
+                yield ': keepalive\n\n'
+                continue
+            # A slow client that missed intermediate events only gets the latest one, so
+            # tell it to resync when it fell behind
+            if latest != seq + 1:
+                yield _format_event(latest, 'resync', {'challenge_id': challenge_id})
+            else:
+                yield message
+            seq = latest
+    finally:
+        with _lock:
+            channel.subscribers -= 1
+            if channel.subscribers == 0 and _channels.get(challenge_id) is channel:
+                del _channels[challenge_id]
@@ -42,6 +42,8 @@ class Club(db.Model):
     location = db.Column(db.String(200))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='active', server_default='active')  # 'active', 'deleting'
+    activity_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped whenever the club's feed changes
     
     # Relationships
     scheduled_runs = db.relationship('ScheduledRun', backref='club', lazy=True, cascade='all, delete-orphan')
@@ -50,7 +52,8 @@ class Club(db.Model):
 # Association table for run-club tagging
 run_clubs = db.Table('run_clubs',
     db.Column('run_id', db.Integer, db.ForeignKey('run.id'), primary_key=True),
-    db.Column('club_id', db.Integer, db.ForeignKey('club.id'), primary_key=True)
+    db.Column('club_id', db.Integer, db.ForeignKey('club.id'), primary_key=True),
+    db.Index('ix_run_clubs_club_run', 'club_id', 'run_id')
 )
 
 # Association table for run-challenge tagging
@@ -79,6 +82,8 @@ class Run(db.Model):
     tagged_challenges = db.relationship('Challenge', secondary=run_challenges, backref='tagged_runs', lazy='dynamic')
     tagged_scheduled_runs = db.relationship('ScheduledRun', secondary=run_scheduled_runs, backref='tagged_runs', lazy='dynamic')
     
+    __table_args__ = (db.Index('ix_run_user_date', 'user_id', 'date'),)
+    
 class ScheduledRun(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     club_id = db.Column(db.Integer, db.ForeignKey('club.id'), nullable=False)
@@ -107,8 +112,32 @@ class Activity(db.Model):
     activity_type = db.Column(db.String(50), nullable=False)  # 'run', 'join_club', 'schedule_run'
     description = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # What the activity is about; set when it is written (the run or scheduled run may be deleted later)
+    run_id = db.Column(db.Integer, db.ForeignKey('run.id', ondelete='SET NULL'), nullable=True)
+    scheduled_run_id = db.Column(db.Integer, db.ForeignKey('scheduled_run.id', ondelete='SET NULL'), nullable=True)
+    # Number of members a compacted row stands for ("25 members joined the club"); NULL for a single activity
+    aggregate_count = db.Column(db.Integer, nullable=True)
     
     user = db.relationship('User', backref='activities')
+    
+    # Club feeds are paged newest-first per activity type
+    __table_args__ = (db.Index('ix_activity_club_type_created', 'club_id', 'activity_type', 'created_at', 'id'),)
+
+class ActivityArchive(db.Model):
+    """Activities older than the retention window, moved out of the activity table"""
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # The original Activity.id
+    club_id = db.Column(db.Integer, db.ForeignKey('club.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    activity_type = db.Column(db.String(50), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime)
+    # Not foreign keys: the run or scheduled run may be deleted after archiving
+    run_id = db.Column(db.Integer, nullable=True)
+    scheduled_run_id = db.Column(db.Integer, nullable=True)
+    aggregate_count = db.Column(db.Integer, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (db.Index('ix_activity_archive_club_created', 'club_id', 'created_at', 'id'),)
 
 class Challenge(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -116,11 +145,14 @@ class Challenge(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    challenge_type = db.Column(db.String(50), nullable=False)  # 'weekly_mileage', 'fastest_5k', 'total_distance', 'total_time'
+    challenge_type = db.Column(db.String(50), nullable=False)  # A key of challenge_types.CHALLENGE_TYPES
     goal_value = db.Column(db.Float, nullable=False)  # Goal in km, minutes, etc.
     start_date = db.Column(db.DateTime, nullable=False)
     end_date = db.Column(db.DateTime, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    leaderboard_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped on every standings change
+    finalized_at = db.Column(db.DateTime)  # Set once final ranks are written to ChallengeResult
+    progress_stale_since = db.Column(db.DateTime)  # Set when dates change until progress is recomputed; blocks finalizing
     
     # Relationships
     participants = db.relationship('ChallengeParticipant', backref='challenge', lazy=True, cascade='all, delete-orphan')
@@ -148,12 +180,122 @@ class ChallengeProgressEntry(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     progress_value = db.Column(db.Float, nullable=False)  # Progress added in this entry
     notes = db.Column(db.Text)
-    image_url = db.Column(db.Text)  # Base64 encoded image or URL
+    # Legacy base64 image, moved to the blob store by migrate_progress_images.py; deferred so
+    # loading an entry never pulls it in unless it is accessed
+    image_url = db.deferred(db.Column(db.Text))
+    image_hash = db.Column(db.String(64))  # SHA-256 of the image in the blob store
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     challenge = db.relationship('Challenge', backref='progress_entries')
     user = db.relationship('User', backref='challenge_progress_entries')
+    
+    # History is paged newest-first per challenge, optionally per participant
+    __table_args__ = (
+        db.Index('ix_progress_entry_challenge_created', 'challenge_id', 'created_at', 'id'),
+        db.Index('ix_progress_entry_challenge_user_created', 'challenge_id', 'user_id', 'created_at', 'id'),
+    )
+
+class ClubStanding(db.Model):
+    """Final leaderboard standings of a club for a closed period (week or month)"""
+    id = db.Column(db.Integer, primary_key=True)
+    club_id = db.Column(db.Integer, db.ForeignKey('club.id'), nullable=False)
+    period_type = db.Column(db.String(10), nullable=False)  # 'week', 'month'
+    period_start = db.Column(db.DateTime, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+    total_distance_km = db.Column(db.Float, nullable=False, default=0.0)
+    total_duration_minutes = db.Column(db.Float, nullable=False, default=0.0)
+    run_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    user = db.relationship('User')
+    
+    __table_args__ = (
+        db.UniqueConstraint('club_id', 'period_type', 'period_start', 'user_id', name='_club_standing_uc'),
+        db.Index('ix_club_standing_period', 'club_id', 'period_type', 'period_start'),
+    )
+
+class ClubStats(db.Model):
+    """Running totals for a club, maintained incrementally as runs are attributed to it (run_clubs)"""
+    club_id = db.Column(db.Integer, db.ForeignKey('club.id'), primary_key=True)
+    total_distance_km = db.Column(db.Float, nullable=False, default=0.0)
+    total_duration_minutes = db.Column(db.Float, nullable=False, default=0.0)
+    run_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ClubDailyStats(db.Model):
+    """Per-day club totals plus the members who ran that day, encoded as member_encoding says:
+    'bitset' (bit i = user id bitset_base + i) or 'ids' (sorted user ids as varint deltas)"""
+    club_id = db.Column(db.Integer, db.ForeignKey('club.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    distance_km = db.Column(db.Float, nullable=False, default=0.0)
+    duration_minutes = db.Column(db.Float, nullable=False, default=0.0)
+    run_count = db.Column(db.Integer, nullable=False, default=0)
+    active_members = db.Column(db.Integer, nullable=False, default=0)
+    member_encoding = db.Column(db.String(10), nullable=False, default='bitset', server_default='bitset')
+    bitset_base = db.Column(db.Integer, nullable=False, default=0)
+    member_bitset = db.Column(db.LargeBinary, nullable=False, default=b'')
+
+class ClubDeletionJob(db.Model):
+    """Progress of a background club deletion (kept after the club row itself is gone)"""
+    id = db.Column(db.Integer, primary_key=True)
+    club_id = db.Column(db.Integer, nullable=False, index=True)  # No FK - the club is deleted at the end
+    requested_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'running', 'completed', 'failed'
+    current_step = db.Column(db.String(50))
+    deleted_rows = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+class ImportJob(db.Model):
+    """A bulk user import running in the background, committed chunk by chunk"""
+    id = db.Column(db.Integer, primary_key=True)
+    requested_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255))
+    file_path = db.Column(db.String(500))  # Stored upload; removed once the job finishes
+    file_format = db.Column(db.String(10), nullable=False, default='xlsx')  # 'xlsx', 'csv', 'jsonl'
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'running', 'completed', 'failed'
+    checkpoint_row = db.Column(db.Integer, nullable=False, default=1)  # Last row committed (1 = header; 0 for JSON Lines)
+    created_count = db.Column(db.Integer, nullable=False, default=0)
+    skipped_count = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+class ImportJobIssue(db.Model):
+    """A row of an import that was skipped or failed validation"""
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('import_job.id'), nullable=False)
+    row_index = db.Column(db.Integer, nullable=False)  # Row number (header is row 1), or line number for JSON Lines
+    kind = db.Column(db.String(20), nullable=False)  # 'skipped', 'error'
+    email = db.Column(db.String(120))
+    message = db.Column(db.Text, nullable=False)
+    
+    __table_args__ = (db.Index('ix_import_job_issue_job_row', 'job_id', 'row_index', 'id'),)
+
+class ChallengeResult(db.Model):
+    """Final rank of a participant, frozen when the challenge ends"""
+    id = db.Column(db.Integer, primary_key=True)
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenge.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+    progress_value = db.Column(db.Float, nullable=False, default=0.0)
+    finalized_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('challenge_id', 'user_id', name='_challenge_result_user_uc'),)
+
+class UserBadges(db.Model):
+    """Gold/silver/bronze counts per user, incremented as challenges are finalized"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    gold = db.Column(db.Integer, nullable=False, default=0)
+    silver = db.Column(db.Integer, nullable=False, default=0)
+    bronze = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class LiveRunSession(db.Model):
     id = db.Column(db.Integer, primary_key=True)
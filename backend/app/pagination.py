@@ -0,0 +1,32 @@
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(*values):
+    """Encode the sort key of the last row on a page into an opaque cursor string"""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor. Returns a list of values or None if invalid"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        return None
+    return values if isinstance(values, list) else None
+
+def get_page_size(args, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Read ?limit= from request args, clamped to [1, maximum]"""
+    limit = args.get('limit', default, type=int)
+    if limit is None or limit < 1:
+        return default
+    return min(limit, maximum)
+
+def escape_like(value):
+    """Escape LIKE wildcards so user input is matched literally (use with escape='\\')"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
@@ -0,0 +1,74 @@
+"""Password hashing in a process pool.
+
+generate_password_hash is deliberately CPU-expensive, so hashing thousands of
+passwords serially pins one core and holds the request thread for minutes. Bulk
+imports hash in a pool of processes sized to the available cores instead, fed in
+chunks and returned in input order.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash
+
+# Below this many passwords the pool's overhead isn't worth it
+MIN_PARALLEL = 16
+# Chunks handed to each worker process per batch, for load balancing
+CHUNKS_PER_WORKER = 4
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def create_pool(workers=None):
+    # Gunicorn workers are multi-threaded, so don't fork them directly
+    start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(
+        max_workers=workers or available_cores(),
+        mp_context=multiprocessing.get_context(start_method)
+    )
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = create_pool()
+        return _pool
+
+def _reset_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+def _hash_in_pool(pool, passwords, chunksize):
+    try:
+        yield from pool.map(generate_password_hash, passwords, chunksize=chunksize)
+    except BrokenProcessPool:
+        # A worker process died; start a fresh pool next time
+        _reset_pool(pool)
+        raise
+
+def hash_passwords(passwords, pool=None, workers=None):
+    """Hashes of passwords, in the same order, as an iterator.
+
+    Uses the shared pool sized to the available cores unless pool (with its worker
+    count) is given.
+    """
+    passwords = list(passwords)
+    workers = workers or available_cores()
+    if pool is None:
+        if len(passwords) < MIN_PARALLEL or workers == 1:
+            return map(generate_password_hash, passwords)
+        pool = _get_pool()
+
+    chunksize = max(1, len(passwords) // (workers * CHUNKS_PER_WORKER))
+    return _hash_in_pool(pool, passwords, chunksize)
@@ -1,8 +1,17 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, send_file
 from app.database import db
 from app.models import Challenge, ChallengeParticipant, ChallengeProgressEntry, User, Club, Run, Activity, club_members, club_admins
+from app.routes.clubs import get_active_club
+from app.challenge_leaderboard import serialize_entry, DEFAULT_TOP, DEFAULT_AROUND, MAX_TOP, MAX_AROUND
+from app import blob_store, challenge_progress, challenge_results, held_requests, leaderboard_cache, leaderboard_stream
+from app.challenge_types import CHALLENGE_TYPES, get_challenge_type
+from app.jobs import run_in_background
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
+import os
+from app.pagination import encode_cursor, decode_cursor, get_page_size
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import aliased
 
 def is_club_admin(club_id, user_id):
     """Check if a user is an admin of a club (creator or in club_admins table)"""
@@ -33,7 +42,7 @@ def get_club_challenges(club_id):
         return response, 401
     
     # Verify club exists
-    club = Club.query.get(club_id)
+    club = get_active_club(club_id)
     if not club:
         response = jsonify({'error': 'Club not found'})
         response.headers.add('Access-Control-Allow-Origin', '*')
@@ -49,44 +58,95 @@ def get_club_challenges(club_id):
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 403
     
-    # Get all challenges for the club
-    challenges = Challenge.query.filter_by(club_id=club_id).order_by(Challenge.created_at.desc()).all()
+    response = jsonify(list_challenges(user_id, [club_id]))
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response, 200
+
+@challenges_bp.route('', methods=['GET'])
+@jwt_required()
+def get_challenges_for_clubs():
+    """Get challenges for several clubs in one request (?club_ids=1,2,3; defaults to all of the user's clubs)"""
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    except Exception as e:
+        response = jsonify({'error': 'Invalid or expired token', 'details': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
     
-    challenges_data = []
-    for challenge in challenges:
-        # Get participant count
-        participant_count = ChallengeParticipant.query.filter_by(challenge_id=challenge.id).count()
-        
-        # Check if current user is participating
-        user_participation = ChallengeParticipant.query.filter_by(
-            challenge_id=challenge.id, user_id=user_id
-        ).first()
-        
-        # Get creator info
-        creator = User.query.get(challenge.created_by)
-        
-        challenges_data.append({
-            'id': challenge.id,
-            'title': challenge.title,
-            'description': challenge.description,
-            'challenge_type': challenge.challenge_type,
-            'goal_value': challenge.goal_value,
-            'start_date': challenge.start_date.isoformat(),
-            'end_date': challenge.end_date.isoformat(),
-            'created_at': challenge.created_at.isoformat(),
-            'participant_count': participant_count,
-            'is_participating': user_participation is not None,
-            'user_progress': user_participation.progress_value if user_participation else 0,
-            'created_by': {
-                'id': creator.id if creator else None,
-                'name': creator.name if creator else 'Unknown'
-            }
-        })
+    club_ids_param = request.args.get('club_ids', '').strip()
+    try:
+        requested_ids = {int(value) for value in club_ids_param.split(',') if value.strip()}
+    except ValueError:
+        response = jsonify({'error': 'club_ids must be a comma-separated list of integers'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 400
     
-    response = jsonify(challenges_data)
+    # Only clubs the user is a member of (silently drops the others)
+    member_clubs = db.session.query(club_members.c.club_id).join(
+        Club, Club.id == club_members.c.club_id
+    ).filter(
+        club_members.c.user_id == user_id,
+        Club.status != 'deleting'
+    )
+    if requested_ids:
+        member_clubs = member_clubs.filter(club_members.c.club_id.in_(requested_ids))
+    club_ids = [row.club_id for row in member_clubs.all()]
+    
+    response = jsonify(list_challenges(user_id, club_ids) if club_ids else [])
     response.headers.add('Access-Control-Allow-Origin', '*')
     return response, 200
 
+def list_challenges(user_id, club_ids):
+    """Challenges of the given clubs with participant counts, the user's progress and creator names, in one query"""
+    participant_counts = db.session.query(
+        ChallengeParticipant.challenge_id,
+        func.count(ChallengeParticipant.id).label('participant_count')
+    ).join(
+        Challenge, Challenge.id == ChallengeParticipant.challenge_id
+    ).filter(
+        Challenge.club_id.in_(club_ids)
+    ).group_by(ChallengeParticipant.challenge_id).subquery()
+    
+    my_participation = aliased(ChallengeParticipant)
+    creator = aliased(User)
+    rows = db.session.query(
+        Challenge,
+        func.coalesce(participant_counts.c.participant_count, 0),
+        my_participation.id,
+        my_participation.progress_value,
+        creator.id,
+        creator.name
+    ).outerjoin(
+        participant_counts, participant_counts.c.challenge_id == Challenge.id
+    ).outerjoin(
+        my_participation,
+        (my_participation.challenge_id == Challenge.id) & (my_participation.user_id == user_id)
+    ).outerjoin(
+        creator, creator.id == Challenge.created_by
+    ).filter(
+        Challenge.club_id.in_(club_ids)
+    ).order_by(Challenge.created_at.desc()).all()
+    
+    return [{
+        'id': challenge.id,
+        'club_id': challenge.club_id,
+        'title': challenge.title,
+        'description': challenge.description,
+        'challenge_type': challenge.challenge_type,
+        'goal_value': challenge.goal_value,
+        'start_date': challenge.start_date.isoformat(),
+        'end_date': challenge.end_date.isoformat(),
+        'created_at': challenge.created_at.isoformat(),
+        'participant_count': participant_count,
+        'is_participating': participation_id is not None,
+        'user_progress': progress_value if participation_id is not None else 0,
+        'created_by': {
+            'id': creator_id,
+            'name': creator_name if creator_id else 'Unknown'
+        }
+    } for challenge, participant_count, participation_id, progress_value, creator_id, creator_name in rows]
+
 @challenges_bp.route('/club/<int:club_id>', methods=['POST'])
 @jwt_required()
 def create_challenge(club_id):
@@ -107,7 +167,7 @@ def create_challenge(club_id):
         return response, 400
     
     # Verify club exists
-    club = Club.query.get(club_id)
+    club = get_active_club(club_id)
     if not club:
         response = jsonify({'error': 'Club not found'})
         response.headers.add('Access-Control-Allow-Origin', '*')
@@ -134,9 +194,8 @@ def create_challenge(club_id):
         return response, 400
     
     # Validate challenge type
-    valid_types = ['weekly_mileage', 'fastest_5k', 'total_distance', 'total_time']
-    if data['challenge_type'] not in valid_types:
-        response = jsonify({'error': f'Invalid challenge type. Must be one of: {", ".join(valid_types)}'})
+    if data['challenge_type'] not in CHALLENGE_TYPES:
+        response = jsonify({'error': f'Invalid challenge type. Must be one of: {", ".join(CHALLENGE_TYPES)}'})
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 400
     
@@ -283,6 +342,7 @@ def leave_challenge(challenge_id):
     ).delete()
     
     db.session.delete(participant)
+    leaderboard_cache.participant_removed(challenge_id, user_id)
     db.session.commit()
     
     response = jsonify({'message': 'Successfully left challenge'})
@@ -292,7 +352,11 @@ def leave_challenge(challenge_id):
 @challenges_bp.route('/<int:challenge_id>/leaderboard', methods=['GET'])
 @jwt_required()
 def get_leaderboard(challenge_id):
-    """Get leaderboard for a challenge"""
+    """Get leaderboard for a challenge.
+
+    Query params: limit (top entries, default 25), around (positions either side of the
+    current user to include as well, default 5; 0 disables).
+    """
     try:
         user_id_str = get_jwt_identity()
         user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
@@ -307,87 +371,186 @@ def get_leaderboard(challenge_id):
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 404
     
-    # Get all participants
-    participants = ChallengeParticipant.query.filter_by(challenge_id=challenge_id).all()
-    
-    # Sort by progress (descending for distance/time, ascending for fastest_5k)
-    if challenge.challenge_type == 'fastest_5k':
-        participants.sort(key=lambda p: p.progress_value if p.progress_value > 0 else float('inf'))
-    else:
-        participants.sort(key=lambda p: p.progress_value, reverse=True)
-    
-    leaderboard = []
-    for rank, participant in enumerate(participants, 1):
-        user = User.query.get(participant.user_id)
-        if not user:
-            continue
-        
-        progress_percentage = (participant.progress_value / challenge.goal_value * 100) if challenge.goal_value > 0 else 0
-        
-        leaderboard.append({
-            'rank': rank,
-            'user_id': user.id,
-            'user_name': user.name,
-            'progress_value': participant.progress_value,
-            'progress_percentage': round(progress_percentage, 1),
-            'is_current_user': user.id == user_id
-        })
+    top = min(max(request.args.get('limit', DEFAULT_TOP, type=int) or DEFAULT_TOP, 1), MAX_TOP)
+    around = request.args.get('around', DEFAULT_AROUND, type=int)
+    around = DEFAULT_AROUND if around is None else min(max(around, 0), MAX_AROUND)
+    
+    # Served from the in-memory ranking (reloaded only if the challenge's leaderboard_version moved on)
+    participant_count, rows = leaderboard_cache.window(challenge, top, user_id, around)
+    leaderboard = [serialize_entry(row, challenge, user_id) for row in rows]
     
     response = jsonify({
         'challenge_id': challenge_id,
         'challenge_title': challenge.title,
         'challenge_type': challenge.challenge_type,
         'goal_value': challenge.goal_value,
-        'leaderboard': leaderboard
+        'participant_count': participant_count,
+        'leaderboard': leaderboard,
+        'current_user': next((entry for entry in leaderboard if entry['is_current_user']), None)
     })
     response.headers.add('Access-Control-Allow-Origin', '*')
     return response, 200
 
-def update_challenge_progress(challenge_id, user_id):
-    """Update a user's progress in a challenge based on their runs"""
+@challenges_bp.route('/<int:challenge_id>/leaderboard/stream-token', methods=['POST'])
+@jwt_required()
+def create_leaderboard_stream_token(challenge_id):
+    """Get a short-lived token for opening the challenge's leaderboard stream"""
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    except Exception as e:
+        response = jsonify({'error': 'Invalid or expired token', 'details': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
+    
     challenge = Challenge.query.get(challenge_id)
     if not challenge:
-        return
+        response = jsonify({'error': 'Challenge not found'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 404
     
-    participant = ChallengeParticipant.query.filter_by(
-        challenge_id=challenge_id, user_id=user_id
-    ).first()
+    response = jsonify({
+        'token': leaderboard_stream.create_token(user_id, challenge_id),
+        'expires_in': leaderboard_stream.STREAM_TOKEN_MAX_AGE
+    })
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response, 200
+
+@challenges_bp.route('/<int:challenge_id>/leaderboard/stream', methods=['GET'])
+def stream_leaderboard(challenge_id):
+    """Server-sent events with leaderboard rank changes, at most one event per second.
+
+    EventSource can't set headers, so the stream is opened with ?token= from
+    POST /leaderboard/stream-token rather than the access token. Each 'leaderboard' event
+    carries the rows whose rank or progress changed and the user ids that left; a
+    'resync' event means updates were skipped and the client should refetch. Answers
+    503 with Retry-After when too many streams are open.
+    """
+    if leaderboard_stream.verify_token(request.args.get('token', ''), challenge_id) is None:
+        response = jsonify({'error': 'Invalid or expired stream token'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
     
-    if not participant:
-        return
+    challenge = Challenge.query.get(challenge_id)
+    if not challenge:
+        response = jsonify({'error': 'Challenge not found'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 404
     
-    # Get runs within challenge date range
-    runs = Run.query.filter(
-        Run.user_id == user_id,
-        Run.date >= challenge.start_date,
-        Run.date <= challenge.end_date
-    ).all()
+    if not held_requests.acquire():
+        return held_requests.busy_response()
+    try:
+        events = leaderboard_stream.subscribe(current_app._get_current_object(), challenge)
+    except Exception:
+        held_requests.release()
+        raise
+    # The stream outlives this request's use of the database
+    db.session.remove()
+    
+    response = Response(events, mimetype='text/event-stream')
+    # Runs when the server closes the response, even if the stream never started
+    response.call_on_close(held_requests.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
+@challenges_bp.route('/<int:challenge_id>/entries', methods=['GET'])
+@jwt_required()
+def get_progress_entries(challenge_id):
+    """Get a page of a challenge's progress entries, newest first.
+
+    Query params: user_id (only that participant's entries), limit (default 50, max 200),
+    cursor (next_cursor from the previous page). Images are returned as blob store URLs;
+    the legacy inline image column is never loaded.
+    """
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    except Exception as e:
+        response = jsonify({'error': 'Invalid or expired token', 'details': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
+    
+    challenge = Challenge.query.get(challenge_id)
+    if not challenge:
+        response = jsonify({'error': 'Challenge not found'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 404
     
-    progress = 0.0
+    is_member = db.session.query(club_members).filter_by(
+        user_id=user_id, club_id=challenge.club_id
+    ).first() is not None
     
-    if challenge.challenge_type == 'weekly_mileage':
-        # Calculate total distance for the week
-        # For simplicity, we'll use total distance in the challenge period
-        progress = sum(run.distance_km for run in runs)
+    if not is_member:
+        response = jsonify({'error': 'You must be a member of the club to view challenge progress'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 403
     
-    elif challenge.challenge_type == 'fastest_5k':
-        # Find fastest 5K (or closest to 5K)
-        fastest_time = None
-        for run in runs:
-            if 4.5 <= run.distance_km <= 5.5:  # Allow 5K ± 500m
-                time_minutes = run.duration_minutes
-                if fastest_time is None or time_minutes < fastest_time:
-                    fastest_time = time_minutes
-        progress = fastest_time if fastest_time else 0
+    limit = get_page_size(request.args)
+    participant_id = request.args.get('user_id', type=int)
+    cursor = request.args.get('cursor')
+    before = decode_cursor(cursor)
+    if cursor:
+        try:
+            before_created_at, before_id = datetime.fromisoformat(before[0]), int(before[1])
+        except (TypeError, ValueError, IndexError):
+            response = jsonify({'error': 'Invalid cursor'})
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response, 400
     
-    elif challenge.challenge_type == 'total_distance':
-        progress = sum(run.distance_km for run in runs)
+    query = db.session.query(
+        ChallengeProgressEntry.id,
+        ChallengeProgressEntry.user_id,
+        User.name.label('user_name'),
+        ChallengeProgressEntry.progress_value,
+        ChallengeProgressEntry.notes,
+        ChallengeProgressEntry.image_hash,
+        ChallengeProgressEntry.created_at
+    ).join(
+        User, User.id == ChallengeProgressEntry.user_id
+    ).filter(
+        ChallengeProgressEntry.challenge_id == challenge_id
+    )
     
-    elif challenge.challenge_type == 'total_time':
-        progress = sum(run.duration_minutes for run in runs)
+    if participant_id is not None:
+        query = query.filter(ChallengeProgressEntry.user_id == participant_id)
     
-    participant.progress_value = progress
-    db.session.commit()
+    if cursor:
+        query = query.filter(
+            tuple_(ChallengeProgressEntry.created_at, ChallengeProgressEntry.id) < tuple_(before_created_at, before_id)
+        )
+    
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(
+        ChallengeProgressEntry.created_at.desc(), ChallengeProgressEntry.id.desc()
+    ).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    entries = [{
+        'id': row.id,
+        'user_id': row.user_id,
+        'user_name': row.user_name,
+        'progress_value': row.progress_value,
+        'notes': row.notes,
+        'image_url': blob_store.image_url(row.image_hash),
+        'thumbnail_url': blob_store.image_url(row.image_hash, thumbnail=True),
+        'created_at': row.created_at.isoformat() if row.created_at else None
+    } for row in rows]
+    
+    next_cursor = encode_cursor(rows[-1].created_at.isoformat(), rows[-1].id) if has_more else None
+    
+    response = jsonify({
+        'entries': entries,
+        'next_cursor': next_cursor
+    })
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response, 200
+
+def update_challenge_progress(challenge_id, user_id):
+    """Update a user's progress in a challenge based on their runs"""
+    challenge_progress.recompute_challenge(challenge_id, [user_id])
 
 @challenges_bp.route('/update-progress', methods=['POST'])
 @jwt_required()
@@ -416,6 +579,76 @@ def update_all_challenge_progress():
     response.headers.add('Access-Control-Allow-Origin', '*')
     return response, 200
 
+@challenges_bp.route('/images', methods=['POST'])
+@jwt_required()
+def upload_image():
+    """Upload a progress image as the raw request body (Content-Type: image/*).
+
+    The body is streamed into the blob store; the returned image_hash is then passed to
+    the track endpoint.
+    """
+    if request.content_length and request.content_length > blob_store.MAX_IMAGE_BYTES:
+        response = jsonify({'error': 'Image too large. Maximum size is 5MB'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 413
+    
+    try:
+        digest = blob_store.save_stream(request.stream)
+    except blob_store.BlobTooLarge as e:
+        response = jsonify({'error': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 413
+    except blob_store.InvalidImage as e:
+        response = jsonify({'error': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 400
+    except Exception as e:
+        import traceback
+        print(f"Error uploading image: {e}")
+        traceback.print_exc()
+        response = jsonify({'error': f'Failed to upload image: {str(e)}'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 500
+    
+    response = jsonify({
+        'image_hash': digest,
+        'image_url': blob_store.image_url(digest),
+        'thumbnail_url': blob_store.image_url(digest, thumbnail=True)
+    })
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response, 201
+
+@challenges_bp.route('/images/<digest>', methods=['GET'])
+def get_image(digest):
+    """Serve a stored image. Blobs never change, so clients may cache them forever.
+
+    No JWT: <img> tags can't send one, and the SHA-256 name is not guessable.
+    """
+    if not blob_store.exists(digest):
+        response = jsonify({'error': 'Image not found'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 404
+    
+    path = blob_store.blob_path(digest)
+    mimetype = blob_store.mimetype_of(digest)
+    if request.args.get('size') == 'thumb':
+        thumbnail = blob_store.thumbnail_path(digest)
+        if os.path.exists(thumbnail):
+            path, mimetype = thumbnail, 'image/jpeg'
+        else:
+            # Not generated yet (or failed) - serve the original without caching the substitute
+            blob_store.schedule_thumbnail(digest)
+            response = send_file(path, mimetype=mimetype, max_age=0)
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response
+    
+    # send_file hands the open file to the server's file wrapper (sendfile where supported)
+    response = send_file(path, mimetype=mimetype, max_age=31536000, etag=digest, conditional=True)
+    response.cache_control.immutable = True
+    response.cache_control.public = True
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
 @challenges_bp.route('/<int:challenge_id>/track', methods=['POST'])
 @jwt_required()
 def track_challenge_progress(challenge_id):
@@ -461,23 +694,28 @@ def track_challenge_progress(challenge_id):
         
         progress_value = float(data['progress_value'])
         notes = data.get('notes')
-        image_data = data.get('image')  # Base64 encoded image
-        
-        # Store image if provided (limit to 5MB to avoid database bloat)
-        image_url = None
-        if image_data:
-            # Remove data URL prefix if present (e.g., "data:image/jpeg;base64,")
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
-            
-            # Decode to check size (approx 4 bytes per 3 base64 chars)
-            image_size = len(image_data) * 3 / 4
-            if image_size > 5 * 1024 * 1024:  # 5MB limit
-                response = jsonify({'error': 'Image too large. Maximum size is 5MB'})
+        
+        challenge_type = get_challenge_type(challenge.challenge_type)
+        new_progress = challenge_type.apply_entry(participant.progress_value or 0.0, progress_value)
+        if new_progress is None:
+            response = jsonify({'error': f'{challenge_type.label} progress is calculated from your runs and cannot be tracked manually'})
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response, 400
+        image_hash = data.get('image_hash')  # From POST /images
+        image_data = data.get('image')  # Base64 encoded image (older clients)
+        
+        if image_hash:
+            if not blob_store.exists(image_hash):
+                response = jsonify({'error': 'Image not found. Upload it first'})
+                response.headers.add('Access-Control-Allow-Origin', '*')
+                return response, 400
+        elif image_data:
+            try:
+                image_hash = blob_store.save_base64(image_data)
+            except (blob_store.BlobTooLarge, blob_store.InvalidImage) as e:
+                response = jsonify({'error': str(e)})
                 response.headers.add('Access-Control-Allow-Origin', '*')
                 return response, 400
-            
-            image_url = image_data  # Store base64 string
         
         # Create progress entry
         entry = ChallengeProgressEntry(
@@ -486,28 +724,22 @@ def track_challenge_progress(challenge_id):
             user_id=user_id,
             progress_value=progress_value,
             notes=notes,
-            image_url=image_url
+            image_hash=image_hash
         )
         
         db.session.add(entry)
         
         # Update participant's total progress
-        # For distance/time challenges: add to total
-        # For fastest_5k: take minimum (handled separately)
-        if challenge.challenge_type == 'fastest_5k':
-            # For fastest 5K, update only if this is faster
-            if participant.progress_value == 0 or progress_value < participant.progress_value:
-                participant.progress_value = progress_value
-        else:
-            # For distance/time challenges, add to existing progress
-            participant.progress_value = participant.progress_value + progress_value
+        participant.progress_value = new_progress
         
+        leaderboard_cache.progress_changed(challenge_id, user_id, participant.progress_value)
         db.session.commit()
         
         response = jsonify({
             'message': 'Progress tracked successfully',
             'entry_id': entry.id,
-            'total_progress': participant.progress_value
+            'total_progress': participant.progress_value,
+            'image_url': blob_store.image_url(entry.image_hash)
         })
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 201
@@ -557,6 +789,9 @@ def complete_challenge(challenge_id):
         challenge.end_date = now
         db.session.commit()
         
+        # Freeze final ranks and award badges
+        run_in_background(challenge_results.finalize_challenge, challenge.id)
+        
         response = jsonify({
             'message': 'Challenge completed successfully',
             'end_date': challenge.end_date.isoformat()
@@ -598,7 +833,8 @@ def delete_challenge(challenge_id):
             response.headers.add('Access-Control-Allow-Origin', '*')
             return response, 403
         
-        # Delete the challenge (cascade will handle related records)
+        # Take back any badges awarded for it, then delete the challenge (cascade will handle related records)
+        challenge_results.unfinalize_challenge(challenge)
         db.session.delete(challenge)
         db.session.commit()
         
@@ -680,8 +916,20 @@ def update_challenge(challenge_id):
             response.headers.add('Access-Control-Allow-Origin', '*')
             return response, 400
         
+        # Final results no longer hold once the dates move; re-finalized after the
+        # recompute if it has still ended (not before, from progress for the old dates)
+        dates_changed = 'start_date' in data or 'end_date' in data
+        if dates_changed:
+            challenge_results.unfinalize_challenge(challenge)
+            challenge.progress_stale_since = datetime.utcnow()
+        
+        leaderboard_cache.challenge_changed(challenge.id)
         db.session.commit()
         
+        # Every participant's progress depends on the date range
+        if dates_changed:
+            run_in_background(_recompute_challenge_job, challenge.id)
+        
         # Get updated challenge data
         participant_count = ChallengeParticipant.query.filter_by(challenge_id=challenge.id).count()
         user_participation = ChallengeParticipant.query.filter_by(
@@ -701,6 +949,7 @@ def update_challenge(challenge_id):
             'participant_count': participant_count,
             'is_participating': user_participation is not None,
             'user_progress': user_participation.progress_value if user_participation else 0,
+            'progress_recalculating': dates_changed,
             'created_by': {
                 'id': creator.id if creator else None,
                 'name': creator.name if creator else 'Unknown'
@@ -716,4 +965,10 @@ def update_challenge(challenge_id):
         traceback.print_exc()
         response = jsonify({'error': f'Failed to update challenge: {str(e)}'})
         response.headers.add('Access-Control-Allow-Origin', '*')
-        return response, 500
\ No newline at end of file
+        return response, 500
+
+def _recompute_challenge_job(challenge_id):
+    challenge_progress.recompute_challenge(challenge_id)
+    challenge = Challenge.query.get(challenge_id)
+    if challenge and challenge.end_date <= datetime.utcnow():
+        challenge_results.finalize_challenge(challenge_id)
@@ -1,7 +1,13 @@
 from flask import Blueprint, request, jsonify
-from app.database import db
-from app.models import Club, User, club_members, club_admins, Activity
+from app.database import db, insert_ignore
+from app.models import Club, ClubDeletionJob, Run, User, club_members, club_admins, run_clubs, Activity
+from app import club_standings, club_stats, exports
+from app.club_deletion import delete_club_data, is_job_active, serialize_job
+from app.jobs import run_in_background
+from app.pagination import encode_cursor, decode_cursor, get_page_size, escape_like
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func, or_, select, tuple_
+from datetime import datetime
 
 clubs_bp = Blueprint('clubs', __name__)
 
@@ -21,6 +27,13 @@ def is_club_admin(club_id, user_id):
     ).first() is not None
     return is_admin
 
+def get_active_club(club_id):
+    """Get a club, treating clubs that are being deleted as not found"""
+    club = Club.query.get(club_id)
+    if not club or club.status == 'deleting':
+        return None
+    return club
+
 @clubs_bp.route('', methods=['GET'])
 @jwt_required()
 def get_clubs():
@@ -42,7 +55,7 @@ def get_clubs():
         return response, 401
     
     try:
-        clubs = Club.query.all()
+        clubs = Club.query.filter(Club.status != 'deleting').all()
         print(f"Found {len(clubs)} clubs in database")
         
         clubs_data = []
@@ -175,28 +188,20 @@ def get_club(club_id):
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 401
     
-    club = Club.query.get(club_id)
+    club = get_active_club(club_id)
     if not club:
         response = jsonify({'error': 'Club not found'})
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 404
     
-    # Get all admin user IDs (creator + club_admins)
-    admin_user_ids = set()
-    admin_user_ids.add(club.created_by)
-    admin_rows = db.session.query(club_admins).filter_by(club_id=club_id).all()
-    for admin_row in admin_rows:
-        admin_user_ids.add(admin_row.user_id)
-    
-    members = []
-    for member in club.members:
-        is_member_admin = member.id in admin_user_ids
-        members.append({
-            'id': member.id,
-            'name': member.name,
-            'email': member.email,
-            'is_admin': is_member_admin
-        })
+    # Only counts here - the member list itself is paged via GET /<club_id>/members
+    member_count = db.session.query(func.count()).select_from(club_members).filter(
+        club_members.c.club_id == club_id
+    ).scalar()
+    admin_count = db.session.query(func.count()).select_from(club_admins).filter(
+        club_admins.c.club_id == club_id,
+        club_admins.c.user_id != club.created_by
+    ).scalar() + 1  # Creator is always an admin
     
     current_user_is_admin = is_club_admin(club_id, user_id)
     
@@ -205,8 +210,8 @@ def get_club(club_id):
         'name': club.name,
         'description': club.description,
         'location': club.location,
-        'members': members,
-        'member_count': len(members),
+        'member_count': member_count,
+        'admin_count': admin_count,
         'created_at': club.created_at.isoformat(),
         'created_by': club.created_by,
         'is_creator': club.created_by == user_id,
@@ -215,6 +220,290 @@ def get_club(club_id):
     response.headers.add('Access-Control-Allow-Origin', '*')
     return response, 200
 
+@clubs_bp.route('/<int:club_id>/members', methods=['GET'])
+@jwt_required()
+def get_club_members(club_id):
+    """Get a page of club members ordered by name.
+
+    Query params: limit (default 50, max 200), cursor (next_cursor from the previous page),
+    q (case-insensitive name prefix). Only id, name and email are loaded from the user table.
+    """
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    except Exception as e:
+        response = jsonify({'error': 'Invalid or expired token', 'details': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
+    
+    club = get_active_club(club_id)
+    if not club:
+        response = jsonify({'error': 'Club not found'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 404
+    
+    limit = get_page_size(request.args)
+    name_prefix = (request.args.get('q') or '').strip()
+    cursor = request.args.get('cursor')
+    after = decode_cursor(cursor)
+    if cursor and (not after or len(after) != 2):
+        response = jsonify({'error': 'Invalid cursor'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 400
+    
+    query = db.session.query(
+        User.id, User.name, User.email, club_admins.c.user_id.label('admin_user_id')
+    ).join(
+        club_members,
+        (club_members.c.user_id == User.id) & (club_members.c.club_id == club_id)
+    ).outerjoin(
+        club_admins,
+        (club_admins.c.user_id == User.id) & (club_admins.c.club_id == club_id)
+    )
+    
+    if name_prefix:
+        query = query.filter(User.name.ilike(f'{escape_like(name_prefix)}%', escape='\\'))
+    
+    if after:
+        after_name, after_id = after
+        query = query.filter(tuple_(User.name, User.id) > tuple_(after_name, after_id))
+    
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(User.name, User.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    members = [{
+        'id': row.id,
+        'name': row.name,
+        'email': row.email,
+        'is_admin': row.id == club.created_by or row.admin_user_id is not None
+    } for row in rows]
+    
+    next_cursor = encode_cursor(rows[-1].name, rows[-1].id) if has_more else None
+    
+    response = jsonify({
+        'members': members,
+        'next_cursor': next_cursor
+    })
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response, 200
+
+def _export_request(club_id, user_id):
+    """(club, export format, error response) for an admin export of a club"""
+    club = get_active_club(club_id)
+    if not club:
+        response = jsonify({'error': 'Club not found'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return None, None, (response, 404)
+    
+    if not is_club_admin(club_id, user_id):
+        response = jsonify({'error': 'Only club admins can export club data'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return None, None, (response, 403)
+    
+    file_format = request.args.get('format', 'csv')
+    if file_format not in exports.MIMETYPES:
+        response = jsonify({'error': 'Invalid format. Use csv or xlsx'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return None, None, (response, 400)
+    return club, file_format, None
+
+@clubs_bp.route('/<int:club_id>/members/export', methods=['GET'])
+@jwt_required()
+def export_club_members(club_id):
+    """Download the club roster, ordered by name (admin only).
+
+    Query params: format (csv or xlsx, default csv). The file is streamed as it is read.
+    """
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    except Exception as e:
+        response = jsonify({'error': 'Invalid or expired token', 'details': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
+    
+    club, file_format, error = _export_request(club_id, user_id)
+    if error:
+        return error
+    
+    rows = exports.stream_rows(
+        select(
+            User.id, User.name, User.email, club_members.c.joined_at,
+            or_(User.id == club.created_by, club_admins.c.user_id.isnot(None))
+        ).join(
+            club_members,
+            (club_members.c.user_id == User.id) & (club_members.c.club_id == club_id)
+        ).outerjoin(
+            club_admins,
+            (club_admins.c.user_id == User.id) & (club_admins.c.club_id == club_id)
+        ).order_by(User.name, User.id)
+    )
+    return exports.export_response(
+        file_format, f'club-{club_id}-members', 'Members',
+        ['id', 'name', 'email', 'joined_at', 'is_admin'], rows
+    ), 200
+
+@clubs_bp.route('/<int:club_id>/runs/export', methods=['GET'])
+@jwt_required()
+def export_club_runs(club_id):
+    """Download every run attributed to the club, oldest first (admin only).
+
+    Query params: format (csv or xlsx, default csv). The file is streamed as it is read.
+    """
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    except Exception as e:
+        response = jsonify({'error': 'Invalid or expired token', 'details': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
+    
+    club, file_format, error = _export_request(club_id, user_id)
+    if error:
+        return error
+    
+    # Ordered along ix_run_clubs_club_run (ids grow with time) so rows stream without a sort
+    rows = exports.stream_rows(
+        select(
+            Run.id, Run.user_id, User.name, Run.date, Run.distance_km,
+            Run.duration_minutes, Run.speed_kmh, Run.notes
+        ).join(
+            run_clubs, (run_clubs.c.run_id == Run.id) & (run_clubs.c.club_id == club_id)
+        ).join(User, User.id == Run.user_id).order_by(run_clubs.c.run_id)
+    )
+    return exports.export_response(
+        file_format, f'club-{club_id}-runs', 'Runs',
+        ['id', 'user_id', 'user_name', 'date', 'distance_km', 'duration_minutes', 'speed_kmh', 'notes'], rows
+    ), 200
+
+@clubs_bp.route('/<int:club_id>/leaderboard', methods=['GET'])
+@jwt_required()
+def get_club_leaderboard(club_id):
+    """Get club standings for a week or month.
+
+    Query params: period ('week' or 'month', default 'week'), offset (periods back from the
+    current one, default 0), limit (max rows returned, default 50).
+    """
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    except Exception as e:
+        response = jsonify({'error': 'Invalid or expired token', 'details': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
+    
+    club = get_active_club(club_id)
+    if not club:
+        response = jsonify({'error': 'Club not found'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 404
+    
+    is_member = db.session.query(club_members).filter_by(
+        user_id=user_id, club_id=club_id
+    ).first() is not None
+    
+    if not is_member:
+        response = jsonify({'error': 'You must be a member of the club to view the leaderboard'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 403
+    
+    period = request.args.get('period', 'week')
+    if period not in club_standings.PERIODS:
+        response = jsonify({'error': f'Invalid period. Must be one of: {", ".join(club_standings.PERIODS)}'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 400
+    
+    offset = request.args.get('offset', 0, type=int)
+    if offset is None or offset < 0:
+        response = jsonify({'error': 'Offset must be a non-negative integer'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 400
+    
+    limit = get_page_size(request.args)
+    
+    try:
+        period_start, period_end, standings = club_standings.get_standings(club_id, period, offset)
+        
+        current_user_entry = next((entry for entry in standings if entry['user_id'] == user_id), None)
+        
+        response = jsonify({
+            'club_id': club_id,
+            'period': period,
+            'period_start': period_start.isoformat(),
+            'period_end': period_end.isoformat(),
+            'is_final': offset > 0,
+            'participant_count': len(standings),
+            'standings': standings[:limit],
+            'current_user': current_user_entry
+        })
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 200
+    except Exception as e:
+        db.session.rollback()
+        import traceback
+        print(f"Error computing club leaderboard: {e}")
+        traceback.print_exc()
+        response = jsonify({'error': f'Failed to compute leaderboard: {str(e)}'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 500
+
+@clubs_bp.route('/<int:club_id>/stats', methods=['GET'])
+@jwt_required()
+def get_club_stats(club_id):
+    """Get club totals and active members for the last 7 days (served from precomputed counters)"""
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    except Exception as e:
+        response = jsonify({'error': 'Invalid or expired token', 'details': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
+    
+    club = get_active_club(club_id)
+    if not club:
+        response = jsonify({'error': 'Club not found'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 404
+    
+    response = jsonify(club_stats.get_stats(club_id))
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response, 200
+
+@clubs_bp.route('/<int:club_id>/stats/rebuild', methods=['POST'])
+@jwt_required()
+def rebuild_club_stats(club_id):
+    """Recompute club stats from run history in the background (admin only)"""
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    except Exception as e:
+        response = jsonify({'error': 'Invalid or expired token', 'details': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
+    
+    club = get_active_club(club_id)
+    if not club:
+        response = jsonify({'error': 'Club not found'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 404
+    
+    if not is_club_admin(club_id, user_id):
+        response = jsonify({'error': 'Only club admins can rebuild club stats'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 403
+    
+    run_in_background(_rebuild_club_stats_job, club_id)
+    
+    response = jsonify({'message': 'Club stats rebuild started'})
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response, 202
+
+def _rebuild_club_stats_job(club_id):
+    club_stats.backfill_run_clubs(club_id)
+    club_stats.rebuild_club_stats(club_id)
+
 @clubs_bp.route('/<int:club_id>/join', methods=['POST'])
 @jwt_required()
 def join_club(club_id):
@@ -227,7 +516,7 @@ def join_club(club_id):
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 401
     
-    club = Club.query.get(club_id)
+    club = get_active_club(club_id)
     if not club:
         response = jsonify({'error': 'Club not found'})
         response.headers.add('Access-Control-Allow-Origin', '*')
@@ -261,6 +550,7 @@ def join_club(club_id):
     db.session.add(activity)
     
     db.session.commit()
+    club_standings.invalidate_club(club.id)
     
     response = jsonify({'message': 'Successfully joined club'})
     response.headers.add('Access-Control-Allow-Origin', '*')
@@ -279,7 +569,7 @@ def leave_club(club_id):
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 401
     
-    club = Club.query.get(club_id)
+    club = get_active_club(club_id)
     if not club:
         response = jsonify({'error': 'Club not found'})
         response.headers.add('Access-Control-Allow-Origin', '*')
@@ -324,6 +614,7 @@ def leave_club(club_id):
     db.session.add(activity)
     
     db.session.commit()
+    club_standings.invalidate_club(club.id)
     
     response = jsonify({'message': 'Successfully left club'})
     response.headers.add('Access-Control-Allow-Origin', '*')
@@ -363,18 +654,29 @@ def delete_club(club_id):
             response.headers.add('Access-Control-Allow-Origin', '*')
             return response, 403
         
-        print(f"Deleting club {club_id} (created by {user_id})")
+        job = ClubDeletionJob.query.filter_by(club_id=club_id).order_by(ClubDeletionJob.id.desc()).first()
+        if club.status == 'deleting' and job and is_job_active(job):
+            # Deletion already in progress
+            response = jsonify({'message': 'Club deletion in progress', 'job': serialize_job(job)})
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response, 202
+        
+        print(f"Scheduling deletion of club {club_id} (created by {user_id})")
         
-        # Delete the club (cascade will handle related records)
-        db.session.delete(club)
+        # Hide the club right away; dependents are removed in batches in the background
+        club.status = 'deleting'
+        job = ClubDeletionJob(club_id=club_id, requested_by=user_id, status='pending')
+        db.session.add(job)
         db.session.commit()
+        club_standings.invalidate_club(club_id)
+        
+        run_in_background(delete_club_data, job.id)
         
-        print(f"Successfully deleted club {club_id}")
         print("="*60 + "\n")
         
-        response = jsonify({'message': 'Club deleted successfully'})
+        response = jsonify({'message': 'Club deletion started', 'job': serialize_job(job)})
         response.headers.add('Access-Control-Allow-Origin', '*')
-        return response, 200
+        return response, 202
         
     except Exception as e:
         db.session.rollback()
@@ -387,6 +689,187 @@ def delete_club(club_id):
         response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization')
         return response, 500
 
+@clubs_bp.route('/<int:club_id>/deletion', methods=['GET'])
+@jwt_required()
+def get_club_deletion_status(club_id):
+    """Get progress of the latest deletion job for a club (requester only)"""
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    except Exception as e:
+        response = jsonify({'error': 'Invalid or expired token', 'details': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
+    
+    job = ClubDeletionJob.query.filter_by(club_id=club_id).order_by(ClubDeletionJob.id.desc()).first()
+    if not job or job.requested_by != user_id:
+        response = jsonify({'error': 'No deletion found for this club'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 404
+    
+    response = jsonify(serialize_job(job))
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response, 200
+
+MAX_BULK_MEMBER_IDS = 5000
+
+@clubs_bp.route('/<int:club_id>/members/bulk', methods=['POST'])
+@jwt_required()
+def bulk_update_members(club_id):
+    """Add, remove, promote and demote many members in one transaction (admin only).
+
+    Body: {"add": [user_id, ...], "remove": [...], "promote": [...], "demote": [...]}
+    Promotions apply to members added in the same request.
+    """
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    except Exception as e:
+        response = jsonify({'error': 'Invalid or expired token', 'details': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
+    
+    club = get_active_club(club_id)
+    if not club:
+        response = jsonify({'error': 'Club not found'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 404
+    
+    if not is_club_admin(club_id, user_id):
+        response = jsonify({'error': 'Only club admins can manage members'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 403
+    
+    data = request.get_json() or {}
+    id_lists = {}
+    for key in ('add', 'remove', 'promote', 'demote'):
+        values = data.get(key) or []
+        if not isinstance(values, list) or not all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+            response = jsonify({'error': f'"{key}" must be a list of user ids'})
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response, 400
+        id_lists[key] = set(values)
+    
+    all_ids = set().union(*id_lists.values())
+    if not all_ids:
+        response = jsonify({'error': 'No user ids provided'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 400
+    if len(all_ids) > MAX_BULK_MEMBER_IDS:
+        response = jsonify({'error': f'At most {MAX_BULK_MEMBER_IDS} user ids per request'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 400
+    if id_lists['add'] & id_lists['remove'] or id_lists['promote'] & id_lists['demote']:
+        response = jsonify({'error': 'A user cannot be both added and removed, or both promoted and demoted'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 400
+    
+    try:
+        # One round trip each for names, current members and current admins of every id involved
+        names = dict(db.session.query(User.id, User.name).filter(User.id.in_(all_ids | {user_id})).all())
+        member_ids = {row.user_id for row in db.session.query(club_members.c.user_id).filter(
+            club_members.c.club_id == club_id, club_members.c.user_id.in_(all_ids)
+        ).all()}
+        admin_ids = {row.user_id for row in db.session.query(club_admins.c.user_id).filter(
+            club_admins.c.club_id == club_id, club_admins.c.user_id.in_(all_ids)
+        ).all()}
+        
+        skipped = []
+        
+        def accept(key, candidates, reason_for):
+            accepted = []
+            for candidate in sorted(candidates):
+                reason = 'User not found' if candidate not in names else reason_for(candidate)
+                if reason:
+                    skipped.append({'user_id': candidate, 'action': key, 'reason': reason})
+                else:
+                    accepted.append(candidate)
+            return accepted
+        
+        to_add = accept('add', id_lists['add'],
+                        lambda uid: 'Already a member' if uid in member_ids else None)
+        to_remove = accept('remove', id_lists['remove'], lambda uid: (
+            'Cannot remove the club creator' if uid == club.created_by else
+            'You cannot remove yourself from the club' if uid == user_id else
+            'Not a member' if uid not in member_ids else None))
+        members_after = (member_ids | set(to_add)) - set(to_remove)
+        to_promote = accept('promote', id_lists['promote'], lambda uid: (
+            'Club creator is already an admin' if uid == club.created_by else
+            'Not a member' if uid not in members_after else
+            'Already an admin' if uid in admin_ids else None))
+        to_demote = accept('demote', id_lists['demote'], lambda uid: (
+            'Cannot demote the club creator' if uid == club.created_by else
+            'Not an admin' if uid not in admin_ids else
+            'Removed from the club' if uid in to_remove else None))
+        
+        now = datetime.utcnow()
+        admin_name = names.get(user_id, 'An admin')
+        activity_rows = []
+        
+        if to_remove:
+            db.session.execute(club_admins.delete().where(
+                club_admins.c.club_id == club_id, club_admins.c.user_id.in_(to_remove)
+            ))
+            db.session.execute(club_members.delete().where(
+                club_members.c.club_id == club_id, club_members.c.user_id.in_(to_remove)
+            ))
+            activity_rows += [{
+                'club_id': club_id, 'user_id': user_id, 'activity_type': 'remove_member', 'created_at': now,
+                'description': f'{admin_name} removed {names[uid]} from the club'
+            } for uid in to_remove]
+        
+        if to_demote:
+            db.session.execute(club_admins.delete().where(
+                club_admins.c.club_id == club_id, club_admins.c.user_id.in_(to_demote)
+            ))
+            activity_rows += [{
+                'club_id': club_id, 'user_id': user_id, 'activity_type': 'admin', 'created_at': now,
+                'description': f'{admin_name} removed {names[uid]} as admin'
+            } for uid in to_demote]
+        
+        if to_add:
+            db.session.execute(insert_ignore(club_members), [
+                {'user_id': uid, 'club_id': club_id, 'joined_at': now} for uid in to_add
+            ])
+            activity_rows += [{
+                'club_id': club_id, 'user_id': uid, 'activity_type': 'join_club', 'created_at': now,
+                'description': f'{names[uid]} was added to the club by {admin_name}'
+            } for uid in to_add]
+        
+        if to_promote:
+            db.session.execute(insert_ignore(club_admins), [
+                {'user_id': uid, 'club_id': club_id, 'promoted_at': now} for uid in to_promote
+            ])
+            activity_rows += [{
+                'club_id': club_id, 'user_id': user_id, 'activity_type': 'admin', 'created_at': now,
+                'description': f'{admin_name} promoted {names[uid]} to admin'
+            } for uid in to_promote]
+        
+        if activity_rows:
+            db.session.execute(Activity.__table__.insert(), activity_rows)
+        
+        db.session.commit()
+        club_standings.invalidate_club(club_id)
+        
+        response = jsonify({
+            'message': 'Members updated successfully',
+            'added': to_add,
+            'removed': to_remove,
+            'promoted': to_promote,
+            'demoted': to_demote,
+            'skipped': skipped
+        })
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 200
+    except Exception as e:
+        db.session.rollback()
+        import traceback
+        print(f"Error in bulk member update: {e}")
+        traceback.print_exc()
+        response = jsonify({'error': f'Failed to update members: {str(e)}'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 500
+
 @clubs_bp.route('/<int:club_id>/members/<int:member_id>/promote', methods=['POST'])
 @jwt_required()
 def promote_member_to_admin(club_id, member_id):
@@ -399,7 +882,7 @@ def promote_member_to_admin(club_id, member_id):
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 401
     
-    club = Club.query.get(club_id)
+    club = get_active_club(club_id)
     if not club:
         response = jsonify({'error': 'Club not found'})
         response.headers.add('Access-Control-Allow-Origin', '*')
@@ -475,7 +958,7 @@ def remove_member_from_club(club_id, member_id):
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 401
     
-    club = Club.query.get(club_id)
+    club = get_active_club(club_id)
     if not club:
         response = jsonify({'error': 'Club not found'})
         response.headers.add('Access-Control-Allow-Origin', '*')
@@ -546,6 +1029,7 @@ def remove_member_from_club(club_id, member_id):
     db.session.add(activity)
     
     db.session.commit()
+    club_standings.invalidate_club(club_id)
     
     response = jsonify({'message': 'Member removed from club successfully'})
     response.headers.add('Access-Control-Allow-Origin', '*')
@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify
 from app.database import db
 from app.models import Run, User, Club, Activity, ScheduledRun, club_members
+from app import activity_feed, challenge_progress, club_standings, club_stats, exports
+from app.routes.clubs import get_active_club
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timezone, timedelta
+from sqlalchemy import select
 
 runs_bp = Blueprint('runs', __name__)
 
@@ -62,44 +65,8 @@ def update_challenge_progress(user_id, challenge_ids):
     if not challenge_ids:
         return
     try:
-        from app.models import Challenge, ChallengeParticipant
         for challenge_id in challenge_ids:
-            challenge = Challenge.query.get(challenge_id)
-            if not challenge:
-                continue
-
-            participant = ChallengeParticipant.query.filter_by(
-                challenge_id=challenge_id,
-                user_id=user_id
-            ).first()
-
-            if not participant:
-                continue
-
-            challenge_runs = Run.query.filter(
-                Run.user_id == user_id,
-                Run.date >= challenge.start_date,
-                Run.date <= challenge.end_date
-            ).all()
-
-            progress = 0.0
-            if challenge.challenge_type == 'weekly_mileage':
-                progress = sum(run.distance_km for run in challenge_runs)
-            elif challenge.challenge_type == 'fastest_5k':
-                fastest_time = None
-                for run in challenge_runs:
-                    if 4.5 <= run.distance_km <= 5.5:
-                        time_minutes = run.duration_minutes
-                        if fastest_time is None or time_minutes < fastest_time:
-                            fastest_time = time_minutes
-                progress = fastest_time if fastest_time else 0
-            elif challenge.challenge_type == 'total_distance':
-                progress = sum(run.distance_km for run in challenge_runs)
-            elif challenge.challenge_type == 'total_time':
-                progress = sum(run.duration_minutes for run in challenge_runs)
-
-            participant.progress_value = progress
-        db.session.commit()
+            challenge_progress.recompute_challenge(challenge_id, [user_id])
     except Exception as e:
         print(f"Error updating challenge progress: {e}")
         import traceback
@@ -147,8 +114,16 @@ def track_run():
         )
         
         db.session.add(run)
+        db.session.flush()  # Flush to get the run.id
+        club_stats.attribute_new_run(run)
+        committed_after = club_standings.commit_mark()
         db.session.commit()
         
+        try:
+            club_standings.record_run(run, committed_after)
+        except Exception as e:
+            print(f"Error updating club standings: {e}")
+        
         response = jsonify({
             'id': run.id,
             'distance_km': run.distance_km,
@@ -230,6 +205,37 @@ def get_my_progress():
     response.headers.add('Access-Control-Allow-Origin', '*')
     return response, 200
 
+@runs_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_my_runs():
+    """Download all of the current user's runs, oldest first.
+
+    Query params: format (csv or xlsx, default csv). The file is streamed as it is read.
+    """
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    except Exception as e:
+        response = jsonify({'error': 'Invalid or expired token', 'details': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
+    
+    file_format = request.args.get('format', 'csv')
+    if file_format not in exports.MIMETYPES:
+        response = jsonify({'error': 'Invalid format. Use csv or xlsx'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 400
+    
+    # Ordered along ix_run_user_date so rows stream without a sort
+    rows = exports.stream_rows(
+        select(Run.id, Run.date, Run.distance_km, Run.duration_minutes, Run.speed_kmh, Run.notes)
+        .where(Run.user_id == user_id).order_by(Run.date, Run.id)
+    )
+    return exports.export_response(
+        file_format, 'my-runs', 'Runs',
+        ['id', 'date', 'distance_km', 'duration_minutes', 'speed_kmh', 'notes'], rows
+    ), 200
+
 @runs_bp.route('/schedule/my', methods=['GET'])
 @jwt_required()
 def get_my_scheduled_runs():
@@ -247,7 +253,8 @@ def get_my_scheduled_runs():
         ).join(
             club_members, club_members.c.club_id == Club.id
         ).filter(
-            club_members.c.user_id == user_id
+            club_members.c.user_id == user_id,
+            Club.status != 'deleting'
         ).order_by(ScheduledRun.scheduled_date.desc()).all()
 
         runs_data = []
@@ -332,10 +339,15 @@ def update_run_tags(run_id):
                 club_id=scheduled_run.club_id,
                 user_id=user_id,
                 activity_type='run',
-                description=f'{user.name} ran {run.distance_km:.2f} km at {run.speed_kmh:.2f} km/h (tagged to scheduled run: {scheduled_run.title})'
+                description=f'{user.name} ran {run.distance_km:.2f} km at {run.speed_kmh:.2f} km/h (tagged to scheduled run: {scheduled_run.title})',
+                run_id=run.id,
+                scheduled_run_id=scheduled_run.id
             )
             db.session.add(activity)
 
+        # Count the run towards the clubs of the scheduled runs it was tagged to
+        club_stats.attribute_run(run, [scheduled_run.club_id for scheduled_run in run.tagged_scheduled_runs.all()])
+
         # Tag challenges
         if challenge_ids:
             from app.models import Challenge, ChallengeParticipant
@@ -414,7 +426,7 @@ def schedule_run():
             response.headers.add('Access-Control-Allow-Origin', '*')
             return response, 400
         
-        club = Club.query.get(data['club_id'])
+        club = get_active_club(data['club_id'])
         if not club:
             response = jsonify({'error': 'Club not found'})
             response.headers.add('Access-Control-Allow-Origin', '*')
@@ -487,7 +499,8 @@ def schedule_run():
             club_id=club.id,
             user_id=user_id,
             activity_type='schedule_run',
-            description=f'{user.name} scheduled a run: {scheduled_run.title}'
+            description=f'{user.name} scheduled a run: {scheduled_run.title}',
+            scheduled_run_id=scheduled_run.id
         )
         db.session.add(activity)
         
@@ -532,7 +545,7 @@ def get_scheduled_runs(club_id):
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 401
     
-    club = Club.query.get(club_id)
+    club = get_active_club(club_id)
     if not club:
         response = jsonify({'error': 'Club not found'})
         response.headers.add('Access-Control-Allow-Origin', '*')
@@ -641,20 +654,14 @@ def update_scheduled_run(scheduled_run_id):
                 response.headers.add('Access-Control-Allow-Origin', '*')
                 return response, 400
         
-        db.session.commit()
-        
         # Update activity description
         user = User.query.get(user_id)
-        activity = Activity.query.filter_by(
-            club_id=scheduled_run.club_id,
-            user_id=user_id,
-            activity_type='schedule_run',
-            description=f'{user.name} scheduled a run: {scheduled_run.title}'
-        ).first()
+        Activity.query.filter_by(
+            scheduled_run_id=scheduled_run.id,
+            activity_type='schedule_run'
+        ).update({'description': f'{user.name} scheduled a run: {scheduled_run.title}'}, synchronize_session=False)
         
-        if activity:
-            activity.description = f'{user.name} scheduled a run: {scheduled_run.title}'
-            db.session.commit()
+        db.session.commit()
         
         creator = User.query.get(scheduled_run.created_by)
         participant_count = len(list(scheduled_run.participants)) if scheduled_run.participants else 0
@@ -712,15 +719,14 @@ def delete_scheduled_run(scheduled_run_id):
         return response, 403
     
     try:
-        # Delete related activities
-        activities = Activity.query.filter_by(
-            club_id=scheduled_run.club_id,
+        # Delete the activity announcing it (run activities tagged to it keep their history)
+        Activity.query.filter_by(
+            scheduled_run_id=scheduled_run.id,
             activity_type='schedule_run'
-        ).all()
-        
-        for activity in activities:
-            if scheduled_run.title in activity.description:
-                db.session.delete(activity)
+        ).delete(synchronize_session=False)
+        Activity.query.filter_by(scheduled_run_id=scheduled_run.id).update(
+            {'scheduled_run_id': None}, synchronize_session=False
+        )
         
         # Delete the scheduled run
         db.session.delete(scheduled_run)
@@ -861,6 +867,8 @@ def update_run(run_id):
         return response, 400
     
     try:
+        before = club_stats.snapshot(run)
+        
         # Update run fields
         if 'distance_km' in data:
             run.distance_km = float(data['distance_km'])
@@ -878,7 +886,10 @@ def update_run(run_id):
         if 'distance_km' in data or 'duration_minutes' in data:
             run.speed_kmh = (run.distance_km / run.duration_minutes) * 60 if run.duration_minutes > 0 else 0
         
+        db.session.flush()
+        club_stats.adjust_run(club_stats.run_club_ids(run.id), before, club_stats.snapshot(run))
         db.session.commit()
+        club_standings.invalidate_user(user_id)
         
         response = jsonify({
             'id': run.id,
@@ -928,8 +939,15 @@ def delete_run(run_id):
     try:
         # Delete the run (activities will remain for history)
         # If you want to delete activities too, uncomment the code below
+        before = club_stats.snapshot(run)
+        club_ids = club_stats.run_club_ids(run.id)
+        activity_feed.runs_changed([run.id])
+        Activity.query.filter_by(run_id=run.id).update({'run_id': None}, synchronize_session=False)
         db.session.delete(run)
+        db.session.flush()
+        club_stats.adjust_run(club_ids, before, None)
         db.session.commit()
+        club_standings.invalidate_user(user_id)
         
         response = jsonify({'message': 'Run deleted successfully'})
         response.headers.add('Access-Control-Allow-Origin', '*')
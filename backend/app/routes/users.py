@@ -1,12 +1,12 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from app.database import db
-from app.models import Activity, Run, User, Challenge, ChallengeParticipant
+from app.models import Activity, Run, User, Challenge, ChallengeParticipant, ImportJob, ImportJobIssue
+from app import activity_feed, challenge_results, club_standings, club_stats, held_requests, user_import
+from app.jobs import run_in_background
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
-import re
-import io
-from openpyxl import load_workbook
-from sqlalchemy import text
+from app.pagination import encode_cursor, decode_cursor, get_page_size
+from sqlalchemy import tuple_
 
 users_bp = Blueprint('users', __name__)
 
@@ -22,61 +22,25 @@ def get_user_badges():
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 401
     
-    # Get all challenges the user has participated in
-    participants = ChallengeParticipant.query.filter_by(user_id=user_id).all()
+    # Challenges that ended since the last sweep are finalized in the background;
+    # the counters themselves are a single-row read
+    if challenge_results.sweep_due():
+        run_in_background(challenge_results.finalize_ended_challenges)
     
-    gold_count = 0
-    silver_count = 0
-    bronze_count = 0
-    
-    # For each challenge, calculate the user's rank
-    for participant in participants:
-        challenge = Challenge.query.get(participant.challenge_id)
-        if not challenge:
-            continue
-        
-        # Skip challenges that haven't ended yet (only count final results)
-        now = datetime.utcnow()
-        if challenge.end_date > now:
-            continue
-        
-        # Get all participants for this challenge
-        all_participants = ChallengeParticipant.query.filter_by(challenge_id=challenge.id).all()
-        
-        # Sort by progress (descending for distance/time, ascending for fastest_5k)
-        if challenge.challenge_type == 'fastest_5k':
-            # For fastest 5K, lowest time wins
-            all_participants.sort(key=lambda p: p.progress_value if p.progress_value > 0 else float('inf'))
-        else:
-            # For distance/time challenges, highest progress wins
-            all_participants.sort(key=lambda p: p.progress_value, reverse=True)
-        
-        # Find user's rank
-        user_rank = None
-        for rank, p in enumerate(all_participants, 1):
-            if p.user_id == user_id:
-                user_rank = rank
-                break
-        
-        # Count badges (only for top 3)
-        if user_rank == 1:
-            gold_count += 1
-        elif user_rank == 2:
-            silver_count += 1
-        elif user_rank == 3:
-            bronze_count += 1
-    
-    response = jsonify({
-        'gold': gold_count,
-        'silver': silver_count,
-        'bronze': bronze_count
-    })
+    response = jsonify(challenge_results.get_badges(user_id))
     response.headers.add('Access-Control-Allow-Origin', '*')
     return response, 200
 
 @users_bp.route('/activity-feed/<int:club_id>', methods=['GET'])
 @jwt_required()
 def get_activity_feed(club_id):
+    """Get a page of a club's run activities, newest first.
+
+    Query params: limit (default 50, max 200), before (next_before from the previous page),
+    wait (seconds, max 25: when If-None-Match is still current, hold the request until
+    the feed changes). Answers 304 if If-None-Match is current, and 503 with Retry-After
+    if too many requests are already waiting.
+    """
     try:
         user_id_str = get_jwt_identity()
         user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
@@ -85,88 +49,72 @@ def get_activity_feed(club_id):
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 401
     
-    # Only return run activities (tracked manually or via GPS)
-    activities = Activity.query.filter_by(
-        club_id=club_id,
-        activity_type='run'
-    ).order_by(Activity.created_at.desc()).limit(50).all()
+    try:
+        limit = get_page_size(request.args)
+        before = activity_feed.decode_before(request.args['before']) if request.args.get('before') else None
+    except ValueError:
+        response = jsonify({'error': 'Invalid cursor'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 400
+    
+    version = activity_feed.get_version(club_id)
+    if version is None:
+        response = jsonify({'error': 'Club not found'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 404
     
-    activities_data = []
-    for activity in activities:
-        # Try to find the related run by parsing description
-        run_id = None
-        run_data = None
-        if activity.activity_type == 'run':
-            # Parse description like "John ran 5.00 km at 10.00 km/h"
-            match = re.search(r'ran ([\d.]+) km at ([\d.]+) km/h', activity.description)
-            if match:
-                distance = float(match.group(1))
-                speed = float(match.group(2))
-                # Find the run that matches this distance and speed (within tolerance)
-                # Also match by date - find runs created around the same time as the activity
-                runs = Run.query.filter_by(user_id=activity.user_id).order_by(Run.date.desc()).all()
-                
-                # First try exact match with time proximity
-                for run in runs:
-                    if abs(run.distance_km - distance) < 0.01 and abs(run.speed_kmh - speed) < 0.01:
-                        # Check if the run date is close to activity creation time (within 24 hours)
-                        time_diff = abs((run.date - activity.created_at).total_seconds())
-                        if time_diff < 86400:  # Within 24 hours
-                            run_id = run.id
-                            run_data = {
-                                'distance_km': run.distance_km,
-                                'duration_minutes': run.duration_minutes,
-                                'speed_kmh': run.speed_kmh,
-                                'notes': run.notes,
-                                'date': run.date.isoformat()
-                            }
-                            break
-                
-                # If no exact match found, try matching by distance and speed with relaxed tolerance
-                if not run_data:
-                    for run in runs:
-                        if abs(run.distance_km - distance) < 0.1 and abs(run.speed_kmh - speed) < 0.5:
-                            # Check time proximity (within 24 hours)
-                            time_diff = abs((run.date - activity.created_at).total_seconds())
-                            if time_diff < 86400:  # Within 24 hours
-                                run_id = run.id
-                                run_data = {
-                                    'distance_km': run.distance_km,
-                                    'duration_minutes': run.duration_minutes,
-                                    'speed_kmh': run.speed_kmh,
-                                    'notes': run.notes,
-                                    'date': run.date.isoformat()
-                                }
-                                break
-                
-                # Last resort: match by distance only if created within 24 hours
-                if not run_data:
-                    for run in runs:
-                        if abs(run.distance_km - distance) < 0.5:
-                            time_diff = abs((run.date - activity.created_at).total_seconds())
-                            if time_diff < 86400:  # Within 24 hours
-                                run_id = run.id
-                                run_data = {
-                                    'distance_km': run.distance_km,
-                                    'duration_minutes': run.duration_minutes,
-                                    'speed_kmh': run.speed_kmh,
-                                    'notes': run.notes,
-                                    'date': run.date.isoformat()
-                                }
-                                break
-        
-        activities_data.append({
-            'id': activity.id,
-            'type': activity.activity_type,
-            'description': activity.description,
-            'user_name': activity.user.name,
-            'user_id': activity.user_id,
-            'created_at': activity.created_at.isoformat(),
-            'run_id': run_id,
-            'run_data': run_data
-        })
+    # The version check is a primary-key read; the feed query only runs when something changed
+    before_cursor = request.args.get('before')
+    etag = activity_feed.feed_etag(club_id, version, limit, before_cursor)
+    wait = min(max(request.args.get('wait', 0, type=int) or 0, 0), activity_feed.MAX_WAIT_SECONDS)
+    if wait and request.if_none_match.contains(etag):
+        if not held_requests.acquire():
+            return held_requests.busy_response()
+        try:
+            version = activity_feed.wait_for_change(club_id, version, wait)
+        finally:
+            held_requests.release()
+        if version is None:
+            response = jsonify({'error': 'Club not found'})
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response, 404
+        etag = activity_feed.feed_etag(club_id, version, limit, before_cursor)
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        activities_data, next_before = activity_feed.club_page(club_id, limit, before, version)
+        response = jsonify({'activities': activities_data, 'next_before': next_before})
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response, response.status_code
+
+@users_bp.route('/timeline', methods=['GET'])
+@jwt_required()
+def get_timeline():
+    """Get a page of run activities across all of the current user's clubs, newest first.
+
+    Query params: limit (default 50, max 200), before (next_before from the previous page).
+    """
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    except Exception as e:
+        response = jsonify({'error': 'Invalid or expired token', 'details': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
+    
+    try:
+        limit = get_page_size(request.args)
+        before = activity_feed.decode_before(request.args['before']) if request.args.get('before') else None
+    except ValueError:
+        response = jsonify({'error': 'Invalid cursor'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 400
     
-    response = jsonify(activities_data)
+    activities_data, next_before = activity_feed.timeline_page(user_id, limit, before)
+    response = jsonify({'activities': activities_data, 'next_before': next_before})
     response.headers.add('Access-Control-Allow-Origin', '*')
     return response, 200
 
@@ -205,57 +153,51 @@ def update_activity(activity_id):
         if activity.activity_type == 'run' and data.get('run_data'):
             run_data = data['run_data']
             
-            # Find the related run
-            match = re.search(r'ran ([\d.]+) km at ([\d.]+) km/h', activity.description)
-            if match:
-                distance = float(match.group(1))
-                speed = float(match.group(2))
-                runs = Run.query.filter_by(user_id=user_id).all()
-                run = None
-                for r in runs:
-                    if abs(r.distance_km - distance) < 0.01 and abs(r.speed_kmh - speed) < 0.01:
-                        run = r
-                        break
+            run = Run.query.filter_by(id=activity.run_id, user_id=user_id).first() if activity.run_id else None
+            if run:
+                before = club_stats.snapshot(run)
+                
+                # Update run
+                if 'distance_km' in run_data:
+                    run.distance_km = float(run_data['distance_km'])
+                if 'duration_minutes' in run_data:
+                    run.duration_minutes = float(run_data['duration_minutes'])
+                if 'notes' in run_data:
+                    run.notes = run_data['notes']
+                if 'date' in run_data:
+                    try:
+                        from datetime import datetime
+                        run.date = datetime.fromisoformat(run_data['date'].replace('Z', '+00:00'))
+                    except:
+                        pass
                 
-                if run:
-                    # Update run
-                    if 'distance_km' in run_data:
-                        run.distance_km = float(run_data['distance_km'])
-                    if 'duration_minutes' in run_data:
-                        run.duration_minutes = float(run_data['duration_minutes'])
-                    if 'notes' in run_data:
-                        run.notes = run_data['notes']
-                    if 'date' in run_data:
-                        try:
-                            from datetime import datetime
-                            run.date = datetime.fromisoformat(run_data['date'].replace('Z', '+00:00'))
-                        except:
-                            pass
-                    
-                    # Recalculate speed
-                    if 'distance_km' in run_data or 'duration_minutes' in run_data:
-                        run.speed_kmh = (run.distance_km / run.duration_minutes) * 60 if run.duration_minutes > 0 else 0
-                    
-                    # Update activity description
-                    user = User.query.get(user_id)
-                    activity.description = f'{user.name} ran {run.distance_km:.2f} km at {run.speed_kmh:.2f} km/h'
-                    
-                    db.session.commit()
-                    
-                    response = jsonify({
-                        'id': activity.id,
-                        'description': activity.description,
-                        'created_at': activity.created_at.isoformat(),
-                        'run_data': {
-                            'distance_km': run.distance_km,
-                            'duration_minutes': run.duration_minutes,
-                            'speed_kmh': run.speed_kmh,
-                            'notes': run.notes,
-                            'date': run.date.isoformat()
-                        }
-                    })
-                    response.headers.add('Access-Control-Allow-Origin', '*')
-                    return response, 200
+                # Recalculate speed
+                if 'distance_km' in run_data or 'duration_minutes' in run_data:
+                    run.speed_kmh = (run.distance_km / run.duration_minutes) * 60 if run.duration_minutes > 0 else 0
+                
+                # Update activity description
+                user = User.query.get(user_id)
+                activity.description = f'{user.name} ran {run.distance_km:.2f} km at {run.speed_kmh:.2f} km/h'
+                
+                db.session.flush()
+                club_stats.adjust_run(club_stats.run_club_ids(run.id), before, club_stats.snapshot(run))
+                db.session.commit()
+                club_standings.invalidate_user(user_id)
+                
+                response = jsonify({
+                    'id': activity.id,
+                    'description': activity.description,
+                    'created_at': activity.created_at.isoformat(),
+                    'run_data': {
+                        'distance_km': run.distance_km,
+                        'duration_minutes': run.duration_minutes,
+                        'speed_kmh': run.speed_kmh,
+                        'notes': run.notes,
+                        'date': run.date.isoformat()
+                    }
+                })
+                response.headers.add('Access-Control-Allow-Origin', '*')
+                return response, 200
         
         # If no run update, just update description
         if 'description' in data:
@@ -389,7 +331,7 @@ def update_profile():
 @users_bp.route('/bulk-import', methods=['POST'])
 @jwt_required()
 def bulk_import_users():
-    """Import users from an Excel file"""
+    """Start importing users from an Excel, CSV or JSON Lines file; poll GET /bulk-import/<job_id> for progress"""
     try:
         user_id_str = get_jwt_identity()
         user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
@@ -412,140 +354,96 @@ def bulk_import_users():
         return response, 400
     
     # Check file extension
-    if not file.filename.endswith(('.xlsx', '.xls')):
-        response = jsonify({'error': 'Invalid file type. Please upload an Excel file (.xlsx or .xls)'})
+    file_format = user_import.file_format(file.filename)
+    if not file_format:
+        response = jsonify({'error': 'Invalid file type. Please upload an Excel (.xlsx or .xls), CSV (.csv) or JSON Lines (.jsonl) file'})
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 400
     
+    path = None
     try:
-        # Read Excel file using openpyxl
-        file_content = file.read()
-        workbook = load_workbook(io.BytesIO(file_content), data_only=True)
-        sheet = workbook.active
-        
-        # Get header row (first row)
-        if sheet.max_row < 2:
-            response = jsonify({'error': 'Excel file is empty or has no data rows'})
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            return response, 400
-        
-        # Read header row and normalize column names (case-insensitive)
-        header_row = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True))
-        column_indices = {}
-        required_columns = ['name', 'email', 'password']
-        
-        # Map normalized column name to index (0-indexed)
-        # Note: address column is skipped to avoid database errors
-        for idx, cell_value in enumerate(header_row):
-            if cell_value:
-                col_name = str(cell_value).strip().lower()
-                if col_name in ['name', 'email', 'password']:
-                    column_indices[col_name] = idx
-        
-        # Validate required columns
-        missing_columns = [col for col in required_columns if col not in column_indices]
-        
-        if missing_columns:
-            response = jsonify({
-                'error': f'Missing required columns: {", ".join(missing_columns)}',
-                'required_columns': required_columns,
-                'found_columns': [col for col in column_indices.keys()]
-            })
+        # Kept on disk until the job finishes, so an interrupted job can resume
+        path = user_import.save_upload(file.stream, '.' + file_format)
+        try:
+            user_import.check_file(path, file_format)
+        except user_import.ImportFileError as e:
+            user_import.remove_upload(path)
+            response = jsonify({'error': str(e), **e.details})
             response.headers.add('Access-Control-Allow-Origin', '*')
             return response, 400
         
-        # Process each row
-        created_users = []
-        skipped_users = []
-        errors = []
-        
-        # Start from row 2 (skip header)
-        for row_idx, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
-            try:
-                # Get values (handle None/empty values)
-                # Note: address field is skipped to avoid database column errors
-                name = str(row[column_indices['name']]).strip() if column_indices['name'] < len(row) and row[column_indices['name']] is not None else None
-                email = str(row[column_indices['email']]).strip() if column_indices['email'] < len(row) and row[column_indices['email']] is not None else None
-                password = str(row[column_indices['password']]).strip() if column_indices['password'] < len(row) and row[column_indices['password']] is not None else None
-                
-                # Validate required fields
-                if not name or not email or not password:
-                    errors.append({
-                        'row': row_idx,
-                        'error': 'Missing required field (name, email, or password)'
-                    })
-                    continue
-                
-                # Validate email format
-                if '@' not in email:
-                    errors.append({
-                        'row': row_idx,
-                        'error': f'Invalid email format: {email}'
-                    })
-                    continue
-                
-                # Check if user already exists (using raw SQL to avoid address column issue)
-                result = db.session.execute(
-                    text("SELECT id FROM \"user\" WHERE email = :email LIMIT 1"),
-                    {"email": email}
-                ).fetchone()
-                if result:
-                    skipped_users.append({
-                        'row': row_idx,
-                        'email': email,
-                        'reason': 'User already exists'
-                    })
-                    continue
-                
-                # Create new user (address field skipped to avoid database errors)
-                user = User(
-                    email=email,
-                    name=name
-                )
-                user.set_password(password)
-                
-                db.session.add(user)
-                created_users.append({
-                    'name': name,
-                    'email': email
-                })
-                
-            except Exception as e:
-                errors.append({
-                    'row': row_idx,
-                    'error': f'Error processing row: {str(e)}'
-                })
-                continue
+        job = ImportJob(requested_by=user_id, filename=file.filename, file_path=path, file_format=file_format,
+                        checkpoint_row=user_import.first_row(file_format) - 1, status='pending')
+        db.session.add(job)
+        db.session.commit()
         
-        # Commit all users
-        try:
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            response = jsonify({
-                'error': f'Failed to create users: {str(e)}',
-                'created_count': len(created_users),
-                'skipped_count': len(skipped_users),
-                'error_count': len(errors)
-            })
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            return response, 500
+        run_in_background(user_import.run_import_job, job.id)
         
-        response = jsonify({
-            'message': 'Users imported successfully',
-            'created_count': len(created_users),
-            'skipped_count': len(skipped_users),
-            'error_count': len(errors),
-            'created_users': created_users,
-            'skipped_users': skipped_users,
-            'errors': errors
-        })
+        response = jsonify({'message': 'Import started', 'job': user_import.serialize_job(job)})
         response.headers.add('Access-Control-Allow-Origin', '*')
-        return response, 200
+        return response, 202
         
     except Exception as e:
+        db.session.rollback()
+        user_import.remove_upload(path)
         import traceback
         traceback.print_exc()
-        response = jsonify({'error': f'Failed to process Excel file: {str(e)}'})
+        response = jsonify({'error': f'Failed to process file: {str(e)}'})
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 500
+
+@users_bp.route('/bulk-import/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_bulk_import_status(job_id):
+    """Get an import job's progress and a page of its skipped/invalid rows (requester only).
+
+    Query params: limit (default 50, max 200), cursor (next_cursor from the previous page).
+    """
+    try:
+        user_id_str = get_jwt_identity()
+        user_id = int(user_id_str) if isinstance(user_id_str, str) else user_id_str
+    except Exception as e:
+        response = jsonify({'error': 'Invalid or expired token', 'details': str(e)})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 401
+    
+    job = db.session.get(ImportJob, job_id)
+    if not job or job.requested_by != user_id:
+        response = jsonify({'error': 'Import job not found'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 404
+    
+    limit = get_page_size(request.args)
+    cursor = request.args.get('cursor')
+    after = decode_cursor(cursor) if cursor else None
+    if cursor and (not after or len(after) != 2):
+        response = jsonify({'error': 'Invalid cursor'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response, 400
+    
+    # A job whose worker died picks up again from its last committed chunk
+    if user_import.resume_if_stale(job):
+        job = db.session.get(ImportJob, job_id)
+    
+    query = ImportJobIssue.query.filter(ImportJobIssue.job_id == job_id)
+    if after:
+        query = query.filter(tuple_(ImportJobIssue.row_index, ImportJobIssue.id) > tuple_(*after))
+    issues = query.order_by(ImportJobIssue.row_index, ImportJobIssue.id).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(issues) > limit:
+        issues = issues[:limit]
+        next_cursor = encode_cursor(issues[-1].row_index, issues[-1].id)
+    
+    response = jsonify({
+        **user_import.serialize_job(job),
+        'issues': [{
+            'row': issue.row_index,
+            'kind': issue.kind,
+            'email': issue.email,
+            'message': issue.message
+        } for issue in issues],
+        'next_cursor': next_cursor
+    })
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response, 200
@@ -0,0 +1,381 @@
+"""Bulk user import jobs.
+
+An upload (.xlsx, .csv or .jsonl) is copied from the request stream to
+IMPORT_STORAGE_DIR in pieces and imported by a background ImportJob. Every format
+is read lazily off disk - sheets in openpyxl's read-only mode, CSV with csv.reader
+over a text wrapper, JSON Lines one line at a time - so memory use doesn't grow with
+the file. All formats share validation, dedup and insert. Rows are handled
+CHUNK_SIZE at a time: one
+WHERE email IN (...) query finds the users that already exist, the new users'
+passwords are hashed in a process pool, and one executemany INSERT adds them.
+
+Each chunk's users, its skipped/invalid rows and the job's checkpoint row are
+committed together, so a job whose worker died resumes after the last committed
+chunk without creating anyone twice. A sweeper thread (start_sweeper) resumes such
+jobs even if nobody polls them, expires the ones that can't finish and removes
+uploads no job refers to, so files with plaintext passwords don't linger.
+"""
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import chain, islice
+
+from flask import current_app
+from openpyxl import load_workbook
+from sqlalchemy import insert, select, update
+
+from app.database import db, insert_ignore
+from app.jobs import run_in_background
+from app.models import ImportJob, ImportJobIssue, User
+from app.password_hashing import hash_passwords
+
+CHUNK_SIZE = 1000
+REQUIRED_COLUMNS = ['name', 'email', 'password']
+
+# A running job that has not committed a chunk for this long is assumed to have died with its worker
+STALE_JOB_AFTER = timedelta(minutes=10)
+# Unfinished jobs older than this are failed (and their uploads removed) instead of resumed
+EXPIRE_JOB_AFTER = timedelta(days=1)
+SWEEP_INTERVAL_SECONDS = 300
+
+class RowError(ValueError):
+    """Yielded by a reader in place of a row it couldn't parse; recorded as that row's error"""
+
+class ImportFileError(ValueError):
+    """The file as a whole can't be imported; details are added to the error response"""
+    def __init__(self, message, **details):
+        super().__init__(message)
+        self.details = details
+
+def save_upload(stream, suffix):
+    """Copy an upload stream into IMPORT_STORAGE_DIR in pieces; returns the stored path"""
+    root = current_app.config['IMPORT_STORAGE_DIR']
+    os.makedirs(root, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=root, suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(stream, f, 64 * 1024)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+def remove_upload(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def xlsx_rows(path):
+    """Rows of the active sheet as value tuples, read lazily"""
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def csv_rows(path):
+    """Rows of a UTF-8 CSV file as lists of strings, read lazily"""
+    with open(path, 'rb') as raw:
+        # utf-8-sig drops the byte order mark Excel writes at the start of CSV exports
+        with io.TextIOWrapper(raw, encoding='utf-8-sig', newline='') as text:
+            yield from csv.reader(text)
+
+def jsonl_rows(path):
+    """Values of REQUIRED_COLUMNS from each line of a JSON Lines file, read lazily.
+
+    Each line is an object such as {"name": ..., "email": ..., "password": ...} (keys are
+    case-insensitive). A line that isn't one is yielded as a RowError.
+    """
+    with open(path, encoding='utf-8-sig') as f:
+        for line in f:
+            if not line.strip():
+                yield ()
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield RowError(f'Invalid JSON: {e}')
+                continue
+            if not isinstance(record, dict):
+                yield RowError('Line is not a JSON object')
+                continue
+            record = {str(key).strip().lower(): value for key, value in record.items()}
+            yield tuple(record.get(col) for col in REQUIRED_COLUMNS)
+
+# format -> (row reader, whether the first row is a header)
+FORMATS = {
+    'xlsx': (xlsx_rows, True),
+    'csv': (csv_rows, True),
+    'jsonl': (jsonl_rows, False),
+}
+# Upload extension -> format; .xls is handed to openpyxl as before
+EXTENSIONS = {'.xlsx': 'xlsx', '.xls': 'xlsx', '.csv': 'csv', '.jsonl': 'jsonl'}
+
+def file_format(filename):
+    """Import format for an uploaded file name, or None if it isn't supported"""
+    return EXTENSIONS.get(os.path.splitext(filename.lower())[1])
+
+def first_row(file_format):
+    """Number of the first data row: 2 below a header, else 1 (JSON Lines line numbers)"""
+    return 2 if FORMATS[file_format][1] else 1
+
+def column_indices(header_row):
+    """Map of required column name -> index from the header row (case-insensitive)"""
+    indices = {}
+    # Note: address column is skipped to avoid database errors
+    for idx, cell_value in enumerate(header_row):
+        if cell_value:
+            col_name = str(cell_value).strip().lower()
+            if col_name in REQUIRED_COLUMNS:
+                indices[col_name] = idx
+
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in indices]
+    if missing_columns:
+        raise ImportFileError(
+            f'Missing required columns: {", ".join(missing_columns)}',
+            required_columns=REQUIRED_COLUMNS,
+            found_columns=list(indices.keys())
+        )
+    return indices
+
+def read_header(rows, file_format):
+    """(column indices, iterator of (row number, values)) for a file's rows.
+
+    Rows below a header are numbered from 2, as in a spreadsheet; JSON Lines rows are
+    already in REQUIRED_COLUMNS order and numbered by line. Raises ImportFileError if
+    the header or the data is missing.
+    """
+    rows = iter(rows)
+    if FORMATS[file_format][1]:
+        header_row = next(rows, None)
+        indices = column_indices(header_row) if header_row is not None else None
+    else:
+        indices = {col: idx for idx, col in enumerate(REQUIRED_COLUMNS)}
+    data_row = next(rows, None)
+    if indices is None or data_row is None:
+        raise ImportFileError('File is empty or has no data rows')
+    return indices, enumerate(chain([data_row], rows), start=first_row(file_format))
+
+def read_rows(path, file_format):
+    """Generator of a stored upload's rows; close it to release the file"""
+    return FORMATS[file_format][0](path)
+
+def check_file(path, file_format):
+    """Raise ImportFileError if the stored upload can't be imported"""
+    rows = read_rows(path, file_format)
+    try:
+        read_header(rows, file_format)
+    finally:
+        rows.close()
+
+def _value(row, idx):
+    if idx < len(row) and row[idx] is not None:
+        return str(row[idx]).strip()
+    return None
+
+def _validate(row_idx, row, indices, issues):
+    """(row_idx, name, email, password) for a valid row, else None with the error recorded"""
+    if isinstance(row, RowError):
+        issues.append({'row_index': row_idx, 'kind': 'error', 'email': None, 'message': f'Error processing row: {str(row)}'})
+        return None
+    try:
+        name = _value(row, indices['name'])
+        email = _value(row, indices['email'])
+        password = _value(row, indices['password'])
+    except Exception as e:
+        issues.append({'row_index': row_idx, 'kind': 'error', 'email': None, 'message': f'Error processing row: {str(e)}'})
+        return None
+
+    if not name or not email or not password:
+        issues.append({'row_index': row_idx, 'kind': 'error', 'email': None,
+                       'message': 'Missing required field (name, email, or password)'})
+        return None
+    if '@' not in email:
+        issues.append({'row_index': row_idx, 'kind': 'error', 'email': None, 'message': f'Invalid email format: {email}'})
+        return None
+    return row_idx, name, email, password
+
+def _import_chunk(rows, indices):
+    """Insert the chunk's new users; returns (number created, skipped/invalid rows)"""
+    issues = []
+    valid = [parsed for parsed in (_validate(row_idx, row, indices, issues) for row_idx, row in rows) if parsed]
+    if not valid:
+        return 0, issues
+
+    existing = set(db.session.execute(
+        select(User.email).where(User.email.in_({email for _, _, email, _ in valid}))
+    ).scalars())
+
+    new_users = []
+    for row_idx, name, email, password in valid:
+        # Also catches a repeated email within the file
+        if email in existing:
+            issues.append({'row_index': row_idx, 'kind': 'skipped', 'email': email, 'message': 'User already exists'})
+            continue
+        existing.add(email)
+        new_users.append((row_idx, name, email, password))
+    if not new_users:
+        return 0, issues
+
+    # Hashed across all cores; hashes come back in row order
+    hashes = hash_passwords(password for _, _, _, password in new_users)
+    # A signup or another import can take one of these emails after the check above
+    users = User.__table__
+    created = set(db.session.execute(insert_ignore(users).returning(users.c.email), [
+        {'email': email, 'name': name, 'password_hash': password_hash}
+        for (_, name, email, _), password_hash in zip(new_users, hashes)
+    ]).scalars())
+    for row_idx, _, email, _ in new_users:
+        if email not in created:
+            issues.append({'row_index': row_idx, 'kind': 'skipped', 'email': email, 'message': 'User already exists'})
+    return len(created), issues
+
+def is_job_active(job):
+    """True if the job is pending/running and still reporting progress"""
+    if job.status not in ('pending', 'running'):
+        return False
+    return job.updated_at is None or datetime.utcnow() - job.updated_at < STALE_JOB_AFTER
+
+def resume_if_stale(job):
+    """Restart a job whose worker died, from its checkpoint. True if this call restarted it."""
+    if job.status not in ('pending', 'running') or is_job_active(job):
+        return False
+    # Only one request gets to claim the job
+    claimed = db.session.execute(
+        update(ImportJob).where(ImportJob.id == job.id, ImportJob.updated_at == job.updated_at)
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    if claimed:
+        run_in_background(run_import_job, job.id)
+    return bool(claimed)
+
+def run_import_job(job_id):
+    """Run an ImportJob to completion, committing after each chunk. Resumes from its checkpoint."""
+    job = db.session.get(ImportJob, job_id)
+    if not job or job.status not in ('pending', 'running'):
+        return
+
+    job.status = 'running'
+    job.updated_at = datetime.utcnow()
+    db.session.commit()
+
+    try:
+        rows = read_rows(job.file_path, job.file_format)
+        try:
+            indices, numbered = read_header(rows, job.file_format)
+            checkpoint = job.checkpoint_row
+            remaining = ((row_idx, row) for row_idx, row in numbered if row_idx > checkpoint)
+            while True:
+                chunk = list(islice(remaining, CHUNK_SIZE))
+                if not chunk:
+                    break
+                created, issues = _import_chunk(chunk, indices)
+                if issues:
+                    db.session.execute(insert(ImportJobIssue.__table__), [dict(issue, job_id=job.id) for issue in issues])
+                job.checkpoint_row = chunk[-1][0]
+                job.created_count += created
+                job.skipped_count += sum(1 for issue in issues if issue['kind'] == 'skipped')
+                job.error_count += sum(1 for issue in issues if issue['kind'] == 'error')
+                job.updated_at = datetime.utcnow()
+                db.session.commit()
+        finally:
+            rows.close()
+
+        job.status = 'completed'
+        job.finished_at = job.updated_at = datetime.utcnow()
+        db.session.commit()
+        print(f"Import job {job.id} completed ({job.created_count} created, "
+              f"{job.skipped_count} skipped, {job.error_count} errors)")
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(ImportJob, job_id)
+        job.status = 'failed'
+        job.error = str(e)
+        job.finished_at = job.updated_at = datetime.utcnow()
+        db.session.commit()
+        raise
+    finally:
+        # The upload holds plaintext passwords; keep it only while the job can still resume
+        if job.status in ('completed', 'failed'):
+            remove_upload(job.file_path)
+
+def _expire(job):
+    """Fail a stale job that can't finish; True if this call expired it"""
+    expired = db.session.execute(
+        update(ImportJob).where(ImportJob.id == job.id, ImportJob.updated_at == job.updated_at)
+        .values(status='failed', error='Import expired before it could finish',
+                finished_at=datetime.utcnow(), updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    if expired:
+        remove_upload(job.file_path)
+    return bool(expired)
+
+def sweep_import_jobs():
+    """Resume or expire stale jobs and remove orphaned uploads; returns (resumed, expired, removed)"""
+    now = datetime.utcnow()
+    resumed = expired = removed = 0
+    stale_jobs = ImportJob.query.filter(
+        ImportJob.status.in_(('pending', 'running')),
+        ImportJob.updated_at < now - STALE_JOB_AFTER
+    ).all()
+    for job in stale_jobs:
+        if now - job.created_at > EXPIRE_JOB_AFTER or not (job.file_path and os.path.exists(job.file_path)):
+            expired += _expire(job)
+        elif resume_if_stale(job):
+            resumed += 1
+
+    # e.g. a request that died between storing the upload and creating its job
+    root = current_app.config['IMPORT_STORAGE_DIR']
+    if os.path.isdir(root):
+        in_use = set(db.session.execute(
+            select(ImportJob.file_path).where(ImportJob.status.in_(('pending', 'running')))
+        ).scalars())
+        cutoff = time.time() - STALE_JOB_AFTER.total_seconds()
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if path not in in_use and os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                remove_upload(path)
+                removed += 1
+    return resumed, expired, removed
+
+def start_sweeper(app):
+    """Run sweep_import_jobs every SWEEP_INTERVAL_SECONDS on a daemon thread"""
+    def run():
+        while True:
+            with app.app_context():
+                try:
+                    sweep_import_jobs()
+                except Exception as e:
+                    print(f"Error sweeping import jobs: {e}")
+                finally:
+                    db.session.remove()
+            time.sleep(SWEEP_INTERVAL_SECONDS)
+
+    thread = threading.Thread(target=run, name='import-sweeper', daemon=True)
+    thread.start()
+    return thread
+
+def serialize_job(job):
+    return {
+        'job_id': job.id,
+        'filename': job.filename,
+        'file_format': job.file_format,
+        'status': job.status,
+        'processed_rows': job.checkpoint_row - first_row(job.file_format) + 1,
+        'created_count': job.created_count,
+        'skipped_count': job.skipped_count,
+        'error_count': job.error_count,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'updated_at': job.updated_at.isoformat() if job.updated_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Backfill Activity.run_id / Activity.scheduled_run_id
+New activities record the run or scheduled run they are about when they are written.
+This one-off script links older activities by parsing their descriptions, once:
+- 'run' activities ("<name> ran 5.00 km at 10.00 km/h ...") to the runner's run with that
+  distance and speed logged closest in time (within a day), and to the scheduled run
+  named in "(tagged to scheduled run: <title>)" that the run is tagged to
+- 'schedule_run' activities ("<name> scheduled a run: <title>") to the creator's scheduled
+  run in that club with that title created closest in time
+Activities are processed in id batches with a commit per batch; re-running only looks at
+activities that are still unlinked. Run migrate_columns.py first.
+"""
+
+import re
+import sys
+from datetime import timedelta
+from app import create_app
+from app.database import db
+from app.models import Activity, Run, ScheduledRun, run_scheduled_runs
+
+BATCH_SIZE = 500
+
+# Descriptions format distance and speed with two decimals
+TOLERANCE = 0.006
+MAX_TIME_DIFF = timedelta(hours=24)
+
+RUN_RE = re.compile(r'ran ([\d.]+) km at ([\d.]+) km/h')
+TAGGED_RE = re.compile(r'\(tagged to scheduled run: (.*)\)$')
+SCHEDULED_RE = re.compile(r'scheduled a run: (.*)$')
+
+def _closest(candidates, created_at, key):
+    candidates = [c for c in candidates if abs(key(c) - created_at) < MAX_TIME_DIFF]
+    return min(candidates, key=lambda c: abs(key(c) - created_at)) if candidates else None
+
+def _link_runs(activities):
+    """Link a batch of 'run' activities; one query for runs, one for their scheduled run tags"""
+    user_ids = {activity.user_id for activity in activities}
+    start = min(activity.created_at for activity in activities) - MAX_TIME_DIFF
+    end = max(activity.created_at for activity in activities) + MAX_TIME_DIFF
+    runs_by_user = {}
+    for run in Run.query.filter(Run.user_id.in_(user_ids), Run.date >= start, Run.date <= end).all():
+        runs_by_user.setdefault(run.user_id, []).append(run)
+
+    linked = []
+    for activity in activities:
+        match = RUN_RE.search(activity.description)
+        if not match:
+            continue
+        distance, speed = float(match.group(1)), float(match.group(2))
+        candidates = [
+            run for run in runs_by_user.get(activity.user_id, [])
+            if abs(run.distance_km - distance) < TOLERANCE and abs(run.speed_kmh - speed) < TOLERANCE
+        ]
+        run = _closest(candidates, activity.created_at, key=lambda run: run.date)
+        if run:
+            activity.run_id = run.id
+            linked.append(activity)
+
+    run_ids = {activity.run_id for activity in linked}
+    tags = {}
+    if run_ids:
+        for run_id, scheduled_run in db.session.query(run_scheduled_runs.c.run_id, ScheduledRun).join(
+            ScheduledRun, ScheduledRun.id == run_scheduled_runs.c.scheduled_run_id
+        ).filter(run_scheduled_runs.c.run_id.in_(run_ids)).all():
+            tags.setdefault(run_id, []).append(scheduled_run)
+
+    for activity in linked:
+        match = TAGGED_RE.search(activity.description)
+        if not match:
+            continue
+        for scheduled_run in tags.get(activity.run_id, []):
+            if scheduled_run.club_id == activity.club_id and scheduled_run.title == match.group(1):
+                activity.scheduled_run_id = scheduled_run.id
+                break
+    return len(linked)
+
+def _link_scheduled_runs(activities):
+    """Link a batch of 'schedule_run' activities with one query for candidate scheduled runs"""
+    club_ids = {activity.club_id for activity in activities}
+    by_key = {}
+    for scheduled_run in ScheduledRun.query.filter(ScheduledRun.club_id.in_(club_ids)).all():
+        by_key.setdefault((scheduled_run.club_id, scheduled_run.created_by, scheduled_run.title), []).append(scheduled_run)
+
+    linked = 0
+    for activity in activities:
+        match = SCHEDULED_RE.search(activity.description)
+        if not match:
+            continue
+        candidates = by_key.get((activity.club_id, activity.user_id, match.group(1)), [])
+        scheduled_run = _closest(candidates, activity.created_at, key=lambda scheduled_run: scheduled_run.created_at)
+        if scheduled_run:
+            activity.scheduled_run_id = scheduled_run.id
+            linked += 1
+    return linked
+
+def backfill():
+    """Link every unlinked run / schedule_run activity."""
+    print("=" * 60)
+    print("Backfilling activity links")
+    print("=" * 60)
+
+    app = create_app()
+
+    with app.app_context():
+        try:
+            for step, (activity_type, link_column, link) in enumerate([
+                ('run', Activity.run_id, _link_runs),
+                ('schedule_run', Activity.scheduled_run_id, _link_scheduled_runs),
+            ], 1):
+                print(f"\n[{step}/2] Linking '{activity_type}' activities...")
+                linked = unmatched = 0
+                last_id = 0
+                while True:
+                    activities = Activity.query.filter(
+                        Activity.id > last_id,
+                        Activity.activity_type == activity_type,
+                        link_column.is_(None),
+                        Activity.created_at.isnot(None)
+                    ).order_by(Activity.id).limit(BATCH_SIZE).all()
+                    if not activities:
+                        break
+                    last_id = activities[-1].id
+
+                    count = link(activities)
+                    db.session.commit()
+                    linked += count
+                    unmatched += len(activities) - count
+
+                print(f"✓ {linked} linked, {unmatched} without a matching record")
+
+            print("\n" + "=" * 60)
+            print("Backfill complete!")
+            print("=" * 60)
+            return True
+
+        except Exception as e:
+            print(f"\n✗ Error backfilling activity links: {str(e)}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    success = backfill()
+    sys.exit(0 if success else 1)
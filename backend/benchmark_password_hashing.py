@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Benchmark password hashing for bulk imports
+Hashes the same batch of passwords serially and with process pools of 1, 2, 4, ...
+workers up to the available cores, and prints throughput and speedup for each, so
+the scaling of bulk imports with cores can be checked on a given machine.
+
+Usage: python benchmark_password_hashing.py [number of passwords, default 200]
+"""
+
+import sys
+import time
+from werkzeug.security import generate_password_hash
+from app.password_hashing import available_cores, create_pool, hash_passwords
+
+def _worker_counts(cores):
+    count = 1
+    while count < cores:
+        yield count
+        count *= 2
+    yield cores
+
+def benchmark(count):
+    """Print hashes per second serially and for each pool size."""
+    print("=" * 60)
+    print(f"Hashing {count} passwords ({available_cores()} cores available)")
+    print("=" * 60)
+
+    passwords = [f'password-{i}' for i in range(count)]
+
+    start = time.perf_counter()
+    for password in passwords:
+        generate_password_hash(password)
+    serial = time.perf_counter() - start
+    print(f"\n{'workers':>8} {'seconds':>10} {'hashes/s':>10} {'speedup':>8}")
+    print(f"{'serial':>8} {serial:>10.2f} {count / serial:>10.1f} {1.0:>8.2f}")
+
+    for workers in _worker_counts(available_cores()):
+        pool = create_pool(workers)
+        try:
+            # Start the worker processes before timing
+            list(pool.map(abs, range(workers)))
+            start = time.perf_counter()
+            hashes = list(hash_passwords(passwords, pool=pool, workers=workers))
+            elapsed = time.perf_counter() - start
+        finally:
+            pool.shutdown()
+        assert len(hashes) == count
+        print(f"{workers:>8} {elapsed:>10.2f} {count / elapsed:>10.1f} {serial / elapsed:>8.2f}")
+
+    print("\n" + "=" * 60)
+    return True
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    success = benchmark(count)
+    sys.exit(0 if success else 1)
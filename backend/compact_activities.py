@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Compact and archive club activities
+Rolls bursts of "<name> joined the club" / "<name> left the club" activities into one
+aggregate row per burst, then moves activities older than the retention window
+(activity_compaction.RETENTION) into the activity_archive table. Work is done in
+batches with a commit after each, so it is safe to interrupt and re-run. Schedule it
+(e.g. as a daily cron job) to keep the activity table small.
+"""
+
+import sys
+from app import create_app
+from app.activity_compaction import archive_old_activities, compact_activities
+from app.database import db
+
+def compact():
+    """Compact membership bursts, then archive old activities."""
+    print("=" * 60)
+    print("Compacting and archiving activities")
+    print("=" * 60)
+
+    app = create_app()
+
+    with app.app_context():
+        try:
+            print("\n[1/2] Compacting membership bursts...")
+            removed = compact_activities()
+            print(f"✓ {removed} activities rolled into aggregates")
+
+            print("\n[2/2] Archiving old activities...")
+            moved = archive_old_activities()
+            print(f"✓ {moved} activities archived")
+
+            print("\n" + "=" * 60)
+            print("Activity maintenance complete!")
+            print("=" * 60)
+            return True
+        except Exception as e:
+            print(f"\n✗ Error compacting activities: {str(e)}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    success = compact()
+    sys.exit(0 if success else 1)
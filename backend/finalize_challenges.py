@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Finalize ended challenges
+Writes final ranks to ChallengeResult and awards gold/silver/bronze badges for every
+challenge whose end date has passed. Run once after deploying to backfill badges for
+past challenges; afterwards it can be scheduled (e.g. as a cron job) to finalize
+challenges promptly instead of waiting for the next badge request.
+"""
+
+import sys
+from app import create_app
+from app.challenge_results import finalize_ended_challenges
+
+def finalize():
+    """Finalize all ended challenges."""
+    print("=" * 60)
+    print("Finalizing ended challenges")
+    print("=" * 60)
+    
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            count = finalize_ended_challenges()
+            print(f"\n✓ Finalized {count} challenges")
+            return True
+        except Exception as e:
+            print(f"\n✗ Error finalizing challenges: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    success = finalize()
+    sys.exit(0 if success else 1)
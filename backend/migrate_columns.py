@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Migration script to add columns and indexes introduced after a table was first created
+db.create_all() only creates missing tables, so new columns and indexes on existing tables
+are added here. Every entry is checked first, so the script is safe to run repeatedly.
+"""
+
+import sys
+from app import create_app
+from app.database import db
+from sqlalchemy import text
+
+# (table, column, column definition)
+COLUMNS = [
+    ('club', 'status', "VARCHAR(20) NOT NULL DEFAULT 'active'"),
+    ('challenge', 'leaderboard_version', 'INTEGER NOT NULL DEFAULT 0'),
+    ('challenge', 'finalized_at', 'TIMESTAMP'),
+    ('challenge', 'progress_stale_since', 'TIMESTAMP'),
+    ('challenge_progress_entry', 'image_hash', 'VARCHAR(64)'),
+    ('activity', 'run_id', 'INTEGER REFERENCES run(id) ON DELETE SET NULL'),
+    ('activity', 'scheduled_run_id', 'INTEGER REFERENCES scheduled_run(id) ON DELETE SET NULL'),
+    ('club', 'activity_version', 'INTEGER NOT NULL DEFAULT 0'),
+    ('activity', 'aggregate_count', 'INTEGER'),
+    ('import_job', 'file_format', "VARCHAR(10) NOT NULL DEFAULT 'xlsx'"),
+    ('club_daily_stats', 'member_encoding', "VARCHAR(10) NOT NULL DEFAULT 'bitset'"),
+]
+
+# (index name, table, columns)
+INDEXES = [
+    ('ix_run_user_date', 'run', ['user_id', 'date']),
+    ('ix_progress_entry_challenge_created', 'challenge_progress_entry', ['challenge_id', 'created_at', 'id']),
+    ('ix_progress_entry_challenge_user_created', 'challenge_progress_entry', ['challenge_id', 'user_id', 'created_at', 'id']),
+    ('ix_activity_club_type_created', 'activity', ['club_id', 'activity_type', 'created_at', 'id']),
+    ('ix_run_clubs_club_run', 'run_clubs', ['club_id', 'run_id']),
+]
+
+def migrate_columns():
+    """Add every column in COLUMNS and index in INDEXES that doesn't exist yet."""
+    print("=" * 60)
+    print("Adding missing columns and indexes")
+    print("=" * 60)
+    
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            for step, (table, column, definition) in enumerate(COLUMNS, 1):
+                print(f"\n[{step}/{len(COLUMNS)}] Checking {table}.{column}...")
+                existing = [col['name'] for col in inspector.get_columns(table)]
+                if column in existing:
+                    print(f"✓ {table}.{column} already exists")
+                    continue
+                
+                db.session.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {definition}'))
+                db.session.commit()
+                print(f"✓ {table}.{column} added")
+            
+            for step, (name, table, columns) in enumerate(INDEXES, 1):
+                print(f"\n[{step}/{len(INDEXES)}] Checking index {name}...")
+                existing = [index['name'] for index in inspector.get_indexes(table)]
+                if name in existing:
+                    print(f"✓ {name} already exists")
+                    continue
+                
+                column_list = ', '.join(f'"{column}"' for column in columns)
+                db.session.execute(text(f'CREATE INDEX {name} ON "{table}" ({column_list})'))
+                db.session.commit()
+                print(f"✓ {name} created")
+            
+            print("\n" + "=" * 60)
+            print("Migration complete!")
+            print("=" * 60)
+            return True
+            
+        except Exception as e:
+            print(f"\n✗ Error adding columns: {str(e)}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    success = migrate_columns()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Migration script to move base64 progress images out of the database
+Each ChallengeProgressEntry.image_url holding base64 data is written to the blob store,
+its SHA-256 saved in image_hash and image_url cleared. Rows are processed in batches by
+id, committing after each batch, so the script can be stopped and re-run at any time.
+Run migrate_columns.py first so challenge_progress_entry.image_hash exists, and set
+BLOB_STORAGE_DIR to persistent storage (on Render, the runsquad-data disk) - images
+moved onto an ephemeral filesystem are lost on the next deploy.
+"""
+
+import os
+import sys
+from app import create_app
+from app.database import db
+from app.models import ChallengeProgressEntry
+from app import blob_store
+
+BATCH_SIZE = 100
+
+def migrate_progress_images():
+    """Move every base64 progress image into the blob store."""
+    print("=" * 60)
+    print("Moving progress images to the blob store")
+    print("=" * 60)
+    
+    if not os.environ.get('BLOB_STORAGE_DIR'):
+        print("\n✗ BLOB_STORAGE_DIR is not set; point it at persistent storage before moving images")
+        return False
+    
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            print(f"\nBlob store: {app.config['BLOB_STORAGE_DIR']}")
+            moved = skipped = 0
+            last_id = 0
+            while True:
+                # Only the id and image column; one batch of images in memory at a time
+                rows = db.session.query(ChallengeProgressEntry.id, ChallengeProgressEntry.image_url).filter(
+                    ChallengeProgressEntry.id > last_id,
+                    ChallengeProgressEntry.image_url.isnot(None),
+                    ChallengeProgressEntry.image_hash.is_(None)
+                ).order_by(ChallengeProgressEntry.id).limit(BATCH_SIZE).all()
+                if not rows:
+                    break
+                
+                for entry_id, image_data in rows:
+                    last_id = entry_id
+                    if image_data.startswith(('http://', 'https://', '/')):
+                        # Already a URL, nothing to move
+                        skipped += 1
+                        continue
+                    try:
+                        digest = blob_store.save_base64(image_data, max_bytes=float('inf'))
+                    except blob_store.InvalidImage as e:
+                        print(f"✗ Entry {entry_id}: {e} - left in place")
+                        skipped += 1
+                        continue
+                    ChallengeProgressEntry.query.filter_by(id=entry_id).update(
+                        {'image_hash': digest, 'image_url': None}, synchronize_session=False
+                    )
+                    moved += 1
+                
+                db.session.commit()
+                print(f"  ...up to entry {last_id}: {moved} moved, {skipped} skipped")
+            
+            print("\n" + "=" * 60)
+            print(f"✓ Migration complete! {moved} images moved, {skipped} skipped")
+            print("=" * 60)
+            return True
+            
+        except Exception as e:
+            print(f"\n✗ Error moving images: {str(e)}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    success = migrate_progress_images()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Rebuild club statistics from run history
+Attributes existing runs to the clubs their runners belonged to (run_clubs) and
+recomputes ClubStats / ClubDailyStats for every club. Run once after deploying the
+club stats tables, or any time the counters need to be reset.
+"""
+
+import sys
+from app import create_app
+from app.club_stats import backfill_run_clubs, rebuild_club_stats
+from app.models import Club
+
+def rebuild_all():
+    """Backfill run_clubs and rebuild stats for all clubs."""
+    print("=" * 60)
+    print("Rebuilding club statistics")
+    print("=" * 60)
+    
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            print("\n[1/2] Attributing historical runs to clubs...")
+            backfill_run_clubs()
+            print("✓ Runs attributed")
+            
+            print("\n[2/2] Rebuilding club counters...")
+            club_ids = [club.id for club in Club.query.filter(Club.status != 'deleting').all()]
+            for club_id in club_ids:
+                rebuild_club_stats(club_id)
+                print(f"  - Club {club_id} rebuilt")
+            print(f"✓ Rebuilt stats for {len(club_ids)} clubs")
+            
+            print("\n" + "=" * 60)
+            print("Rebuild complete!")
+            print("=" * 60)
+            return True
+            
+        except Exception as e:
+            print(f"\n✗ Error rebuilding club stats: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == '__main__':
+    success = rebuild_all()
+    sys.exit(0 if success else 1)
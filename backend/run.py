@@ -1,7 +1,10 @@
 from app import create_app
+from app.user_import import start_sweeper
 import os
 
 app = create_app()
+# Resumes import jobs whose worker died and removes their leftover uploads
+start_sweeper(app)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import api from '../utils/api';
 import GPSTracker from './GPSTracker';
 import './ActivityFeed.css';
@@ -16,16 +16,68 @@ function ActivityFeed({ clubId }) {
   const [currentUser, setCurrentUser] = useState(null);
   const [editingActivity, setEditingActivity] = useState(null);
   const [showDeleteConfirm, setShowDeleteConfirm] = useState(null);
+  const [nextBefore, setNextBefore] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
-  const fetchActivities = useCallback(async () => {
+  const feedEtag = useRef(null);
+  const retryAfter = useRef(null);
+
+  // Returns false if the request failed. With wait, the server holds the request until
+  // the feed changes (or the wait runs out and it answers 304 Not Modified)
+  const fetchActivities = useCallback(async (wait = 0, signal = undefined) => {
     try {
-      const response = await api.get(`/users/activity-feed/${clubId}`);
-      setActivities(response.data);
+      const response = await api.get(`/users/activity-feed/${clubId}`, {
+        params: wait ? { wait } : undefined,
+        headers: feedEtag.current ? { 'If-None-Match': feedEtag.current } : undefined,
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+        signal
+      });
+      if (response.status === 304) return true;
+      feedEtag.current = response.headers.etag || null;
+      const page = response.data.activities;
+      // Refresh the newest page but keep older pages the user already loaded
+      setActivities(prev => {
+        if (page.length === 0) return page;
+        const oldest = page[page.length - 1];
+        const older = prev.filter(activity =>
+          activity.created_at < oldest.created_at ||
+          (activity.created_at === oldest.created_at && activity.id < oldest.id)
+        );
+        if (older.length === 0) setNextBefore(response.data.next_before);
+        return [...page, ...older];
+      });
+      return true;
     } catch (err) {
+      if (signal?.aborted) return false;
+      // 503: too many requests are already waiting on the server; retry when it says
+      if (err.response?.status === 503) {
+        retryAfter.current = parseInt(err.response.headers['retry-after'], 10) || null;
+        return false;
+      }
       console.error('Error fetching activities:', err);
+      return false;
     }
   }, [clubId]);
 
+  const loadMoreActivities = async () => {
+    if (!nextBefore) return;
+    setLoadingMore(true);
+    try {
+      const response = await api.get(`/users/activity-feed/${clubId}`, {
+        params: { before: nextBefore }
+      });
+      setActivities(prev => {
+        const seen = new Set(prev.map(activity => activity.id));
+        return [...prev, ...response.data.activities.filter(activity => !seen.has(activity.id))];
+      });
+      setNextBefore(response.data.next_before);
+    } catch (err) {
+      console.error('Error loading more activities:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     // Get current user from localStorage
     const storedUser = localStorage.getItem('user');
@@ -38,9 +90,26 @@ function ActivityFeed({ clubId }) {
       }
     }
     
-    fetchActivities();
-    const interval = setInterval(fetchActivities, 30000); // Refresh every 30 seconds
-    return () => clearInterval(interval);
+    setActivities([]);
+    setNextBefore(null);
+    feedEtag.current = null;
+
+    // Long-poll: each request returns as soon as the feed changes
+    const controller = new AbortController();
+    const poll = async () => {
+      await fetchActivities(0, controller.signal);
+      while (!controller.signal.aborted) {
+        const ok = await fetchActivities(25, controller.signal);
+        if (!ok && !controller.signal.aborted) {
+          // Back off after an error, or for as long as a busy server asked
+          const delay = retryAfter.current ? retryAfter.current * 1000 : 30000;
+          retryAfter.current = null;
+          await new Promise(resolve => setTimeout(resolve, delay));
+        }
+      }
+    };
+    poll();
+    return () => controller.abort();
   }, [clubId, fetchActivities]);
 
   const handleManualTrack = async (e) => {
@@ -395,6 +464,15 @@ function ActivityFeed({ clubId }) {
             </div>
           ))
         )}
+        {nextBefore && (
+          <button
+            className="load-more-activities-button"
+            onClick={loadMoreActivities}
+            disabled={loadingMore}
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        )}
       </div>
     </div>
   );
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import api from '../utils/api';
 import StylizedText from './StylizedText';
@@ -10,12 +10,49 @@ function BulkImportUsers() {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
   const [result, setResult] = useState(null);
+  const pollTimer = useRef(null);
+
+  useEffect(() => () => clearTimeout(pollTimer.current), []);
+
+  // Poll the import job until it finishes; skipped and invalid rows come in pages
+  const pollJob = async (jobId) => {
+    try {
+      const response = await api.get(`/users/bulk-import/${jobId}`, { params: { limit: 200 } });
+      setResult(response.data);
+      if (response.data.status === 'pending' || response.data.status === 'running') {
+        pollTimer.current = setTimeout(() => pollJob(jobId), 2000);
+        return;
+      }
+      if (response.data.status === 'failed') {
+        setError(response.data.error || 'Import failed');
+      }
+      setLoading(false);
+    } catch (err) {
+      setError(err.response?.data?.error || 'Failed to get import progress');
+      setLoading(false);
+    }
+  };
+
+  const loadMoreIssues = async () => {
+    try {
+      const response = await api.get(`/users/bulk-import/${result.job_id}`, {
+        params: { limit: 200, cursor: result.next_cursor }
+      });
+      setResult(prev => ({
+        ...response.data,
+        issues: [...prev.issues, ...response.data.issues]
+      }));
+    } catch (err) {
+      setError(err.response?.data?.error || 'Failed to load more rows');
+    }
+  };
 
   const handleFileChange = (e) => {
     const selectedFile = e.target.files[0];
     if (selectedFile) {
-      if (!selectedFile.name.endsWith('.xlsx') && !selectedFile.name.endsWith('.xls')) {
-        setError('Please select an Excel file (.xlsx or .xls)');
+      const name = selectedFile.name.toLowerCase();
+      if (!['.xlsx', '.xls', '.csv', '.jsonl'].some((ext) => name.endsWith(ext))) {
+        setError('Please select an Excel (.xlsx or .xls), CSV (.csv) or JSON Lines (.jsonl) file');
         setFile(null);
         return;
       }
@@ -29,7 +66,7 @@ function BulkImportUsers() {
     e.preventDefault();
     
     if (!file) {
-      setError('Please select an Excel file');
+      setError('Please select a file');
       return;
     }
 
@@ -47,20 +84,23 @@ function BulkImportUsers() {
         },
       });
 
-      setResult(response.data);
+      setResult(response.data.job);
       setFile(null);
       // Reset file input
       e.target.reset();
+      pollJob(response.data.job.job_id);
     } catch (err) {
       setError(err.response?.data?.error || 'Failed to import users. Please check your file format.');
       if (err.response?.data?.details) {
         console.error('Error details:', err.response.data.details);
       }
-    } finally {
       setLoading(false);
     }
   };
 
+  const skippedRows = result?.issues?.filter(issue => issue.kind === 'skipped') || [];
+  const errorRows = result?.issues?.filter(issue => issue.kind === 'error') || [];
+
   const handleBack = () => {
     navigate('/dashboard');
   };
@@ -110,7 +150,7 @@ function BulkImportUsers() {
       <div className="bulk-import-content">
         <div className="instructions-box">
           <h2>Instructions</h2>
-          <p>Upload an Excel file (.xlsx or .xls) with the following columns:</p>
+          <p>Upload an Excel (.xlsx or .xls) or CSV (.csv) file with the following columns:</p>
           <ul>
             <li><strong>name</strong> (required) - User's full name</li>
             <li><strong>email</strong> (required) - User's email address</li>
@@ -120,17 +160,21 @@ function BulkImportUsers() {
           <p className="note">
             <strong>Note:</strong> Column names are case-insensitive. Users with existing emails will be skipped.
           </p>
+          <p className="note">
+            A JSON Lines (.jsonl) file has one object per line instead, e.g.{' '}
+            <code>{'{"name": "Ana", "email": "ana@example.com", "password": "secret"}'}</code>
+          </p>
         </div>
 
         <form onSubmit={handleSubmit} className="upload-form">
           <div className="file-input-group">
             <label htmlFor="excel-file" className="file-label">
-              Select Excel File
+              Select File
             </label>
             <input
               type="file"
               id="excel-file"
-              accept=".xlsx,.xls"
+              accept=".xlsx,.xls,.csv,.jsonl"
               onChange={handleFileChange}
               className="file-input"
               disabled={loading}
@@ -160,6 +204,9 @@ function BulkImportUsers() {
         {result && (
           <div className="result-box">
             <h2>Import Results</h2>
+            {(result.status === 'pending' || result.status === 'running') && (
+              <p className="import-progress">Importing... {result.processed_rows} rows processed</p>
+            )}
             <div className="result-summary">
               <div className="result-item success">
                 <span className="result-label">Created:</span>
@@ -175,47 +222,39 @@ function BulkImportUsers() {
               </div>
             </div>
 
-            {result.created_users && result.created_users.length > 0 && (
+            {skippedRows.length > 0 && (
               <div className="result-details">
-                <h3>Created Users ({result.created_users.length})</h3>
+                <h3>Skipped Users ({result.skipped_count})</h3>
                 <div className="users-list">
-                  {result.created_users.map((user, index) => (
-                    <div key={index} className="user-item">
-                      <span className="user-name">{user.name}</span>
+                  {skippedRows.map((user) => (
+                    <div key={`${user.row}-${user.email}`} className="user-item skipped">
                       <span className="user-email">{user.email}</span>
+                      <span className="skip-reason">{user.message}</span>
                     </div>
                   ))}
                 </div>
               </div>
             )}
 
-            {result.skipped_users && result.skipped_users.length > 0 && (
+            {errorRows.length > 0 && (
               <div className="result-details">
-                <h3>Skipped Users ({result.skipped_users.length})</h3>
-                <div className="users-list">
-                  {result.skipped_users.map((user, index) => (
-                    <div key={index} className="user-item skipped">
-                      <span className="user-email">{user.email}</span>
-                      <span className="skip-reason">{user.reason}</span>
-                    </div>
-                  ))}
-                </div>
-              </div>
-            )}
-
-            {result.errors && result.errors.length > 0 && (
-              <div className="result-details">
-                <h3>Errors ({result.errors.length})</h3>
+                <h3>Errors ({result.error_count})</h3>
                 <div className="errors-list">
-                  {result.errors.map((error, index) => (
-                    <div key={index} className="error-item">
+                  {errorRows.map((error) => (
+                    <div key={`${error.row}-${error.message}`} className="error-item">
                       <span className="error-row">Row {error.row}:</span>
-                      <span className="error-message">{error.error}</span>
+                      <span className="error-message">{error.message}</span>
                     </div>
                   ))}
                 </div>
               </div>
             )}
+
+            {result.next_cursor && !loading && (
+              <button type="button" className="submit-button" onClick={loadMoreIssues}>
+                Show more rows
+              </button>
+            )}
           </div>
         )}
       </div>
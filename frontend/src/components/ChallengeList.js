@@ -4,6 +4,9 @@ import GPSTracker from './GPSTracker';
 import CreateChallenge from './CreateChallenge';
 import './ChallengeList.css';
 
+// Wait before reopening a leaderboard stream the server refused or closed
+const STREAM_RETRY_MS = 15000;
+
 function ChallengeList({ clubId, isAdmin, onJoinChallenge }) {
   const [challenges, setChallenges] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -37,6 +40,89 @@ function ChallengeList({ clubId, isAdmin, onJoinChallenge }) {
     fetchChallenges();
   }, [clubId, fetchChallenges]);
 
+  // Live rank updates while the leaderboard is open
+  const leaderboardChallengeId = showLeaderboard ? leaderboard?.challenge_id : null;
+  useEffect(() => {
+    if (!leaderboardChallengeId) return undefined;
+
+    let source = null;
+    let retryTimer = null;
+    let closed = false;
+
+    const refetch = async () => {
+      try {
+        const response = await api.get(`/challenges/${leaderboardChallengeId}/leaderboard`);
+        setLeaderboard(response.data);
+      } catch (err) {
+        console.error('Error refreshing leaderboard:', err);
+      }
+    };
+
+    const applyUpdate = (event) => {
+      const update = JSON.parse(event.data);
+      setLeaderboard((current) => {
+        if (!current || current.challenge_id !== update.challenge_id) return current;
+        const currentUserId = current.current_user?.user_id;
+        const removed = new Set(update.removed);
+        const changed = new Map(update.changed.map((entry) => [entry.user_id, entry]));
+        const lastRank = current.leaderboard.length ? current.leaderboard[current.leaderboard.length - 1].rank : 0;
+
+        const entries = current.leaderboard
+          .filter((entry) => !removed.has(entry.user_id))
+          .map((entry) => (changed.has(entry.user_id) ? { ...entry, ...changed.get(entry.user_id) } : entry));
+        // Participants who moved into the displayed range
+        const shown = new Set(entries.map((entry) => entry.user_id));
+        update.changed
+          .filter((entry) => !shown.has(entry.user_id) && entry.rank <= lastRank)
+          .forEach((entry) => entries.push({ ...entry, is_current_user: entry.user_id === currentUserId }));
+        entries.sort((a, b) => a.rank - b.rank || a.user_id - b.user_id);
+
+        return {
+          ...current,
+          participant_count: update.participant_count,
+          leaderboard: entries,
+          current_user: entries.find((entry) => entry.is_current_user) || current.current_user
+        };
+      });
+    };
+
+    const scheduleReconnect = () => {
+      if (source) source.close();
+      source = null;
+      if (!closed) retryTimer = setTimeout(connect, STREAM_RETRY_MS);
+    };
+
+    const connect = async () => {
+      try {
+        // EventSource can't send the Authorization header, so it connects with a short-lived stream token
+        const response = await api.post(`/challenges/${leaderboardChallengeId}/leaderboard/stream-token`);
+        if (closed) return;
+        source = new EventSource(
+          `${api.defaults.baseURL}/challenges/${leaderboardChallengeId}/leaderboard/stream?token=${encodeURIComponent(response.data.token)}`
+        );
+        source.addEventListener('leaderboard', applyUpdate);
+        // Reconnects and skipped updates: start again from a full fetch
+        source.addEventListener('resync', refetch);
+        source.onopen = refetch;
+        // The browser retries dropped connections itself but gives up on refused ones
+        // (expired token, or 503 when the server has too many open streams)
+        source.onerror = () => {
+          if (source && source.readyState === EventSource.CLOSED) scheduleReconnect();
+        };
+      } catch (err) {
+        console.error('Error opening leaderboard stream:', err);
+        scheduleReconnect();
+      }
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, [leaderboardChallengeId]);
+
   const handleJoinChallenge = async (challengeId) => {
     try {
       await api.post(`/challenges/${challengeId}/join`);
@@ -95,9 +181,10 @@ function ChallengeList({ clubId, isAdmin, onJoinChallenge }) {
       const reader = new FileReader();
       reader.onloadend = () => {
         setImagePreview(reader.result);
-        setProgressImage(reader.result);
       };
       reader.readAsDataURL(file);
+      // The file itself is uploaded as-is on submit
+      setProgressImage(file);
     }
   };
 
@@ -111,10 +198,18 @@ function ChallengeList({ clubId, isAdmin, onJoinChallenge }) {
     }
 
     try {
+      let imageHash;
+      if (progressImage) {
+        const upload = await api.post('/challenges/images', progressImage, {
+          headers: { 'Content-Type': progressImage.type || 'application/octet-stream' }
+        });
+        imageHash = upload.data.image_hash;
+      }
+
       await api.post(`/challenges/${selectedChallenge.id}/track`, {
         progress_value: parseFloat(progressValue),
         notes: progressNotes || undefined,
-        image: progressImage || undefined
+        image_hash: imageHash
       });
       
       alert('Progress tracked successfully!');
@@ -138,7 +233,9 @@ function ChallengeList({ clubId, isAdmin, onJoinChallenge }) {
           alert('For fastest 5K challenge, your run must be between 4.5km and 5.5km');
           return;
         }
-      } else if (selectedChallenge.challenge_type === 'total_distance' || selectedChallenge.challenge_type === 'weekly_mileage') {
+      } else if (selectedChallenge.challenge_type === 'run_count') {
+        progressValue = 1;
+      } else if (['total_distance', 'weekly_mileage', 'longest_run'].includes(selectedChallenge.challenge_type)) {
         // For distance challenges, use distance in km
         progressValue = runData.distance_km;
       } else if (selectedChallenge.challenge_type === 'total_time') {
@@ -206,7 +303,9 @@ function ChallengeList({ clubId, isAdmin, onJoinChallenge }) {
       'weekly_mileage': 'Distance (km)',
       'fastest_5k': 'Time (minutes)',
       'total_distance': 'Distance (km)',
-      'total_time': 'Time (minutes)'
+      'total_time': 'Time (minutes)',
+      'longest_run': 'Distance (km)',
+      'run_count': 'Runs'
     };
     return labels[challengeType] || 'Progress';
   };
@@ -216,7 +315,11 @@ function ChallengeList({ clubId, isAdmin, onJoinChallenge }) {
       'weekly_mileage': 'Weekly Mileage',
       'fastest_5k': 'Fastest 5K',
       'total_distance': 'Total Distance',
-      'total_time': 'Total Time'
+      'total_time': 'Total Time',
+      'longest_run': 'Longest Run',
+      'run_count': 'Run Count',
+      'streak': 'Consecutive-Day Streak',
+      'average_pace': 'Average Pace'
     };
     return labels[type] || type;
   };
@@ -231,6 +334,15 @@ function ChallengeList({ clubId, isAdmin, onJoinChallenge }) {
       const hours = Math.floor(challenge.user_progress / 60);
       const minutes = Math.floor(challenge.user_progress % 60);
       return `${hours}h ${minutes}m`;
+    } else if (challenge.challenge_type === 'run_count') {
+      return `${challenge.user_progress} runs`;
+    } else if (challenge.challenge_type === 'streak') {
+      return `${challenge.user_progress} days`;
+    } else if (challenge.challenge_type === 'average_pace') {
+      if (challenge.user_progress === 0) return 'No runs yet';
+      const minutes = Math.floor(challenge.user_progress);
+      const seconds = Math.floor((challenge.user_progress - minutes) * 60);
+      return `${minutes}:${seconds.toString().padStart(2, '0')} /km`;
     } else {
       return `${challenge.user_progress.toFixed(2)} km`;
     }
@@ -245,6 +357,14 @@ function ChallengeList({ clubId, isAdmin, onJoinChallenge }) {
       const hours = Math.floor(challenge.goal_value / 60);
       const minutes = Math.floor(challenge.goal_value % 60);
       return `${hours}h ${minutes}m`;
+    } else if (challenge.challenge_type === 'run_count') {
+      return `${challenge.goal_value} runs`;
+    } else if (challenge.challenge_type === 'streak') {
+      return `${challenge.goal_value} days`;
+    } else if (challenge.challenge_type === 'average_pace') {
+      const minutes = Math.floor(challenge.goal_value);
+      const seconds = Math.floor((challenge.goal_value - minutes) * 60);
+      return `${minutes}:${seconds.toString().padStart(2, '0')} /km`;
     } else {
       return `${challenge.goal_value} km`;
     }
@@ -252,8 +372,8 @@ function ChallengeList({ clubId, isAdmin, onJoinChallenge }) {
 
   const getProgressPercentage = (challenge) => {
     if (challenge.goal_value === 0) return 0;
-    if (challenge.challenge_type === 'fastest_5k') {
-      // For fastest 5K, progress is inverted (lower is better)
+    if (challenge.challenge_type === 'fastest_5k' || challenge.challenge_type === 'average_pace') {
+      // For fastest 5K and pace, progress is inverted (lower is better)
       if (challenge.user_progress === 0) return 0;
       return Math.min(100, (challenge.goal_value / challenge.user_progress) * 100);
     }
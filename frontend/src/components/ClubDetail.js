@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import api from '../utils/api';
 import ScheduleRun from './ScheduleRun';
@@ -7,8 +7,12 @@ import ChallengeList from './ChallengeList';
 import CreateChallenge from './CreateChallenge';
 import StylizedText from './StylizedText';
 import { formatDateIST } from '../utils/dateUtils';
+import { downloadExport } from '../utils/download';
 import './ClubDetail.css';
 
+// Wait for a pause in typing before searching members
+const MEMBER_SEARCH_DELAY_MS = 300;
+
 function ClubDetail() {
   const { id } = useParams();
   const navigate = useNavigate();
@@ -22,6 +26,11 @@ function ClubDetail() {
   const [deleteRunConfirm, setDeleteRunConfirm] = useState(null);
   const [currentUser, setCurrentUser] = useState(null);
   const [showCreateChallenge, setShowCreateChallenge] = useState(false);
+  const [members, setMembers] = useState([]);
+  const [membersCursor, setMembersCursor] = useState(null);
+  const [memberSearch, setMemberSearch] = useState('');
+  const [memberQuery, setMemberQuery] = useState('');
+  const membersRequest = useRef(null);
 
   const fetchClub = useCallback(async () => {
     try {
@@ -32,6 +41,39 @@ function ClubDetail() {
     }
   }, [id]);
 
+  const fetchMembers = useCallback(async (cursor = null) => {
+    // A newer request supersedes this one, so its response can't overwrite newer results
+    if (membersRequest.current) membersRequest.current.abort();
+    const controller = new AbortController();
+    membersRequest.current = controller;
+    try {
+      const params = { limit: 50 };
+      if (cursor) params.cursor = cursor;
+      if (memberQuery) params.q = memberQuery;
+      const response = await api.get(`/clubs/${id}/members`, { params, signal: controller.signal });
+      setMembers((prev) => (cursor ? [...prev, ...response.data.members] : response.data.members));
+      setMembersCursor(response.data.next_cursor);
+    } catch (err) {
+      if (controller.signal.aborted) return;
+      console.error('Error fetching members:', err);
+    }
+  }, [id, memberQuery]);
+
+  useEffect(() => {
+    const timer = setTimeout(() => setMemberQuery(memberSearch.trim()), MEMBER_SEARCH_DELAY_MS);
+    return () => clearTimeout(timer);
+  }, [memberSearch]);
+
+  useEffect(() => () => membersRequest.current?.abort(), []);
+
+  const handleExport = async (kind, format) => {
+    try {
+      await downloadExport(`/clubs/${id}/${kind}/export`, format);
+    } catch (err) {
+      alert('Failed to export club data');
+    }
+  };
+
   const fetchScheduledRuns = useCallback(async () => {
     try {
       const response = await api.get(`/runs/schedule/${id}`);
@@ -57,11 +99,18 @@ function ClubDetail() {
     fetchScheduledRuns();
   }, [id, fetchClub, fetchScheduledRuns]);
 
+  useEffect(() => {
+    if (activeTab === 'members') {
+      fetchMembers();
+    }
+  }, [activeTab, fetchMembers]);
+
   const handlePromoteMember = async (memberId) => {
     try {
       await api.post(`/clubs/${id}/members/${memberId}/promote`);
       // Refresh club data to get updated admin status
       fetchClub();
+      fetchMembers();
     } catch (err) {
       console.error('Error promoting member:', err);
       alert(err.response?.data?.error || 'Failed to promote member');
@@ -77,6 +126,7 @@ function ClubDetail() {
       await api.post(`/clubs/${id}/members/${memberId}/remove`);
       alert('Member removed successfully');
       fetchClub();
+      fetchMembers();
     } catch (err) {
       console.error('Error removing member:', err);
       alert(err.response?.data?.error || 'Failed to remove member');
@@ -414,8 +464,25 @@ function ClubDetail() {
 
           {activeTab === 'members' && (
             <div className="members-section">
+              {club.is_admin && (
+                <div className="export-actions">
+                  <span>Export members:</span>
+                  <button className="export-button" onClick={() => handleExport('members', 'csv')}>CSV</button>
+                  <button className="export-button" onClick={() => handleExport('members', 'xlsx')}>Excel</button>
+                  <span>Export runs:</span>
+                  <button className="export-button" onClick={() => handleExport('runs', 'csv')}>CSV</button>
+                  <button className="export-button" onClick={() => handleExport('runs', 'xlsx')}>Excel</button>
+                </div>
+              )}
+              <input
+                type="text"
+                className="member-search-input"
+                placeholder="Search members by name..."
+                value={memberSearch}
+                onChange={(e) => setMemberSearch(e.target.value)}
+              />
               <div className="members-list">
-                {club.members.map((member) => (
+                {members.map((member) => (
                   <div key={member.id} className="member-card">
                     <div className="member-avatar">{member.name.charAt(0).toUpperCase()}</div>
                     <div className="member-info">
@@ -450,6 +517,14 @@ function ClubDetail() {
                   </div>
                 ))}
               </div>
+              {membersCursor && (
+                <button
+                  className="load-more-button"
+                  onClick={() => fetchMembers(membersCursor)}
+                >
+                  Load more members
+                </button>
+              )}
             </div>
           )}
 
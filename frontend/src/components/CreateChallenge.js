@@ -17,7 +17,11 @@ function CreateChallenge({ clubId, onClose, onSuccess, challenge = null }) {
     { value: 'weekly_mileage', label: 'Weekly Mileage', unit: 'km', description: 'Total distance goal for the week' },
     { value: 'fastest_5k', label: 'Fastest 5K', unit: 'minutes', description: 'Fastest time to complete 5K' },
     { value: 'total_distance', label: 'Total Distance', unit: 'km', description: 'Total distance goal over the period' },
-    { value: 'total_time', label: 'Total Time', unit: 'minutes', description: 'Total running time goal' }
+    { value: 'total_time', label: 'Total Time', unit: 'minutes', description: 'Total running time goal' },
+    { value: 'longest_run', label: 'Longest Run', unit: 'km', description: 'Longest single run over the period' },
+    { value: 'run_count', label: 'Run Count', unit: 'runs', description: 'Number of runs over the period' },
+    { value: 'streak', label: 'Consecutive-Day Streak', unit: 'days', description: 'Most days in a row with a run' },
+    { value: 'average_pace', label: 'Average Pace', unit: 'min/km', description: 'Lowest average pace over all runs in the period' }
   ];
 
   const handleSubmit = async (e) => {
@@ -108,11 +108,15 @@ function Dashboard() {
   const fetchUserChallenges = useCallback(async () => {
     try {
       const userClubs = allClubs.filter(club => club.is_member || club.is_creator);
-      const challengesPromises = userClubs.map(club => 
-        api.get(`/challenges/club/${club.id}`).catch(() => ({ data: [] }))
-      );
-      const challengesResponses = await Promise.all(challengesPromises);
-      const allChallenges = challengesResponses.flatMap(res => res.data || []);
+      if (userClubs.length === 0) {
+        setUserChallenges([]);
+        return;
+      }
+      // One request for the challenges of every club the user belongs to
+      const response = await api.get('/challenges', {
+        params: { club_ids: userClubs.map(club => club.id).join(',') }
+      });
+      const allChallenges = response.data || [];
       const activeChallenges = allChallenges.filter(ch => {
         const now = new Date();
         const start = new Date(ch.start_date);
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import api from '../utils/api';
+import { downloadExport } from '../utils/download';
 import GPSTracker from './GPSTracker';
 import StylizedText from './StylizedText';
 import {
@@ -147,6 +148,14 @@ function MyProgress() {
     }
   };
 
+  const handleExport = async (format) => {
+    try {
+      await downloadExport('/runs/export', format);
+    } catch (err) {
+      alert('Failed to export runs');
+    }
+  };
+
   const handleCancelForm = () => {
     setShowForm(false);
     setEditingRun(null);
@@ -343,6 +352,8 @@ function MyProgress() {
           <div className="user-info">
             <span className="user-name">My Progress</span>
           </div>
+          <button onClick={() => handleExport('csv')} className="header-button">Export CSV</button>
+          <button onClick={() => handleExport('xlsx')} className="header-button">Export Excel</button>
           <button onClick={() => navigate('/dashboard')} className="header-button">← Back to Dashboard</button>
         </div>
       </header>
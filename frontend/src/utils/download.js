@@ -0,0 +1,24 @@
+import api from './api';
+
+/**
+ * Download a CSV/XLSX export from the API as a file
+ * @param {string} path - Export endpoint, e.g. "/runs/export"
+ * @param {string} format - "csv" or "xlsx"
+ */
+export async function downloadExport(path, format) {
+  const response = await api.get(path, { params: { format }, responseType: 'blob' });
+
+  // Use the server's file name when it's exposed, e.g. attachment; filename="my-runs.csv"
+  const disposition = response.headers['content-disposition'] || '';
+  const match = disposition.match(/filename="([^"]+)"/);
+  const filename = match ? match[1] : `export.${format}`;
+
+  const url = window.URL.createObjectURL(response.data);
+  const link = document.createElement('a');
+  link.href = url;
+  link.download = filename;
+  document.body.appendChild(link);
+  link.click();
+  link.remove();
+  window.URL.revokeObjectURL(url);
+}